@@ -7,6 +7,7 @@ import shelve
 import webbrowser
 
 from services import reddit, twitter
+from utils import helpers, item_store, pipeline, run_history, status_server
 
 USER_HOME_PATH = os.path.expanduser('~')
 
@@ -22,6 +23,10 @@ twitter_state_file_path = Path(
     f'{os.path.expanduser("~")}/.config/twitter_state.db')
 twitter_state = shelve.open(str(twitter_state_file_path))
 
+reddit_store = item_store.open_item_store('reddit')
+twitter_store = item_store.open_item_store('twitter')
+history = run_history.open_run_history()
+
 
 def create_storage_folder():
     """
@@ -30,10 +35,14 @@ def create_storage_folder():
     """
     storage_folder_path = os.path.join(USER_HOME_PATH, '.SocialAmnesia')
     reddit_storage_folder_path = os.path.join(storage_folder_path, "reddit")
+    twitter_storage_folder_path = os.path.join(storage_folder_path, "twitter")
 
     if not os.path.exists(storage_folder_path):
         os.makedirs(storage_folder_path)
+    if not os.path.exists(reddit_storage_folder_path):
         os.makedirs(reddit_storage_folder_path)
+    if not os.path.exists(twitter_storage_folder_path):
+        os.makedirs(twitter_storage_folder_path)
 
 
 def build_number_list(max_number):
@@ -137,8 +146,42 @@ class MainApp(tk.Frame):
         tk.Label(frame, text=limitationsText).grid(
             row=7, column=0, columnspan=4, sticky='W')
 
+        self.build_export_import(frame)
+
         return frame
 
+    @staticmethod
+    def build_export_import(frame: tk.Frame):
+        """
+        Create and place the elements importing data exports in the login frame,
+        which reach past the API constraints
+        :param frame: frame to set up, in this case the login tab
+        :return: None
+        """
+        import_label = tk.Label(
+            frame, text='To reach older items, import the data export of your account:')
+
+        import_status_text = tk.StringVar()
+        import_status_text.set('')
+        import_status_label = tk.Label(
+            frame, textvariable=import_status_text)
+
+        import_reddit_button = tk.Button(
+            frame, text='Import reddit export',
+            command=lambda: reddit.import_reddit_export(
+                root, import_status_text, reddit_store)
+        )
+        import_twitter_button = tk.Button(
+            frame, text='Import twitter export',
+            command=lambda: twitter.import_twitter_export(
+                root, import_status_text, twitter_store)
+        )
+
+        import_label.grid(row=8, column=0, columnspan=4, sticky='W')
+        import_reddit_button.grid(row=9, column=0, sticky='W')
+        import_twitter_button.grid(row=9, column=2, sticky='W')
+        import_status_label.grid(row=10, column=0, columnspan=4, sticky='W')
+
     @staticmethod
     def build_twitter_login(frame: tk.Frame):
         """
@@ -200,10 +243,7 @@ class MainApp(tk.Frame):
         login_button.grid(row=5, column=2, sticky='W')
         login_confirmed_label.grid(row=5, column=3, sticky='W')
 
-        if 'login_info' in twitter_state:
-            login_dict = twitter_state['login_info']
-            twitter.set_twitter_login(login_dict['consumer_key'], login_dict['consumer_secret'],
-                                      login_dict['access_token'], login_dict['access_token_secret'], login_confirm_text, twitter_state)
+        twitter.initialize_twitter_user(login_confirm_text, twitter_state)
 
     @staticmethod
     def build_reddit_login(frame: tk.Frame):
@@ -238,6 +278,7 @@ class MainApp(tk.Frame):
         login_button = tk.Button(
             frame, text='Login to Reddit',
             command=lambda: reddit.set_reddit_login(
+                root,
                 username_entry.get(),
                 password_entry.get(),
                 client_id_entry.get(),
@@ -328,6 +369,21 @@ class MainApp(tk.Frame):
                 current_time_to_save, reddit_state)
         )
 
+        # How many stored items the picked time leaves to the filters, updated as the dropdowns change
+        retention_preview_text = tk.StringVar()
+
+        def update_retention_preview(event=None):
+            retention_preview_text.set(pipeline.retention_preview(
+                reddit.adapter, reddit_store, helpers.retention_seconds(
+                    hours_dropdown.get(), days_dropdown.get(), weeks_dropdown.get(), years_dropdown.get())))
+
+        for dropdown in (hours_dropdown, days_dropdown, weeks_dropdown, years_dropdown):
+            dropdown.bind('<<ComboboxSelected>>', update_retention_preview)
+        update_retention_preview()
+
+        retention_preview_label = tk.Label(
+            configuration_frame, textvariable=retention_preview_text)
+
         # Configuration to set saving items with a certain amount of upvotes
         current_max_score = tk.StringVar()
         if 'max_score' in reddit_state:
@@ -403,14 +459,46 @@ class MainApp(tk.Frame):
         modify_whitelist_comments_button = tk.Button(
             configuration_frame, text='Pick comments to whitelist',
             command=lambda: reddit.set_reddit_whitelist(
-                root, True, reddit_state)
+                root, True, reddit_state, reddit_store)
         )
         modify_whitelist_posts_button = tk.Button(
             configuration_frame, text='Pick posts to whitelist',
             command=lambda: reddit.set_reddit_whitelist(
-                root, False, reddit_state)
+                root, False, reddit_state, reddit_store)
+        )
+
+        # Rule based whitelisting
+        keep_rules_label = tk.Label(
+            configuration_frame, text='Keep items matching rules:')
+        keep_rules_button = tk.Button(
+            configuration_frame, text='Edit keep rules',
+            command=lambda: reddit.set_reddit_keep_rules(root, reddit_state)
         )
 
+        # Order items are deleted in, so a run cut short has deleted the ones that matter most
+        deletion_order_label = tk.Label(
+            configuration_frame, text='Delete first:')
+        deletion_order_dropdown = ttk.Combobox(
+            configuration_frame, width=36, state='readonly',
+            values=list(pipeline.DELETION_ORDERS.values()))
+        deletion_order_dropdown.set(pipeline.DELETION_ORDERS[reddit_state.get(
+            'deletion_order', pipeline.ORDER_OLDEST)])
+        deletion_order_dropdown.bind(
+            '<<ComboboxSelected>>',
+            lambda event: reddit.set_reddit_deletion_order(deletion_order_dropdown.get(), reddit_state))
+        priority_rules_button = tk.Button(
+            configuration_frame, text='Edit priority rules',
+            command=lambda: reddit.set_reddit_priority_rules(root, reddit_state)
+        )
+
+        # Keep a compressed copy of every item before it's gone
+        archive_bool = tk.IntVar()
+        archive_bool.set(reddit_state.get('archive_items', 0))
+        archive_label = tk.Label(
+            configuration_frame, text='Archive items before deleting them:')
+        archive_check_button = tk.Checkbutton(
+            configuration_frame, variable=archive_bool, command=lambda: reddit.set_reddit_archive(archive_bool, reddit_state))
+
         # Allows the user to actually delete comments or submissions
         deletion_section_label = tk.Label(deletion_frame, text='Deletion')
         deletion_section_label.config(font=('arial', 25))
@@ -433,14 +521,14 @@ class MainApp(tk.Frame):
             deletion_frame, text='Delete comments',
             command=lambda: reddit.delete_reddit_items(
                 root, True, currently_deleting_text,
-                deletion_progress_bar, num_deleted_items_text, reddit_state, False)
+                deletion_progress_bar, num_deleted_items_text, reddit_state, reddit_store, False, history=history)
         )
 
         delete_submissions_button = tk.Button(
             deletion_frame, text='Delete submissions',
             command=lambda: reddit.delete_reddit_items(
                 root, False, currently_deleting_text,
-                deletion_progress_bar, num_deleted_items_text, reddit_state, False)
+                deletion_progress_bar, num_deleted_items_text, reddit_state, reddit_store, False, history=history)
         )
 
         # Allows the user to schedule runs
@@ -469,7 +557,7 @@ class MainApp(tk.Frame):
             command=lambda: reddit.set_reddit_scheduler(
                 root, scheduler_bool,
                 int(scheduler_hours_dropdown.get()),
-                tk.StringVar(), ttk.Progressbar(), scheduler_currently_set_text, reddit_state))
+                tk.StringVar(), ttk.Progressbar(), scheduler_currently_set_text, reddit_state, reddit_store, history))
 
         # This part actually builds the reddit tab
         configuration_label.grid(row=0, column=0, sticky='w')
@@ -484,6 +572,7 @@ class MainApp(tk.Frame):
         years_label.grid(row=1, column=8, sticky='w')
         set_time_button.grid(row=1, column=9, columnspan=2)
         time_currently_set_label.grid(row=1, column=11)
+        retention_preview_label.grid(row=1, column=12, sticky='w')
 
         max_score_label.grid(row=2, column=0, sticky='w')
         max_score_entry_field.grid(row=2, column=1, sticky='w')
@@ -506,8 +595,18 @@ class MainApp(tk.Frame):
         modify_whitelist_posts_button.grid(
             row=6, column=5, columnspan=4, sticky='w')
 
+        keep_rules_label.grid(row=7, column=0, sticky='w')
+        keep_rules_button.grid(row=7, column=1, columnspan=4, sticky='w')
+
+        deletion_order_label.grid(row=8, column=0, sticky='w')
+        deletion_order_dropdown.grid(row=8, column=1, columnspan=8, sticky='w')
+        priority_rules_button.grid(row=8, column=9, columnspan=2, sticky='w')
+
+        archive_label.grid(row=9, column=0, sticky='w')
+        archive_check_button.grid(row=9, column=1, sticky='w')
+
         ttk.Separator(configuration_frame, orient=tk.HORIZONTAL).grid(
-            row=7, columnspan=13, sticky='ew', pady=5)
+            row=10, columnspan=13, sticky='ew', pady=5)
 
         deletion_section_label.grid(row=0, column=0, sticky='w')
 
@@ -585,6 +684,21 @@ class MainApp(tk.Frame):
                 weeks_dropdown.get(), years_dropdown.get(), current_time_to_save, twitter_state)
         )
 
+        # How many stored items the picked time leaves to the filters, updated as the dropdowns change
+        retention_preview_text = tk.StringVar()
+
+        def update_retention_preview(event=None):
+            retention_preview_text.set(pipeline.retention_preview(
+                twitter.adapter, twitter_store, helpers.retention_seconds(
+                    hours_dropdown.get(), days_dropdown.get(), weeks_dropdown.get(), years_dropdown.get())))
+
+        for dropdown in (hours_dropdown, days_dropdown, weeks_dropdown, years_dropdown):
+            dropdown.bind('<<ComboboxSelected>>', update_retention_preview)
+        update_retention_preview()
+
+        retention_preview_label = tk.Label(
+            configuration_frame, textvariable=retention_preview_text)
+
         # Configuration to set saving items with a certain amount of favorites
         current_max_favorites = tk.StringVar()
         if 'max_favorites' in twitter_state:
@@ -645,14 +759,46 @@ class MainApp(tk.Frame):
         modify_whitelist_tweets_button = tk.Button(
             configuration_frame, text='Pick tweets to whitelist',
             command=lambda: twitter.set_twitter_whitelist(
-                root, True, twitter_state)
+                root, True, twitter_state, twitter_store)
         )
         modify_whitelist_favorites_button = tk.Button(
             configuration_frame, text='Pick favorites to whitelist',
             command=lambda: twitter.set_twitter_whitelist(
-                root, False, twitter_state)
+                root, False, twitter_state, twitter_store)
         )
 
+        # Rule based whitelisting
+        keep_rules_label = tk.Label(
+            configuration_frame, text='Keep items matching rules:')
+        keep_rules_button = tk.Button(
+            configuration_frame, text='Edit keep rules',
+            command=lambda: twitter.set_twitter_keep_rules(root, twitter_state)
+        )
+
+        # Order items are deleted in, so a run cut short has deleted the ones that matter most
+        deletion_order_label = tk.Label(
+            configuration_frame, text='Delete first:')
+        deletion_order_dropdown = ttk.Combobox(
+            configuration_frame, width=36, state='readonly',
+            values=list(pipeline.DELETION_ORDERS.values()))
+        deletion_order_dropdown.set(pipeline.DELETION_ORDERS[twitter_state.get(
+            'deletion_order', pipeline.ORDER_OLDEST)])
+        deletion_order_dropdown.bind(
+            '<<ComboboxSelected>>',
+            lambda event: twitter.set_twitter_deletion_order(deletion_order_dropdown.get(), twitter_state))
+        priority_rules_button = tk.Button(
+            configuration_frame, text='Edit priority rules',
+            command=lambda: twitter.set_twitter_priority_rules(root, twitter_state)
+        )
+
+        # Keep a compressed copy of every item before it's gone
+        archive_bool = tk.IntVar()
+        archive_bool.set(twitter_state.get('archive_items', 0))
+        archive_label = tk.Label(
+            configuration_frame, text='Archive items before deleting them:')
+        archive_check_button = tk.Checkbutton(
+            configuration_frame, variable=archive_bool, command=lambda: twitter.set_twitter_archive(archive_bool, twitter_state))
+
         # Allows the user to delete tweets or remove favorites
         deletion_section_label = tk.Label(deletion_frame, text='Deletion')
         deletion_section_label.config(font=('arial', 25))
@@ -673,13 +819,13 @@ class MainApp(tk.Frame):
         delete_comments_button = tk.Button(
             deletion_frame, text='Delete tweets',
             command=lambda: twitter.delete_twitter_tweets(
-                root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, False)
+                root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, twitter_store, False, history=history)
         )
 
         delete_submissions_button = tk.Button(
             deletion_frame, text='Remove Favorites',
             command=lambda: twitter.delete_twitter_favorites(
-                root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, False)
+                root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, twitter_store, False, history=history)
         )
 
         # Allows the user to schedule runs
@@ -707,7 +853,7 @@ class MainApp(tk.Frame):
             variable=scheduler_bool,
             command=lambda: twitter.set_twitter_scheduler(
                 root, scheduler_bool, int(scheduler_hours_dropdown.get()),
-                tk.StringVar(), ttk.Progressbar(), scheduler_currently_set_text, twitter_state))
+                tk.StringVar(), ttk.Progressbar(), scheduler_currently_set_text, twitter_state, twitter_store, history))
 
         # Actually build the twitter tab
         configuration_label.grid(row=0, column=0, sticky='w')
@@ -722,6 +868,7 @@ class MainApp(tk.Frame):
         years_label.grid(row=1, column=8, sticky='w')
         set_time_button.grid(row=1, column=9, columnspan=2)
         time_currently_set_label.grid(row=1, column=11, sticky='w')
+        retention_preview_label.grid(row=1, column=12, sticky='w')
 
         max_favorites_label.grid(row=2, column=0, sticky='w')
         max_favorites_entry_field.grid(
@@ -742,8 +889,18 @@ class MainApp(tk.Frame):
         modify_whitelist_favorites_button.grid(
             row=4, column=5, columnspan=4, sticky='w')
 
+        keep_rules_label.grid(row=5, column=0, sticky='w')
+        keep_rules_button.grid(row=5, column=1, columnspan=4, sticky='w')
+
+        deletion_order_label.grid(row=6, column=0, sticky='w')
+        deletion_order_dropdown.grid(row=6, column=1, columnspan=8, sticky='w')
+        priority_rules_button.grid(row=6, column=9, columnspan=2, sticky='w')
+
+        archive_label.grid(row=7, column=0, sticky='w')
+        archive_check_button.grid(row=7, column=1, sticky='w')
+
         ttk.Separator(configuration_frame, orient=tk.HORIZONTAL).grid(
-            row=5, columnspan=13, sticky='ew', pady=5)
+            row=8, columnspan=13, sticky='ew', pady=5)
 
         deletion_section_label.grid(row=0, sticky='w')
 
@@ -768,6 +925,8 @@ class MainApp(tk.Frame):
 
 if __name__ == '__main__':
     create_storage_folder()
+    # lets monitoring see the running jobs, including scheduled ones
+    status_server.serve_status()
 
     root = tk.Tk()
     root.style = ttk.Style()
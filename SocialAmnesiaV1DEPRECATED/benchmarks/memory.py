@@ -0,0 +1,104 @@
+"""
+Peak memory of planning and executing a whole run, for a small and a very large synthetic history
+(see populators/synthetic.py). Each run happens in its own process so its peak is measured alone,
+and the benchmark fails if any of them goes over the memory ceiling.
+Run from the SocialAmnesiaV1DEPRECATED folder with `python3 -m benchmarks.memory [items ...]`
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils import memory, pipeline, run_history
+from utils.item_store import ItemStore
+
+
+class NullAdapter(pipeline.PlatformAdapter):
+    """
+    Deletes every item without calling any API
+    """
+    platform = 'twitter'
+    kinds = ('tweets',)
+
+    def item_label(self, kind):
+        return 'Tweet'
+
+    def execute(self, record, context):
+        return run_history.DELETED
+
+
+class NullProgress:
+    def start(self, total):
+        pass
+
+    def status(self, text):
+        pass
+
+    def step(self, count, total):
+        pass
+
+
+def run_child(path, kind):
+    """
+    Plans and executes a run over the store at `path` and prints the peak memory in MB
+    """
+    item_store = ItemStore(path)
+    state = {'retention_seconds': 0, f'whitelisted_{kind}': {}}
+    plan = pipeline.Plan(NullAdapter(), kind, state, item_store)
+    deleted_count = pipeline.execute(
+        NullAdapter(), plan, item_store, NullProgress())
+    item_store.close()
+    print(deleted_count, memory.peak_rss_mb())
+
+
+def measure(count, folder):
+    """
+    :return: (deleted items, peak memory in MB, seconds) of a run over `count` synthetic tweets
+    """
+    path = os.path.join(folder, f'tweets-{count}.db')
+    # built in another process too, the peak a child reports starts at its parent's
+    subprocess.run([sys.executable, '-m', 'populators.synthetic', 'twitter', str(count), '--store', path],
+                   check=True)
+
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.memory', '--child', path, 'tweets'],
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    elapsed = time.perf_counter() - started
+    deleted_count, peak = output.split()
+    return int(deleted_count), float(peak), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Peak memory of a run over synthetic histories')
+    parser.add_argument('sizes', type=int, nargs='*',
+                        default=[3200, 300000])
+    parser.add_argument('--ceiling-mb', type=float,
+                        default=memory.MEMORY_CEILING_MB)
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'KIND'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    if memory.peak_rss_mb() is None:
+        sys.exit('peak memory cannot be measured on this platform')
+
+    over_ceiling = False
+    with tempfile.TemporaryDirectory() as folder:
+        for count in args.sizes:
+            deleted_count, peak, elapsed = measure(count, folder)
+            over_ceiling = over_ceiling or peak > args.ceiling_mb
+            print(f'{count:>8} items {deleted_count:>8} deleted {elapsed:>8.2f}s '
+                  f'{peak:>8.1f} MB peak{"  OVER CEILING" if peak > args.ceiling_mb else ""}')
+
+    if over_ceiling:
+        sys.exit(f'peak memory went over the {args.ceiling_mb:.0f} MB ceiling')
+
+
+if __name__ == '__main__':
+    main()
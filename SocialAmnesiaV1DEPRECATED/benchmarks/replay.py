@@ -0,0 +1,192 @@
+"""
+Throughput of gathering and deleting a whole account, replayed from synthetic cassettes
+(see populators/synthetic.py) so it runs offline and gives the same numbers every time.
+Deleting goes through the same Plan and pipeline.execute a real run does, with reddit items
+edited before they are deleted. Fails when a stage is slower than --min-rate items/s.
+Run from the SocialAmnesiaV1DEPRECATED folder with `python3 -m benchmarks.replay [items ...] [--min-rate N]`
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import praw
+import tweepy
+
+from populators import synthetic
+from services import reddit, twitter
+from utils import cassettes, fetcher, pipeline, run_history
+from utils.item_store import ItemStore
+from utils.run_lock import RunLocks
+
+# replays shouldn't wait on the real APIs' rate limits
+UNLIMITED = fetcher.RateBudget(10 ** 9, 1)
+# slowest a stage may go before the benchmark fails, far below what a replay runs at
+# so only a real regression trips it
+MIN_ITEMS_PER_SECOND = 500
+
+# settings deleting every item, edited once before it's deleted on reddit
+REDDIT_STATE = {
+    'reddit_username': synthetic.USERNAME,
+    'retention_seconds': 0,
+    'whitelisted_comments': {},
+    'whitelisted_posts': {},
+    'max_score': 10 ** 9,
+    'gilded_skip': 0,
+    'multi_edit': 0,
+    'only_edit': 0,
+}
+TWITTER_STATE = {
+    'twitter_username': synthetic.USERNAME,
+    'retention_seconds': 0,
+    'whitelisted_tweets': {},
+    'whitelisted_favorites': {},
+    'max_favorites': 10 ** 9,
+    'max_retweets': 10 ** 9,
+}
+
+
+class QuietProgress(pipeline.Progress):
+    """
+    Progress of a run without a window to show it in
+    """
+
+    def __init__(self):
+        pass
+
+    def start(self, total):
+        pass
+
+    def status(self, text):
+        pass
+
+    def step(self, count, total):
+        pass
+
+
+def timed(label, count, function, min_rate):
+    """
+    Runs a stage, failing the benchmark when it went slower than `min_rate` items/s
+    :return: what the stage returned
+    """
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed
+    print(f'{label:>28} {count:>8} items {elapsed:>8.2f}s {rate:>10.0f} items/s')
+    if rate < min_rate:
+        sys.exit(f'{label}: {rate:.0f} items/s, below the minimum of {min_rate}')
+    return result
+
+
+def check(label, expected, actual):
+    """
+    Fails the benchmark when a replay didn't return what the cassette holds,
+    so a cassette that stopped matching the requests can't pass as a fast run
+    """
+    if expected != actual:
+        sys.exit(f'{label}: expected {expected}, got {actual}')
+
+
+def check_answered(label, queued):
+    """
+    Fails the benchmark when some request of the cassette was never made, e.g. an edit that
+    the adapter swallowed the error of
+    :param queued: what cassettes.replaying returned, once the replay is done
+    """
+    unanswered = sum(not recorded['repeat']
+                     for interactions in queued.values() for recorded in interactions)
+    check(f'{label} requests never made', 0, unanswered)
+
+
+def delete_all(adapter, kind, state, item_store, folder):
+    """
+    Plans and executes a run over every stored item of a kind, like a confirmed run
+    :return: how many items were deleted
+    """
+    plan = pipeline.Plan(adapter, kind, state, item_store)
+    history = run_history.RunHistory(os.path.join(folder, f'{adapter.platform}-history.db'))
+    run_locks = RunLocks(os.path.join(folder, 'run_locks.db'))
+    try:
+        lease = run_locks.acquire(plan.context.account, kind)
+        return pipeline.execute(adapter, plan, item_store, QuietProgress(),
+                                history, lease=lease)
+    finally:
+        run_locks.close()
+        history.close()
+
+
+def run_reddit(count, folder, min_rate):
+    path = os.path.join(folder, f'reddit-{count}.json.gz')
+    histories = {'comments': synthetic.generate_records('comments', count),
+                 'posts': synthetic.generate_records('posts', count // 10)}
+    cassettes.save(path, synthetic.reddit_interactions(
+        histories['comments'], histories['posts']))
+    reddit.rate_budget = UNLIMITED
+    item_store = ItemStore(':memory:')
+
+    with cassettes.replaying(path) as queued:
+        reddit.reddit_api = praw.Reddit(client_id='synthetic', client_secret='synthetic',
+                                        user_agent=reddit.USER_AGENT, username=synthetic.USERNAME, password='synthetic')
+        user = reddit.reddit_api.user.me()
+
+        for kind, records in histories.items():
+            timed(f'reddit gather {kind}', len(records),
+                  lambda: item_store.add_all(reddit.listing_records(kind, reddit.reddit_api, str(user))),
+                  min_rate)
+            check(f'reddit {kind} gathered', len(records), item_store.count(kind))
+
+        for kind, records in histories.items():
+            deleted = timed(f'reddit edit+delete {kind}', len(records),
+                            lambda: delete_all(reddit.adapter, kind, REDDIT_STATE, item_store, folder),
+                            min_rate)
+            check(f'reddit {kind} deleted', len(records), deleted)
+            check(f'reddit {kind} left in the store', 0, item_store.count(kind))
+    check_answered('reddit', queued)
+
+
+def run_twitter(count, folder, min_rate):
+    path = os.path.join(folder, f'twitter-{count}.json.gz')
+    histories = {'tweets': synthetic.generate_records('tweets', count),
+                 'favorites': synthetic.generate_records('favorites', count)}
+    cassettes.save(path, synthetic.twitter_interactions(
+        histories['tweets'], histories['favorites']))
+    twitter.rate_budgets = dict.fromkeys(twitter.RATE_LIMITS, UNLIMITED)
+    item_store = ItemStore(':memory:')
+
+    with cassettes.replaying(path) as queued:
+        auth = tweepy.OAuthHandler('synthetic', 'synthetic')
+        auth.set_access_token('synthetic', 'synthetic')
+        twitter.twitter_api = tweepy.API(auth)
+
+        for kind, records in histories.items():
+            timed(f'twitter gather {kind}', len(records),
+                  lambda: twitter.store_items(kind, item_store), min_rate)
+            check(f'twitter {kind} gathered', [(record['id'], record['text']) for record in records],
+                  [(record['id'], record['text']) for record in item_store.iter_items(kind)])
+
+        for kind, records in histories.items():
+            deleted = timed(f'twitter delete {kind}', len(records),
+                            lambda: delete_all(twitter.adapter, kind, TWITTER_STATE, item_store, folder),
+                            min_rate)
+            check(f'twitter {kind} deleted', len(records), deleted)
+            check(f'twitter {kind} left in the store', 0, item_store.count(kind))
+    check_answered('twitter', queued)
+
+
+def run(sizes=(10000,), min_rate=MIN_ITEMS_PER_SECOND):
+    with tempfile.TemporaryDirectory() as folder:
+        for count in sizes:
+            run_reddit(count, folder, min_rate)
+            run_twitter(count, folder, min_rate)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay gathering and deleting synthetic accounts')
+    parser.add_argument('sizes', type=int, nargs='*', default=[10000],
+                        help='items of each kind to replay')
+    parser.add_argument('--min-rate', type=float, default=MIN_ITEMS_PER_SECOND,
+                        help='items/s below which a stage fails the benchmark')
+    args = parser.parse_args()
+    run(args.sizes, args.min_rate)
@@ -0,0 +1,121 @@
+"""
+Checks the run locks hold up across processes: processes racing for the same lease, a lease left
+behind by a process that died, and a lease that couldn't be renewed.
+Run from the SocialAmnesiaV1DEPRECATED folder with `python3 -m benchmarks.run_lock [processes]`
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from utils.run_lock import RunLocks
+
+ACCOUNT = 'twitter:synthetic'
+KIND = 'tweets'
+# short enough that waiting for a lease to go stale doesn't slow the check down
+SHORT_LEASE_SECONDS = 0.6
+
+
+def check(label, expected, actual):
+    """
+    Fails the check when the run locks didn't behave as expected
+    """
+    if expected != actual:
+        sys.exit(f'{label}: expected {expected}, got {actual}')
+    print(f'{label:>40}: ok')
+
+
+def race(path, started, acquired, won):
+    """
+    Tries to take the lease once every racing process is ready, and only lets go of it once every
+    process has tried, so a lease released early can't be taken a second time
+    """
+    run_locks = RunLocks(path)
+    started.wait()
+    lease = run_locks.acquire(ACCOUNT, KIND)
+    won.put(lease is not None)
+    acquired.wait()
+    if lease:
+        lease.release()
+    run_locks.close()
+
+
+def hold_and_die(path, lease_seconds):
+    """
+    Takes the lease and exits without releasing it, like a run that crashed
+    """
+    lease = RunLocks(path).acquire(ACCOUNT, KIND, lease_seconds)
+    os._exit(0 if lease else 1)
+
+
+def check_race(path, processes):
+    started = multiprocessing.Barrier(processes)
+    acquired = multiprocessing.Barrier(processes)
+    won = multiprocessing.Queue()
+    racers = [multiprocessing.Process(target=race, args=(path, started, acquired, won))
+              for _ in range(processes)]
+    for racer in racers:
+        racer.start()
+    results = [won.get() for _ in racers]
+    for racer in racers:
+        racer.join()
+    check(f'{processes} racing processes, winners', 1, results.count(True))
+
+    run_locks = RunLocks(path)
+    lease = run_locks.acquire(ACCOUNT, KIND)
+    check('lease free once the winner released it', True, lease is not None)
+    lease.release()
+    run_locks.close()
+
+
+def check_stale_takeover(path):
+    crashed = multiprocessing.Process(target=hold_and_die, args=(path, SHORT_LEASE_SECONDS))
+    crashed.start()
+    crashed.join()
+    check('crashed process took the lease', 0, crashed.exitcode)
+
+    run_locks = RunLocks(path)
+    check('lease of a crashed run kept until it expires', None, run_locks.acquire(ACCOUNT, KIND))
+    time.sleep(SHORT_LEASE_SECONDS * 1.5)
+    lease = run_locks.acquire(ACCOUNT, KIND)
+    check('expired lease taken over', True, lease is not None)
+    lease.release()
+    run_locks.close()
+
+
+def check_renew_taken_over(path):
+    # another run took the lease over, renewing it finds it isn't ours anymore
+    run_locks = RunLocks(path)
+    lease = run_locks.acquire(ACCOUNT, KIND, SHORT_LEASE_SECONDS)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE leases SET owner = 'another run', expires = ? WHERE account = ? AND kind = ?",
+                           (time.time() + 60, ACCOUNT, KIND))
+    connection.close()
+    time.sleep(SHORT_LEASE_SECONDS)
+    check('lease taken over, held', False, lease.held)
+    lease.release()
+    run_locks.close()
+
+
+def check_renew_raising(path):
+    # the connection to the database is gone, renewing raises
+    run_locks = RunLocks(path)
+    lease = run_locks.acquire(ACCOUNT, KIND, SHORT_LEASE_SECONDS)
+    run_locks.connection.close()
+    time.sleep(SHORT_LEASE_SECONDS)
+    check('renewing raised, held', False, lease.held)
+
+
+def run(processes=8):
+    with tempfile.TemporaryDirectory() as folder:
+        check_race(os.path.join(folder, 'race.db'), processes)
+        check_stale_takeover(os.path.join(folder, 'stale.db'))
+        check_renew_taken_over(os.path.join(folder, 'taken_over.db'))
+        check_renew_raising(os.path.join(folder, 'raising.db'))
+
+
+if __name__ == '__main__':
+    run(*[int(processes) for processes in sys.argv[1:]])
@@ -0,0 +1,69 @@
+"""
+Microbenchmark of the progress and preview snippets (see utils/snippets.py) of long, emoji-dense items.
+Texts are drawn from hundreds of distinct astral characters, the case the old formatting was slowest at.
+Run from the SocialAmnesiaV1DEPRECATED folder with `python3 -m benchmarks.snippets`
+"""
+import random
+import timeit
+
+from utils import helpers, snippets
+
+# emoji, symbols and pictographs (U+1F300 to U+1F5FF) and mathematical letters (U+1D400 to U+1D7FF),
+# over a thousand astral characters between them
+ASTRAL_CHARS = [chr(code) for code in range(0x1F300, 0x1F600)] + \
+    [chr(code) for code in range(0x1D400, 0x1D800)]
+LENGTHS = (snippets.PROGRESS_LENGTH, snippets.PREVIEW_LENGTH)
+
+
+def legacy_format_snippet(text, length):
+    """
+    format_snippet as it was before, calling str.replace once per astral character
+    """
+    snippet = ''
+
+    if len(text) > length:
+        snippet = text[0:length] + '...'
+    else:
+        snippet = text
+    for char in snippet:
+        if ord(char) > 65535:
+            snippet = snippet.replace(char, '')
+    return snippet
+
+
+def build_text(length, astral_ratio):
+    return ''.join(random.choice(ASTRAL_CHARS) if random.random() < astral_ratio else random.choice('abcdef ')
+                   for _ in range(length))
+
+
+def run():
+    random.seed(0)
+    print(f'{"text length":>12} {"astral ratio":>12} {"legacy us":>10} {"single pass us":>15} {"cached us":>10}')
+
+    # tweets, long comments, and reddit's 10,000 char limit
+    for length, astral_ratio in [(280, 0.1), (280, 0.5), (2000, 0.5), (10000, 0.5), (10000, 1.0)]:
+        texts = [build_text(length, astral_ratio) for _ in range(200)]
+        records = [{'kind': 'tweets', 'id': index, 'text': text} for index, text in enumerate(texts)]
+        assert all(legacy_format_snippet(text, snippet_length) == helpers.format_snippet(text, snippet_length)
+                   for text in texts for snippet_length in LENGTHS)
+
+        cache = snippets.SnippetCache()
+        for record in records:
+            cache.prime(record)
+
+        def timed(statement):
+            # per item, both of its snippets
+            return min(timeit.repeat(statement, number=5, repeat=3)) / (5 * len(texts)) * 1e6
+
+        legacy = timed(lambda: [legacy_format_snippet(text, snippet_length)
+                                for text in texts for snippet_length in LENGTHS])
+        single_pass = timed(lambda: [helpers.format_snippet(text, snippet_length)
+                                     for text in texts for snippet_length in LENGTHS])
+        cached = timed(lambda: [cache.get(record['kind'], record['id'], record['text'], snippet_length)
+                                for record in records for snippet_length in LENGTHS])
+
+        print(f'{length:>12} {astral_ratio:>12} {legacy:>10.1f} {single_pass:>15.1f} {cached:>10.2f}')
+
+
+if __name__ == '__main__':
+    run()
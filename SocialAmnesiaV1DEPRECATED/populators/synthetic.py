@@ -0,0 +1,316 @@
+"""
+Builds synthetic reddit and twitter histories offline, written straight into an item store
+or into a cassette that stands in for the real APIs (see utils/cassettes.py).
+Run from the SocialAmnesiaV1DEPRECATED folder, e.g.
+    python3 -m populators.synthetic twitter 100000 --store /tmp/items.db
+    python3 -m populators.synthetic reddit 10000 --cassette /tmp/reddit.json.gz
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from utils import cassettes, helpers
+from utils.item_store import ItemStore
+
+REDDIT_OAUTH_URL = 'https://oauth.reddit.com'
+TWITTER_API_URL = 'https://api.twitter.com/1.1'
+USERNAME = 'synthetic_user'
+
+WORDS = ('the past is gone forget it all nobody remembers that phase honestly this '
+         'take aged badly lol great point thanks for sharing agree completely').split()
+# top 10 twitter emojis (http://www.emojitracker.com/)
+EMOJIS = '😂❤😍😭😊😒💕😘🔥👍'
+SUBREDDITS = ('socialamnesiatest', 'AskReddit', 'python', 'pics', 'news', 'gaming')
+
+DEFAULTS = {
+    # how far back the history goes
+    'span_days': 5 * 365,
+    # > 1 makes recent items more common than old ones
+    'recency_skew': 1.5,
+    # scores follow a log-normal distribution, like real vote counts
+    'score_median': 3,
+    'score_spread': 1.4,
+    'downvoted_ratio': 0.05,
+    'gilded_ratio': 0.005,
+    'retweeted_ratio': 0.15,
+    'reply_ratio': 0.6,
+    'media_ratio': 0.1,
+    # share of words replaced by an emoji
+    'emoji_density': 0.05,
+    # share of submissions linking somewhere instead of being self posts
+    'link_ratio': 0.4,
+    'words_per_item': 25,
+}
+
+
+def to_base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    text = ''
+    while True:
+        number, digit = divmod(number, 36)
+        text = digits[digit] + text
+        if not number:
+            return text
+
+
+def build_corpus(rng, settings, size=65536):
+    """
+    Builds a long run of words the item texts are cut from, so building 100k items
+    doesn't mean drawing millions of random words
+    :param rng: random generator
+    :param settings: DEFAULTS with overrides
+    :param size: how many words
+    :return: list of words and emojis
+    """
+    # emojis get `emoji_density` of the total weight between them
+    word_weight = (1 - settings['emoji_density']) / len(WORDS)
+    emoji_weight = settings['emoji_density'] / len(EMOJIS)
+    return rng.choices(list(WORDS) + list(EMOJIS),
+                       cum_weights=list(accumulate(
+                           [word_weight] * len(WORDS) + [emoji_weight] * len(EMOJIS))),
+                       k=size)
+
+
+def build_text(rng, settings, corpus):
+    words = min(len(corpus), max(1, int(rng.expovariate(1 / settings['words_per_item']))))
+    start = rng.randrange(len(corpus) - words + 1)
+    return ' '.join(corpus[start:start + words])
+
+
+def generate_records(kind, count, seed=0, now=None, **settings):
+    """
+    Builds a synthetic history of one kind of item
+    :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+    :param count: how many items to build
+    :param seed: seed of the random generator, the same seed builds the same history
+    :param now: epoch seconds of the newest possible item, defaults to now
+    :param settings: overrides of DEFAULTS
+    :return: list of item records (see `to_record` in the services), newest first
+    """
+    settings = dict(DEFAULTS, **settings)
+    rng = random.Random(f'{seed}-{kind}')
+    now = int(now or time.time())
+    span = settings['span_days'] * helpers.DAY_SECONDS
+
+    ages = sorted(int(span * rng.random() ** settings['recency_skew'])
+                  for _ in range(count))
+    corpus = build_corpus(rng, settings)
+
+    records = []
+    for index, age in enumerate(ages):
+        score = int(rng.lognormvariate(
+            math.log(settings['score_median']), settings['score_spread']))
+        if rng.random() < settings['downvoted_ratio']:
+            score = -score
+        record = {
+            'kind': kind,
+            'created': now - age,
+            'text': build_text(rng, settings, corpus),
+            'score': score,
+            'is_reply': False,
+            'has_media': False,
+            'refreshed': now,
+        }
+
+        if kind in ('comments', 'posts'):
+            record.update(
+                id=to_base36(36 ** 6 + count - index),
+                gilded=int(rng.random() < settings['gilded_ratio']),
+                subreddit=rng.choice(SUBREDDITS),
+            )
+            if kind == 'comments':
+                record['is_reply'] = rng.random() < settings['reply_ratio']
+            else:
+                record['url'] = 'https://example.com/' + to_base36(index) \
+                    if rng.random() < settings['link_ratio'] else None
+                record['has_media'] = bool(record['url']) and \
+                    rng.random() < settings['media_ratio']
+        else:
+            created_ms = record['created'] * 1000
+            retweeted = kind == 'tweets' and rng.random() < settings['retweeted_ratio']
+            record.update(
+                id=((created_ms - helpers.TWITTER_EPOCH_MS) << 22) + (count - index) % 4096,
+                retweets=int(rng.lognormvariate(0, settings['score_spread'])),
+                retweeted=retweeted,
+                is_reply=not retweeted and rng.random() < settings['reply_ratio'] / 2,
+                has_media=rng.random() < settings['media_ratio'],
+            )
+            if retweeted:
+                record['text'] = f'RT @{USERNAME}: ' + record['text']
+
+        records.append(record)
+
+    return records
+
+
+def reddit_thing(record):
+    """
+    :param record: synthetic comment or submission record
+    :return: the record as reddit's API returns it in a listing
+    """
+    data = {
+        'id': record['id'],
+        'created_utc': record['created'],
+        'score': record['score'],
+        'gilded': record['gilded'],
+        'subreddit': record['subreddit'],
+        'author': USERNAME,
+    }
+    if record['kind'] == 'comments':
+        thing = 't1'
+        data.update(body=record['text'], link_id='t3_root',
+                    parent_id='t1_parent' if record['is_reply'] else 't3_root')
+    else:
+        thing = 't3'
+        data.update(title=record['text'], is_self=not record['url'],
+                    selftext='' if record['url'] else record['text'],
+                    url=record['url'] or f'https://www.reddit.com/comments/{record["id"]}')
+        if record['has_media']:
+            data['post_hint'] = 'image'
+    data['name'] = f'{thing}_{record["id"]}'
+    return {'kind': thing, 'data': data}
+
+
+def reddit_interactions(comments, posts, page_size=100):
+    """
+    Builds a cassette answering login, both listings, and the edit then delete of every item of a synthetic
+    reddit account. Edits and deletes are answered once per item, so a replay can tell every one was made.
+    :param comments: comment records, newest first
+    :param posts: submission records, newest first
+    :param page_size: items per listing page
+    :return: list of interactions
+    """
+    interactions = [
+        cassettes.interaction('POST', 'https://www.reddit.com/api/v1/access_token', repeat=True, body={
+            'access_token': 'synthetic', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'}),
+        cassettes.interaction('GET', f'{REDDIT_OAUTH_URL}/api/v1/me', repeat=True,
+                              body={'name': USERNAME, 'id': 'synthetic'}),
+    ]
+
+    for path, records in (('comments', comments), ('submitted', posts)):
+        params = {'sort': 'new'}
+        pages = list(helpers.chunked(records, page_size))
+        # a full last page makes praw ask for one more
+        if not pages or len(pages[-1]) == page_size:
+            pages.append([])
+
+        for page in pages:
+            children = [reddit_thing(record) for record in page]
+            after = children[-1]['data']['name'] if len(
+                page) == page_size else None
+            interactions.append(cassettes.interaction(
+                'GET', f'{REDDIT_OAUTH_URL}/user/{USERNAME}/{path}', params,
+                body={'kind': 'Listing', 'data': {'after': after, 'before': None, 'children': children}}))
+            params = {'sort': 'new', 'after': after}
+
+    # the item is sent in the form data, not the URL, so every edit (and every delete) shares its request key
+    for record in comments + posts:
+        interactions.append(cassettes.interaction(
+            'POST', f'{REDDIT_OAUTH_URL}/api/editusertext', body={
+                'json': {'errors': [], 'data': {'things': [reddit_thing(record)]}}}))
+        interactions.append(cassettes.interaction(
+            'POST', f'{REDDIT_OAUTH_URL}/api/del', body={}))
+
+    return interactions
+
+
+def twitter_status(record):
+    """
+    :param record: synthetic tweet or favorite record
+    :return: the record as twitter's API returns it
+    """
+    entities = {'hashtags': [], 'urls': [], 'user_mentions': []}
+    if record['has_media']:
+        entities['media'] = [{'type': 'photo'}]
+    return {
+        'id': record['id'],
+        'id_str': str(record['id']),
+        'created_at': datetime.fromtimestamp(record['created'], timezone.utc)
+        .strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        # the timelines are asked for in extended mode
+        'full_text': record['text'],
+        'favorite_count': record['score'],
+        'retweet_count': record['retweets'],
+        'retweeted': record['retweeted'],
+        'favorited': record['kind'] == 'favorites',
+        'in_reply_to_status_id': record['id'] - 1 if record['is_reply'] else None,
+        'entities': entities,
+    }
+
+
+def twitter_interactions(tweets, favorites, page_size=200):
+    """
+    Builds a cassette answering both timelines and deletes of a synthetic twitter account
+    :param tweets: tweet records, newest first
+    :param favorites: favorite records, newest first
+    :param page_size: items per timeline page
+    :return: list of interactions
+    """
+    interactions = []
+    # the slim timeline parameters services/twitter.py sends when no keep-rule looks at media
+    timelines = (
+        ('statuses/user_timeline', tweets,
+         {'count': 200, 'trim_user': True, 'include_rts': True, 'tweet_mode': 'extended', 'include_entities': False}),
+        ('favorites/list', favorites, {'count': 200, 'tweet_mode': 'extended', 'include_entities': False}),
+    )
+
+    for path, records, params in timelines:
+        for page in helpers.chunked(records, page_size):
+            interactions.append(cassettes.interaction(
+                'GET', f'{TWITTER_API_URL}/{path}.json', params,
+                body=[twitter_status(record) for record in page]))
+            params = dict(params, max_id=page[-1]['id'] - 1)
+        # the empty page marking the end of the timeline
+        interactions.append(cassettes.interaction(
+            'GET', f'{TWITTER_API_URL}/{path}.json', params, body=[]))
+
+    interactions.extend(
+        cassettes.interaction(
+            'POST', f'{TWITTER_API_URL}/statuses/destroy/{record["id"]}.json', body={})
+        for record in tweets)
+    interactions.extend(
+        cassettes.interaction(
+            'POST', f'{TWITTER_API_URL}/favorites/destroy.json', {'id': record['id']}, body={})
+        for record in favorites)
+
+    return interactions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build a synthetic reddit or twitter history')
+    parser.add_argument('platform', choices=('reddit', 'twitter'))
+    parser.add_argument('count', type=int,
+                        help='items of each kind to build')
+    parser.add_argument('--store', help='item store database to fill')
+    parser.add_argument('--cassette', help='cassette file to write')
+    parser.add_argument('--seed', type=int, default=0)
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name.replace("_", "-")}',
+                            type=type(default), default=default)
+    args = parser.parse_args()
+
+    if not args.store and not args.cassette:
+        parser.error('pass --store, --cassette or both')
+
+    settings = {name: getattr(args, name) for name in DEFAULTS}
+    kinds = ('comments', 'posts') if args.platform == 'reddit' else (
+        'tweets', 'favorites')
+    histories = [generate_records(kind, args.count, args.seed, **settings)
+                 for kind in kinds]
+
+    if args.store:
+        item_store = ItemStore(args.store)
+        for records in histories:
+            item_store.add_all(records)
+        item_store.close()
+    if args.cassette:
+        build = reddit_interactions if args.platform == 'reddit' else twitter_interactions
+        cassettes.save(args.cassette, build(*histories))
+
+
+if __name__ == '__main__':
+    main()
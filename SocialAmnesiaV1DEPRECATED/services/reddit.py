@@ -1,129 +1,237 @@
-from utils import helpers
-import os
-from datetime import datetime
-from pathlib import Path
-import arrow
+from utils import credentials, fetcher, helpers, importers, oauth_callback, pipeline, rate_governor, rules, run_history, snippets
 import praw
-import tkinter as tk
-import tkinter.ttk as ttk
-from tkinter import messagebox
+import prawcore
+from tkinter import filedialog, messagebox
 import webbrowser
-import shelve
 import sys
 import random
-import socket
 import string
+import time
+from typing import NamedTuple
 sys.path.insert(0, "../utils")
 
 USER_AGENT = 'Social Amnesia (by /u/JavaOffScript)'
 EDIT_OVERWRITE = 'Wiped by Social Amnesia'
+# fewest and most random edits made before deleting, with multi edit on
+MULTI_EDIT_PASSES = (5, 10)
+# most fullnames /api/info accepts per call
+INFO_BATCH_SIZE = 100
+# items per page of a praw listing
+LISTING_PAGE_SIZE = 100
 
-# neccesary global bool for the scheduler
-alreadyRanBool = False
+# reddit allows 60 calls a minute per OAuth client
+RATE_LIMIT = (60, 60)
+# shared by every fetching thread, and by every process once logged in (see share_rate_budget)
+rate_budget = fetcher.RateBudget(*RATE_LIMIT)
 
+# the redirect registered with the reddit app, reddit only sends the browser back to exactly this
+REDIRECT_PORT = 8080
+REDIRECT_URI = f'http://localhost:{REDIRECT_PORT}'
 
-def close_window(window, reddit_state, window_key):
-    reddit_state[window_key] = 0
-    reddit_state.sync
-    window.destroy()
-
-
-def build_window(root, window, title_text):
-    def onFrameConfigure(canvas):
-        '''Reset the scroll region to encompass the inner frame'''
-        canvas.configure(scrollregion=canvas.bbox('all'))
+# prawcore releases whose authorizers keep their token in access_token, _expiration_timestamp and scopes,
+# and drop it and refresh when reddit answers 401, so a cached token that stopped working costs one retry.
+# With any other release the token isn't cached, praw requests one like it would without a cache.
+TOKEN_CACHE_PRAWCORE_VERSIONS = ('1.',)
 
-    canvas = tk.Canvas(window, width=750, height=1000)
-    frame = tk.Frame(canvas)
+reddit_api = {}
+# CallbackServer waiting for the browser step of a login, if one is in progress
+pending_login = None
 
-    scrollbar = tk.Scrollbar(window, command=canvas.yview)
-    canvas.configure(yscrollcommand=scrollbar.set)
 
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    canvas.create_window((4, 4), window=frame, anchor="nw")
+def to_record(data, identifying_text):
+    """
+    Picks the fields the filters work on out of a comment or submission as the listing returned it,
+    praw's models are never built for listing items
+    :param data: the `data` of a listing child
+    :param identifying_text: 'comments' or 'posts'
+    :return: dict describing the item
+    """
+    if identifying_text == 'comments':
+        text = data['body']
+        is_reply = not data['parent_id'].startswith('t3_')
+        has_media = False
+    else:
+        text = data['title']
+        is_reply = False
+        has_media = bool(data.get('media')) or data.get('post_hint', '') == 'image'
+
+    record = {
+        'id': data['id'],
+        'kind': identifying_text,
+        'created': int(data['created_utc']),
+        'text': text,
+        'score': data['score'],
+        'gilded': data['gilded'],
+        'subreddit': data['subreddit'],
+        'is_reply': is_reply,
+        'has_media': has_media,
+        'refreshed': int(time.time()),
+    }
+    if identifying_text == 'posts':
+        # the text of self posts, kept so archiving a post keeps all of it
+        record['body'] = data.get('selftext', '')
+    return record
 
-    title_label = tk.Label(
-        frame, text=title_text, font=('arial', 30))
 
-    frame.bind("<Configure>", lambda event,
-               canvas=canvas: onFrameConfigure(canvas))
+def initialize_state(reddit_state):
+    """
+    Sets up the reddit state
+    :param reddit_state: dictionary holding reddit settings
+    :return: none
+    """
+    helpers.check_for_existence('retention_seconds', reddit_state,
+                        helpers.saved_retention_seconds(reddit_state))
+    helpers.check_for_existence('max_score', reddit_state, 0)
+    helpers.check_for_existence('gilded_skip', reddit_state, 0)
+    helpers.check_for_existence('multi_edit', reddit_state, 0)
+    helpers.check_for_existence('only_edit', reddit_state, 0)
+    helpers.check_for_existence('whitelisted_comments', reddit_state, {})
+    helpers.check_for_existence('whitelisted_posts', reddit_state, {})
+    helpers.check_for_existence('keep_rules', reddit_state, [])
+    helpers.check_for_existence('priority_rules', reddit_state, [])
+    helpers.check_for_existence('deletion_order', reddit_state, pipeline.ORDER_OLDEST)
+    helpers.check_for_existence('archive_items', reddit_state, 0)
+    helpers.check_for_existence('scheduled_time', reddit_state, 0)
+    helpers.check_for_existence('reddit_username', reddit_state, '')
+    helpers.check_for_existence('reddit_client_id', reddit_state, '')
 
-    title_label.grid(
-        row=0, column=0, columnspan=2, sticky='w')
+    reddit_state['scheduler_bool'] = 0
+    reddit_state['whitelist_window_open'] = 0
+    reddit_state['confirmation_window_open'] = 0
+    reddit_state.sync
 
-    ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-        row=2, columnspan=2, sticky='ew', pady=5)
 
-    return frame
+def authorizer(reddit):
+    """
+    :param reddit: praw.Reddit
+    :return: the prawcore authorizer handing out the instance's access tokens, None if praw has none
+    or the installed prawcore isn't one of TOKEN_CACHE_PRAWCORE_VERSIONS
+    """
+    if not prawcore.__version__.startswith(TOKEN_CACHE_PRAWCORE_VERSIONS):
+        return None
+    return getattr(getattr(reddit, '_core', None), '_authorizer', None)
 
 
-def check_for_existence(string, reddit_state, value):
+def cache_access_token(reddit, reddit_state):
     """
-    Initialize a key/value pair if it doesn't already exist.
-    :param string: the key
+    Caches the access token praw is using, so the next launch doesn't have to request one
+    :param reddit: praw.Reddit
     :param reddit_state: dictionary holding reddit settings
-    :param value: the value
     :return: none
     """
-    if string not in reddit_state:
-        reddit_state[string] = value
+    reddit_authorizer = authorizer(reddit)
+    if reddit_authorizer is not None and reddit_authorizer.is_valid():
+        credentials.CredentialStore(reddit_state).cache_token(
+            reddit_authorizer.access_token, reddit_authorizer._expiration_timestamp)
 
 
-def initialize_state(reddit_state):
+def share_rate_budget(client_id):
     """
-    Sets up the reddit state
-    :param reddit_state: dictionary holding reddit settings
+    Switches to the rate budget every process using the same reddit app shares,
+    so they don't each spend the app's whole limit
+    :param client_id: client id of the reddit app
     :return: none
     """
-    check_for_existence('time_to_save', reddit_state,
-                        arrow.now().replace(hours=0))
-    check_for_existence('max_score', reddit_state, 0)
-    check_for_existence('gilded_skip', reddit_state, 0)
-    check_for_existence('multi_edit', reddit_state, 0)
-    check_for_existence('only_edit', reddit_state, 0)
-    check_for_existence('whitelisted_comments', reddit_state, {})
-    check_for_existence('whitelisted_posts', reddit_state, {})
-    check_for_existence('scheduled_time', reddit_state, 0)
-    check_for_existence('refresh_token', reddit_state, '')
-    check_for_existence('reddit_username', reddit_state, '')
-    check_for_existence('reddit_password', reddit_state, '')
-    check_for_existence('reddit_client_id', reddit_state, '')
-    check_for_existence('reddit_client_secret', reddit_state, '')
+    global rate_budget
+    rate_budget = rate_governor.open_rate_governor().budget(
+        f'reddit:{client_id}', 'oauth', *RATE_LIMIT)
+
+
+def reported_limits(reddit):
+    """
+    :param reddit: praw.Reddit
+    :return: (calls remaining, epoch seconds the period resets at) from the headers of
+    the last response, None before the first request
+    """
+    limits = reddit.auth.limits
+    if limits['remaining'] is None or limits['reset_timestamp'] is None:
+        return None
+    return limits['remaining'], limits['reset_timestamp']
 
-    reddit_state['scheduler_bool'] = 0
-    reddit_state['whitelist_window_open'] = 0
-    reddit_state['confirmation_window_open'] = 0
-    reddit_state.sync
+
+def limited_call(reddit, function, *args):
+    """
+    Makes an API call within the rate budget, correcting the budget with the headers of the response
+    :param reddit: praw.Reddit making the call
+    :param function: the call, e.g. reddit.request or comment.delete
+    :param args: arguments of the call
+    :return: what the call returns
+    """
+    rate_budget.acquire()
+    try:
+        return fetcher.timed_call(function, *args)
+    finally:
+        limits = reported_limits(reddit)
+        if limits:
+            rate_budget.observe(*limits)
+
+
+def build_reddit(reddit_state):
+    """
+    Creates a praw reddit instance from the stored login without any network round trip,
+    praw only requests an access token on first API use and not at all while the cached one is valid
+    :param reddit_state: dictionary holding reddit settings
+    :return: praw.Reddit
+    """
+    secrets = credentials.CredentialStore(reddit_state)
+    stored = secrets.load()
+
+    if stored.get('refresh_token'):
+        reddit = praw.Reddit(
+            client_id=reddit_state['reddit_client_id'],
+            client_secret=stored.get('reddit_client_secret'),
+            user_agent=USER_AGENT,
+            refresh_token=stored['refresh_token']
+        )
+    else:
+        reddit = praw.Reddit(
+            client_id=reddit_state['reddit_client_id'],
+            client_secret=stored.get('reddit_client_secret'),
+            user_agent=USER_AGENT,
+            username=reddit_state['reddit_username'],
+            password=stored.get('reddit_password'),
+        )
+
+    cached = secrets.cached_token()
+    reddit_authorizer = authorizer(reddit)
+    # a cached token reddit no longer accepts is answered with a 401, prawcore then refreshes it the usual way
+    if cached and reddit_authorizer is not None:
+        reddit_authorizer.access_token, reddit_authorizer._expiration_timestamp = cached
+        reddit_authorizer.scopes = {'*'}
+    return reddit
 
 
 def initialize_reddit_user(login_confirm_text, reddit_state):
     """
-    Looks for if a praw reddit user already exists, and if so logs in with it
+    Looks for if a praw reddit user already exists, and if so logs in with it.
+    Uses the username cached at login, so starting the app doesn't wait on reddit.
     :param login_confirm_text: The UI text saying "logged in as USER"
     :param reddit_state: dictionary holding reddit settings
     :return: none
     """
+    global reddit_api
+
+    credentials.CredentialStore(reddit_state).migrate(
+        'reddit_password', 'reddit_client_secret', 'refresh_token')
+    # older versions pickled a praw Redditor here, which drags the whole login along with it.
+    # Deleting a shelf key doesn't unpickle it.
+    if 'user' in reddit_state:
+        del reddit_state['user']
+        reddit_state.sync
+
+    if not reddit_state.get('reddit_client_id'):
+        return
+
     try:
-        if (reddit_state['refresh_token']):
-            reddit = praw.Reddit(
-                client_id=reddit_state['reddit_client_id'],
-                client_secret=reddit_state['reddit_client_secret'],
-                user_agent=USER_AGENT,
-                refresh_token=reddit_state['refresh_token']
-            )
-        else:
-            reddit = praw.Reddit(
-                client_id=reddit_state['reddit_client_id'],
-                client_secret=reddit_state['reddit_client_secret'],
-                user_agent=USER_AGENT,
-                username=reddit_state['reddit_username'],
-                password=reddit_state['reddit_password'],
-            )
-        reddit.user.me()
+        reddit = build_reddit(reddit_state)
+        share_rate_budget(reddit_state['reddit_client_id'])
 
-        reddit_username = str(reddit.user.me())
-        reddit_state['user'] = reddit.redditor(reddit_username)
+        reddit_username = reddit_state.get('reddit_username')
+        if not reddit_username:
+            reddit_username = str(reddit.user.me())
+            reddit_state['reddit_username'] = reddit_username
+
+        reddit_api = reddit
 
         login_confirm_text.set(f'Logged in to Reddit as {reddit_username}')
 
@@ -132,9 +240,12 @@ def initialize_reddit_user(login_confirm_text, reddit_state):
         pass
 
 
-def set_reddit_login(username, password, client_id, client_secret, login_confirm_text, reddit_state):
+def set_reddit_login(root, username, password, client_id, client_secret, login_confirm_text, reddit_state):
     """
-    Logs into reddit using PRAW, gives user an error on failure
+    Logs into reddit using PRAW, gives user an error on failure.
+    Accounts that need the browser step are logged in once the browser comes back,
+    the UI keeps running in the meantime.
+    :param root: the reference to the actual tkinter GUI window
     :param username: input received from the UI
     :param password: input received from the UI
     :param client_id: input received from the UI
@@ -143,26 +254,11 @@ def set_reddit_login(username, password, client_id, client_secret, login_confirm
     :param reddit_state: dictionary holding reddit settings
     :return: none
     """
+    global pending_login
 
-    def receive_connection():
-        """
-        Wait for and then return a connected socket..
-        Opens a TCP connection on port 8080, and waits for a single client.
-        """
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind(('localhost', 8080))
-        server.listen(1)
-        client = server.accept()[0]
-        server.close()
-        return client
-
-    def send_message(client, message):
-        """
-        Send message to client and close the connection.
-        """
-        client.send('HTTP/1.1 200 OK\r\n\r\n{}'.format(message).encode('utf-8'))
-        client.close()
+    if pending_login is not None:
+        pending_login.cancel()
+        pending_login = None
 
     reddit = praw.Reddit(
         client_id=client_id,
@@ -170,62 +266,69 @@ def set_reddit_login(username, password, client_id, client_secret, login_confirm
         user_agent=USER_AGENT,
         username=username,
         password=password,
-        redirect_uri='http://localhost:8080',
+        redirect_uri=REDIRECT_URI,
     )
 
-    login_failure = False
+    def finish_login(refresh_token=''):
+        global reddit_api
+
+        reddit_username = str(reddit.user.me())
 
-    try:
-        reddit.user.me()
-        reddit_state['refresh_token'] = ''
-    except Exception as err:
-        if (str(err) != 'invalid_grant error processing request'):
-            login_failure = True
-        else:
-            state = str(random.randint(0, 65000))
-            url = reddit.auth.url(
-                ['identity', 'history', 'read', 'edit'], state, 'permanent')
-            message = 'We will now open a window in your browser to complete the login process to reddit. Please ensure you are logged into reddit before clicking okay in this box.'
-            messagebox.showinfo('Additional Login Step', message)
-            webbrowser.open(url)
-
-            client = receive_connection()
-            data = client.recv(1024).decode('utf-8')
-            param_tokens = data.split(' ', 2)[1].split('?', 1)[1].split('&')
-            params = {key: value for (key, value) in [token.split('=')
-                                                      for token in param_tokens]}
-
-            if state != params['state']:
-                send_message(client, 'State mismatch. Expected: {} Received: {}'
-                             .format(state, params['state']))
-                return 1
-            elif 'error' in params:
-                send_message(client, params['error'])
-                return 1
-
-            refresh_token = reddit.auth.authorize(params['code'])
-            send_message(client, 'Refresh token: {}'.format(refresh_token))
-
-            reddit_state['refresh_token'] = refresh_token
-
-    reddit_username = str(reddit.user.me())
-
-    if not login_failure:
         if reddit_username == 'None':
-            login_confirm_text.set(f'Failed to login!')
+            login_confirm_text.set('Failed to login!')
         else:
-            reddit_state['reddit_username'] = username
-            reddit_state['reddit_password'] = password
+            # the name reddit knows the account by, shown at the next launch without asking reddit again
+            reddit_state['reddit_username'] = reddit_username
             reddit_state['reddit_client_id'] = client_id
-            reddit_state['reddit_client_secret'] = client_secret
+            credentials.CredentialStore(reddit_state).update(
+                reddit_password=password, reddit_client_secret=client_secret, refresh_token=refresh_token)
+            cache_access_token(reddit, reddit_state)
 
-            reddit_state['user'] = reddit.redditor(reddit_username)
+            reddit_api = reddit
+            share_rate_budget(client_id)
             login_confirm_text.set(f'Logged in to Reddit as {reddit_username}')
 
             initialize_state(reddit_state)
             reddit_state.sync
-    else:
-        login_confirm_text.set(f'Failed to login!')
+
+    def browser_returned(future):
+        global pending_login
+        pending_login = None
+
+        if future.cancelled():
+            return
+        try:
+            finish_login(reddit.auth.authorize(future.result()))
+        except Exception:
+            login_confirm_text.set('Failed to login!')
+
+    try:
+        reddit.user.me()
+    except Exception as err:
+        if (str(err) != 'invalid_grant error processing request'):
+            login_confirm_text.set('Failed to login!')
+            return
+
+        state = str(random.randint(0, 65000))
+        try:
+            pending_login = oauth_callback.CallbackServer(
+                state, REDIRECT_PORT).start()
+        except OSError:
+            login_confirm_text.set(
+                f'Failed to login! Port {REDIRECT_PORT} is in use.')
+            return
+
+        url = reddit.auth.url(
+            ['identity', 'history', 'read', 'edit'], state, 'permanent')
+        message = 'We will now open a window in your browser to complete the login process to reddit. Please ensure you are logged into reddit before clicking okay in this box.'
+        messagebox.showinfo('Additional Login Step', message)
+        webbrowser.open(url)
+
+        login_confirm_text.set('Waiting for the browser to finish logging in...')
+        oauth_callback.when_done(root, pending_login.future, browser_returned)
+        return
+
+    finish_login()
 
 
 def set_reddit_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to_save, current_time_to_save, reddit_state):
@@ -237,7 +340,7 @@ def set_reddit_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to
     reddit_state['weeks'] = weeks_to_save
     reddit_state['years'] = years_to_save
 
-    reddit_state['time_to_save'] = helpers.set_time_to_save(
+    reddit_state['retention_seconds'] = helpers.set_time_to_save(
         hours_to_save, days_to_save, weeks_to_save, years_to_save, current_time_to_save)
     reddit_state.sync
 
@@ -284,246 +387,285 @@ def set_only_edit(only_edit_bool, reddit_state):
     reddit_state.sync
 
 
-def delete_reddit_items(root, comment_bool, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, reddit_state, scheduled_bool):
+def listing_pages(reddit, path, page_size=LISTING_PAGE_SIZE):
     """
-    Deletes the items according to user configurations.
-    :param root: the reference to the actual tkinter GUI window
-    :param comment_bool: true if deleting comments, false if deleting submissions
-    :param currently_deleting_text: Describes the item that is currently being deleted.
-    :param deletion_progress_bar: updates as the items are looped through
-    :param num_deleted_items_text: updates as X out of Y comments are looped through
-    :param reddit_state: dictionary holding reddit settings
-    :param scheduled_bool: True if a scheduled run, False if triggered manually
-    :return: none
+    Pages through a listing within the shared rate budget. Reddit has no way to ask for fewer fields,
+    so the pages are kept as the JSON reddit sent instead of being turned into praw models.
+    :param reddit: praw.Reddit
+    :param path: path of the listing, e.g. 'user/name/comments/'
+    :param page_size: items per page
+    :return: generator of lists of the `data` of the listing's children
     """
-    if reddit_state['confirmation_window_open'] == 1 and not scheduled_bool:
-        return
+    params = {'sort': 'new', 'limit': page_size, 'raw_json': 1}
 
-    confirmation_window = tk.Toplevel(root)
-    reddit_state['confirmation_window_open'] = 1
-    reddit_state.sync
+    while True:
+        listing = limited_call(reddit, reddit.request, 'GET', path, params)['data']
+        page = [child['data'] for child in listing['children']]
+        if page:
+            yield page
+        if not listing['after']:
+            return
+        params = dict(params, after=listing['after'])
 
-    confirmation_window.protocol(
-        'WM_DELETE_WINDOW', lambda: close_window(confirmation_window, reddit_state, 'confirmation_window_open'))
 
-    frame = build_window(root, confirmation_window,
-                         f"The following {'comments' if comment_bool else 'posts'} will be deleted/edited")
+def listing_records(identifying_text, reddit, username, prefetch_depth=fetcher.PREFETCH_DEPTH):
+    """
+    Walks the user's comments or submissions listing, fetching the next pages while the current one is being processed
+    :param identifying_text: 'comments' or 'posts'
+    :param reddit: praw.Reddit, praw instances aren't thread safe so every listing walked at the same time needs its own
+    :param username: name of the logged in user
+    :param prefetch_depth: how many pages to fetch ahead
+    :return: generator of item records
+    """
+    listing = 'comments' if identifying_text == 'comments' else 'submitted'
+    pages = listing_pages(reddit, f'user/{username}/{listing}/')
 
-    if comment_bool:
-        total_items = sum(
-            1 for _ in reddit_state['user'].comments.new(limit=None))
-        item_array = reddit_state['user'].comments.new(limit=None)
-        identifying_text = 'comments'
-    else:
-        total_items = sum(
-            1 for _ in reddit_state['user'].submissions.new(limit=None))
-        item_array = reddit_state['user'].submissions.new(limit=None)
-        identifying_text = 'posts'
+    for page in fetcher.prefetch(pages, prefetch_depth):
+        for data in page:
+            yield snippets.cache.prime(to_record(data, identifying_text))
 
-    num_deleted_items_text.set(f'0/{str(total_items)} items processed so far')
 
-    button_frame = tk.Frame(frame)
-    button_frame.grid(row=1, column=0, sticky='w')
+def gather_items(identifying_text, reddit_state, item_store):
+    """
+    Walks the user's comments or submissions listing and adds every item in it to the item store
+    :param identifying_text: 'comments' or 'posts'
+    :param reddit_state: dictionary holding reddit settings
+    :param item_store: ItemStore holding the reddit items
+    :return: how many items the listing returned
+    """
+    return item_store.add_all(listing_records(identifying_text, reddit_api, reddit_state['reddit_username']))
 
-    def delete_items():
-        close_window(confirmation_window, reddit_state,
-                     'confirmation_window_open')
 
-        count = 1
+def gather_all_items(reddit_state, item_store):
+    """
+    Walks the comments and submissions listings at the same time and adds their items to the item store,
+    so gathering takes as long as the longer listing instead of both added up
+    :param reddit_state: dictionary holding reddit settings
+    :param item_store: ItemStore holding the reddit items
+    :return: dict of 'comments'/'posts' -> how many items the listing returned
+    """
+    username = reddit_state['reddit_username']
+    # praw instances aren't thread safe, the second listing gets its own
+    submissions_reddit = build_reddit(reddit_state)
 
-        # refetch item_array since we sent the generator all the way to the
-        # end of the items when we showed which would be deleted
-        if comment_bool:
-            item_array = reddit_state['user'].comments.new(limit=None)
-        else:
-            item_array = reddit_state['user'].submissions.new(limit=None)
-
-        for item in item_array:
-            if comment_bool:
-                item_string = 'Comment'
-                item_snippet = helpers.format_snippet(item.body, 50)
-            else:
-                item_string = 'Submission'
-                item_snippet = helpers.format_snippet(item.title, 50)
-
-            time_created = arrow.get(item.created_utc)
-
-            if time_created > reddit_state['time_to_save']:
-                currently_deleting_text.set(
-                    f'{item_string} `{item_snippet}` more recent than cutoff, skipping.')
-            elif item.score > reddit_state['max_score']:
-                currently_deleting_text.set(
-                    f'{item_string} `{item_snippet}` is higher than max score, skipping.')
-            elif item.gilded and reddit_state['gilded_skip']:
-                currently_deleting_text.set(
-                    f'{item_string} `{item_snippet}` is gilded, skipping.')
-            elif reddit_state[f'whitelisted_{identifying_text}'][item.id]:
-                currently_deleting_text.set(
-                    f'{item_string} `{item_snippet}` is whitelisted, skipping.`'
-                )
-            else:
-                # Need the try/except here as it will crash on
-                #  link submissions otherwise
-                try:
-                    if reddit_state['multi_edit']:
-                        times = random.randint(5, 10)
-
-                        for i in range(0, times):
-                            allchar = string.ascii_letters + string.punctuation + string.digits
-                            gibberish = "".join(random.choice(allchar)
-                                                for x in range(random.randint(50, 200)))
-
-                            item.edit(gibberish)
-                    else:
-                        item.edit(EDIT_OVERWRITE)
-                except:
-                    pass
-
-                if not reddit_state['only_edit']:
-                    item.delete()
-
-                currently_deleting_text.set(
-                    f'Editing/Deleting {item_string} `{item_snippet}`')
-
-            num_deleted_items_text.set(
-                f'{str(count)}/{str(total_items)} items processed.')
-            deletion_progress_bar['value'] = round(
-                (count / total_items) * 100, 1)
-
-            root.update()
-            count += 1
-
-    proceed_button = tk.Button(
-        button_frame, text='Proceed', command=lambda: delete_items())
-    cancel_button = tk.Button(button_frame, text='Cancel',
-                              command=lambda: close_window(confirmation_window, reddit_state, 'confirmation_window_open'))
-
-    proceed_button.grid(row=1, column=0, sticky='nsew')
-    cancel_button.grid(row=1, column=1, sticky='nsew')
-
-    counter = 3
-
-    for item in item_array:
-        time_created = arrow.get(item.created_utc)
-        if time_created > reddit_state['time_to_save']:
-            pass
-        elif item.score > reddit_state['max_score']:
-            pass
-        elif item.gilded and reddit_state['gilded_skip']:
-            pass
-        elif reddit_state[f'whitelisted_{identifying_text}'][item.id]:
-            pass
-        else:
-            tk.Label(frame,
-                     text=helpers.format_snippet(item.body if comment_bool else item.title, 100)).grid(row=counter, column=0)
-            ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-                row=counter+1, columnspan=2, sticky='ew', pady=5)
-        counter = counter + 2
+    return fetcher.fetch_concurrently({
+        'comments': lambda: listing_records('comments', reddit_api, username),
+        'posts': lambda: listing_records('posts', submissions_reddit, username),
+    }, item_store)
 
 
-def set_reddit_scheduler(root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, reddit_state):
+def refresh_item_metadata(identifying_text, item_store, refreshed_before, cutoff=None):
     """
-    The scheduler that users can use to have social amnesia wipe comments at a set point in time, repeatedly.
-    :param root: tkinkter window
-    :param scheduler_bool: true if set to run, false otherwise
-    :param hour_of_day: int 0-23, sets hour of day to run on
-    :param string_var, progress_var: - empty Vars needed to run the delete_reddit_items function
-    :param current_time_text: The UI text saying "currently set to TIME"
-    :param reddit_state: dictionary holding reddit settings
+    Refreshes the score and gilded state of stored items the listing didn't return
+    (imported from an export or past the listing limit), 100 items per /api/info call.
+    Items that have since been deleted are dropped from the store.
+    :param identifying_text: 'comments' or 'posts'
+    :param item_store: ItemStore holding the reddit items
+    :param refreshed_before: epoch seconds, items refreshed since then are left alone
+    :param cutoff: epoch seconds, items created after it are kept anyway and left alone too
     :return: none
     """
-    reddit_state['scheduler_bool'] = scheduler_bool.get()
-    reddit_state.sync
-
-    global alreadyRanBool
-    if not scheduler_bool.get():
-        alreadyRanBool = False
+    prefix = 't1_' if identifying_text == 'comments' else 't3_'
+    # streamed from the store, only one batch of records is in memory at a time
+    stale_records = (record for record in item_store.iter_items(identifying_text)
+                     if record.get('refreshed', 0) < refreshed_before
+                     and (cutoff is None or record['created'] <= cutoff))
+
+    for batch in helpers.chunked(stale_records, INFO_BATCH_SIZE):
+        records = {record['id']: record for record in batch}
+        refreshed_at = int(time.time())
+        gone_ids = []
+
+        # info is lazy, its single request is made while it's being listed
+        items = limited_call(reddit_api, list, reddit_api.info(
+            [prefix + item_id for item_id in records]))
+        for item in items:
+            record = records[item.id]
+            if item.author is None:
+                gone_ids.append(item.id)
+                continue
+            record['score'] = item.score
+            record['gilded'] = item.gilded
+            record['refreshed'] = refreshed_at
+
+        item_store.upsert(records.values())
+        item_store.remove(identifying_text, gone_ids)
+
+
+def import_reddit_export(root, import_status_text, item_store):
+    """
+    Lets the user pick a reddit data export and adds its comments and posts to the item store,
+    reaching items older than the 1,000 the listings go back
+    :param root: the reference to the actual tkinter GUI window
+    :param import_status_text: text shown to the user in the UI with the import progress
+    :param item_store: ItemStore holding the reddit items
+    :return: none
+    """
+    path = filedialog.askopenfilename(
+        title='Pick your reddit data export', filetypes=[('Data export', '*.zip *.csv')])
+    if not path:
         return
 
-    reddit_state['scheduled_time'] = hour_of_day
-    reddit_state.sync
+    def show_progress(total):
+        import_status_text.set(f'Imported {total} reddit items')
+        root.update()
+
+    total = 0
+    for identifying_text in ('comments', 'posts'):
+        total += item_store.add_all(
+            map(snippets.cache.prime, importers.iter_reddit_export(path, identifying_text)),
+            progress_callback=lambda count: show_progress(total + count))
+
+    import_status_text.set(f'Imported {total} reddit items')
+
+
+class RedditAdapter(pipeline.PlatformAdapter):
+    """
+    Reddit side of the deletion pipeline, see utils/pipeline.py
+    """
+    platform = 'reddit'
+    kinds = ('comments', 'posts')
+    action_text = 'Editing/Deleting'
+    rate_limit = RATE_LIMIT
+
+    class Settings(NamedTuple):
+        max_score: int
+        gilded_skip: int
+        multi_edit: int
+        only_edit: int
+
+    def item_label(self, kind):
+        return 'Comment' if kind == 'comments' else 'Submission'
+
+    def confirmation_title(self, kind):
+        return f'The following {kind} will be deleted/edited'
+
+    def fetch(self, kind, state, item_store):
+        gather_items(kind, state, item_store)
+        cache_access_token(reddit_api, state)
+
+    def fetch_all(self, state, item_store):
+        gather_all_items(state, item_store)
+        cache_access_token(reddit_api, state)
+
+    def refresh(self, kind, item_store, refreshed_before, cutoff=None):
+        refresh_item_metadata(kind, item_store, refreshed_before, cutoff)
+
+    def calls_per_item(self, context):
+        edits = sum(MULTI_EDIT_PASSES) / 2 if context.settings.multi_edit else 1
+        return edits, 0 if context.settings.only_edit else 1
+
+    def rate_limit_headroom(self):
+        # as reported by the last response, nothing is known before the first request
+        return reported_limits(reddit_api) if reddit_api else None
+
+    def skip_reason(self, record, context):
+        if record['score'] > context.settings.max_score:
+            return 'is higher than max score'
+        if record['gilded'] and context.settings.gilded_skip:
+            return 'is gilded'
+        return None
+
+    def execute(self, record, context):
+        # lazy praw objects, editing and deleting only needs the id
+        if context.kind == 'comments':
+            item = reddit_api.comment(id=record['id'])
+        else:
+            item = reddit_api.submission(id=record['id'])
 
-    current_time_text.set(f'Currently set to: {hour_of_day}')
+        # Need the try/except here as it will crash on
+        #  link submissions otherwise
+        try:
+            if context.settings.multi_edit:
+                times = random.randint(*MULTI_EDIT_PASSES)
 
-    current_time = datetime.now().time().hour
+                for i in range(0, times):
+                    allchar = string.ascii_letters + string.punctuation + string.digits
+                    gibberish = "".join(random.choice(allchar)
+                                        for x in range(random.randint(50, 200)))
 
-    if current_time == hour_of_day and not alreadyRanBool:
-        messagebox.showinfo(
-            'Scheduler', 'Social Amnesia is now erasing your past on reddit.')
+                    limited_call(reddit_api, item.edit, gibberish)
+            else:
+                limited_call(reddit_api, item.edit, EDIT_OVERWRITE)
+        except:
+            pass
 
-        delete_reddit_items(root, True, string_var,
-                            progress_var, string_var, reddit_state, True)
-        delete_reddit_items(root, False, string_var,
-                            progress_var, string_var, reddit_state, True)
+        if context.settings.only_edit:
+            return run_history.EDITED
 
-        alreadyRanBool = True
-    if current_time < 23 and current_time == hour_of_day + 1:
-        alreadyRanBool = False
-    elif current_time == 0:
-        alreadyRanBool = False
+        limited_call(reddit_api, item.delete)
+        return run_history.DELETED
 
-    root.after(1000, lambda: set_reddit_scheduler(
-        root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, reddit_state))
 
+adapter = RedditAdapter()
 
-def set_reddit_whitelist(root, comment_bool, reddit_state):
+
+def delete_reddit_items(root, comment_bool, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, reddit_state, item_store, scheduled_bool, gathered_at=None, history=None):
     """
-    Creates a window to let users select which comments or posts
-        to whitelist
+    Deletes the items according to user configurations.
     :param root: the reference to the actual tkinter GUI window
-    :param comment_bool: true for comments, false for posts
+    :param comment_bool: true if deleting comments, false if deleting submissions
+    :param currently_deleting_text: Describes the item that is currently being deleted.
+    :param deletion_progress_bar: updates as the items are looped through
+    :param num_deleted_items_text: updates as X out of Y comments are looped through
     :param reddit_state: dictionary holding reddit settings
+    :param item_store: ItemStore holding the reddit items gathered so far
+    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :param gathered_at: epoch seconds the listing was already gathered at, None to gather it now
+    :param history: RunHistory to record the run in, None to not record it
     :return: none
     """
-    # TODO: update this to get whether checkbox is selected or unselected instead of blindly flipping from true to false
-    def flip_whitelist_dict(id, identifying_text):
-        whitelist_dict = reddit_state[f'whitelisted_{identifying_text}']
-        whitelist_dict[id] = not whitelist_dict[id]
-        reddit_state[f'whitelisted_{identifying_text}'] = whitelist_dict
-        reddit_state.sync
+    progress = pipeline.Progress(
+        root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text)
+    pipeline.confirm_and_delete(root, adapter, 'comments' if comment_bool else 'posts', progress,
+                                reddit_state, item_store, scheduled_bool, gathered_at, history)
 
-    if reddit_state['whitelist_window_open'] == 1:
-        return
 
-    if comment_bool:
-        identifying_text = 'comments'
-        item_array = reddit_state['user'].comments.new(limit=None)
-    else:
-        identifying_text = 'posts'
-        item_array = reddit_state['user'].submissions.new(limit=None)
+def set_reddit_scheduler(root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, reddit_state, item_store, history=None):
+    """
+    See run_scheduler function in utils/pipeline.py
+    """
+    pipeline.run_scheduler(root, adapter, scheduler_bool, hour_of_day, string_var,
+                           progress_var, current_time_text, reddit_state, item_store, history)
 
-    whitelist_window = tk.Toplevel(root)
-    reddit_state['whitelist_window_open'] = 1
-    reddit_state.sync
 
-    whitelist_window.protocol(
-        'WM_DELETE_WINDOW', lambda: close_window(whitelist_window, reddit_state, 'whitelist_window_open'))
+def set_reddit_keep_rules(root, reddit_state):
+    """
+    See set_keep_rules function in utils/rules.py
+    """
+    rules.set_keep_rules(root, reddit_state)
 
-    frame = build_window(root, whitelist_window,
-                         f'Pick {identifying_text} to save')
 
-    counter = 3
-    for item in item_array:
-        if (item.id not in reddit_state[f'whitelisted_{identifying_text}']):
-            # I wish I could tell you why I need to copy the dictionary of whitelisted items, and then modify it, and then
-            #   reassign it back to the persistant shelf. I don't know why this is needed, but it works.
-            whitelist_dict = reddit_state[f'whitelisted_{identifying_text}']
-            whitelist_dict[item.id] = False
-            reddit_state[f'whitelisted_{identifying_text}'] = whitelist_dict
-            reddit_state.sync
+def set_reddit_priority_rules(root, reddit_state):
+    """
+    Creates a window to let users edit the rules picking which items are deleted first,
+    when deleting in the order of the most matching priority rules
+    :param root: the reference to the actual tkinter GUI window
+    :param reddit_state: dictionary holding reddit settings
+    :return: none
+    """
+    rules.set_keep_rules(root, reddit_state, 'priority_rules',
+                         'Priority rules', rules.PRIORITY_RULES_HELP)
 
-        whitelist_checkbutton = tk.Checkbutton(frame, command=lambda
-                                               id=item.id: flip_whitelist_dict(id, identifying_text))
 
-        if (reddit_state[f'whitelisted_{identifying_text}'][item.id]):
-            whitelist_checkbutton.select()
-        else:
-            whitelist_checkbutton.deselect()
+def set_reddit_archive(archive_bool, reddit_state):
+    """
+    See set_archive function in utils/pipeline.py
+    """
+    pipeline.set_archive(archive_bool, reddit_state)
+
+
+def set_reddit_deletion_order(order_text, reddit_state):
+    """
+    See set_deletion_order function in utils/pipeline.py
+    """
+    pipeline.set_deletion_order(order_text, reddit_state)
 
-        whitelist_checkbutton.grid(row=counter, column=0)
-        tk.Label(frame,
-                 text=helpers.format_snippet(item.body if comment_bool else item.title, 100)).grid(row=counter, column=1)
-        ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-            row=counter+1, columnspan=2, sticky=(tk.E, tk.W), pady=5)
 
-        counter = counter + 2
+def set_reddit_whitelist(root, comment_bool, reddit_state, item_store):
+    """
+    See show_whitelist function in utils/pipeline.py
+    :param comment_bool: true if whitelisting comments, false if whitelisting submissions
+    """
+    pipeline.show_whitelist(root, adapter, 'comments' if comment_bool else 'posts',
+                            reddit_state, item_store)
@@ -1,66 +1,164 @@
-from utils import helpers
-from datetime import datetime
-import arrow
+from utils import credentials, fetcher, helpers, importers, pipeline, rate_governor, rules, run_history, snippets
+import json
 import tweepy
-from tkinter import messagebox
-import tkinter as tk
-import tkinter.ttk as ttk
-import shelve
+from tkinter import filedialog
 import sys
+import time
+from typing import NamedTuple
 sys.path.insert(0, "../utils")
 
 twitter_api = {}
 
-# neccesary global bool for the scheduler
-already_ran_bool = False
+# error code twitter answers with for tweets that no longer exist
+TWEET_NOT_FOUND_CODE = 144
+# most ids statuses/lookup accepts per call
+LOOKUP_BATCH_SIZE = 100
+
+# calls twitter allows per user per 15 minutes, by endpoint
+RATE_LIMITS = {
+    'statuses/user_timeline': (900, 15 * 60),
+    'favorites/list': (75, 15 * 60),
+    'statuses/lookup': (900, 15 * 60),
+    # twitter publishes no window for deleting, these are paced like the timelines
+    # and held back until the reset once twitter answers that no calls are left
+    'statuses/destroy': (900, 15 * 60),
+    'favorites/destroy': (900, 15 * 60),
+}
+# shared by every fetching thread, and by every process once logged in (see share_rate_budgets)
+rate_budgets = {endpoint: fetcher.RateBudget(*limit)
+                for endpoint, limit in RATE_LIMITS.items()}
+
+# hands back the JSON text of a response instead of building tweepy models from it
+RAW_PARSER = tweepy.parsers.RawParser()
+
+
+def to_record(status, identifying_text):
+    """
+    Picks the fields the filters work on out of a tweet as the timeline returned it,
+    tweepy's models are never built for timeline items
+    :param status: the decoded JSON of a tweet
+    :param identifying_text: 'tweets' or 'favorites'
+    :return: dict describing the item
+    """
+    return {
+        'id': status['id'],
+        'kind': identifying_text,
+        # the id encodes the creation time, no need to parse created_at
+        'created': helpers.snowflake_to_timestamp(status['id']),
+        # extended mode sends the untruncated text as full_text
+        'text': status.get('full_text', status.get('text', '')),
+        'score': status['favorite_count'],
+        'retweets': status['retweet_count'],
+        'retweeted': status['retweeted'],
+        'is_reply': status['in_reply_to_status_id'] is not None,
+        # entities are only sent when a keep-rule needs them, see `timeline_pages`
+        'has_media': 'media' in status.get('entities', ()),
+        'refreshed': int(time.time()),
+    }
 
 
-def close_window(window, twitter_state, window_key):
-    twitter_state[window_key] = 0
-    twitter_state.sync
-    window.destroy()
+def initialize_state(twitter_state):
+    """
+    Sets up the twitter state
+    :param twitter_state: dictionary holding twitter settings
+    :return: none
+    """
+    helpers.check_for_existence('retention_seconds', twitter_state,
+                        helpers.saved_retention_seconds(twitter_state))
+    helpers.check_for_existence('max_favorites', twitter_state, 0)
+    helpers.check_for_existence('max_retweets', twitter_state, 0)
+    helpers.check_for_existence('whitelisted_tweets', twitter_state, {})
+    helpers.check_for_existence('whitelisted_favorites', twitter_state, {})
+    helpers.check_for_existence('keep_rules', twitter_state, [])
+    helpers.check_for_existence('priority_rules', twitter_state, [])
+    helpers.check_for_existence('deletion_order', twitter_state, pipeline.ORDER_OLDEST)
+    helpers.check_for_existence('archive_items', twitter_state, 0)
+    helpers.check_for_existence('scheduled_time', twitter_state, 0)
 
+    twitter_state['scheduler_bool'] = 0
+    twitter_state['whitelist_window_open'] = 0
+    twitter_state['confirmation_window_open'] = 0
+    twitter_state.sync
 
-def build_window(root, window, title_text):
-    def onFrameConfigure(canvas):
-        '''Reset the scroll region to encompass the inner frame'''
-        canvas.configure(scrollregion=canvas.bbox('all'))
 
-    canvas = tk.Canvas(window, width=750, height=1000)
-    frame = tk.Frame(canvas)
+def share_rate_budgets(consumer_key, twitter_username):
+    """
+    Switches to the rate budgets every process logged in to the same account with the same app shares,
+    so they don't each spend the whole limit
+    :param consumer_key: consumer key of the twitter app
+    :param twitter_username: screen name of the account
+    :return: none
+    """
+    global rate_budgets
+    governor = rate_governor.open_rate_governor()
+    rate_budgets = {endpoint: governor.budget(f'twitter:{consumer_key}:{twitter_username}', endpoint, *limit)
+                    for endpoint, limit in RATE_LIMITS.items()}
 
-    scrollbar = tk.Scrollbar(window, command=canvas.yview)
-    canvas.configure(yscrollcommand=scrollbar.set)
 
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    canvas.create_window((4, 4), window=frame, anchor="nw")
+def limited_call(api, endpoint, function, *args, **kwargs):
+    """
+    Makes an API call within the rate budget of its endpoint, correcting the budget with the headers of the response
+    :param api: tweepy.API making the call
+    :param endpoint: one of RATE_LIMITS
+    :param function: the call, e.g. api.user_timeline
+    :param args, kwargs: arguments of the call
+    :return: what the call returns
+    """
+    budget = rate_budgets[endpoint]
+    budget.acquire()
+    try:
+        return fetcher.timed_call(function, *args, **kwargs)
+    finally:
+        response = getattr(api, 'last_response', None)
+        if response is not None and 'x-rate-limit-remaining' in response.headers:
+            budget.observe(int(response.headers['x-rate-limit-remaining']),
+                           int(response.headers['x-rate-limit-reset']))
+
+
+def build_twitter(login_info):
+    """
+    Creates a tweepy API instance, without any network round trip
+    :param login_info: dict holding the consumer key/secret and the access token/secret
+    :return: tweepy.API
+    """
+    auth = tweepy.OAuthHandler(
+        login_info['consumer_key'], login_info['consumer_secret'])
+    auth.set_access_token(
+        login_info['access_token'], login_info['access_token_secret'])
+    return tweepy.API(auth)
 
-    title_label = tk.Label(
-        frame, text=title_text, font=('arial', 30))
 
-    frame.bind("<Configure>", lambda event,
-               canvas=canvas: onFrameConfigure(canvas))
+def initialize_twitter_user(login_confirm_text, twitter_state):
+    """
+    Logs in with the stored login, if there is one. Uses the screen name cached at login,
+    so starting the app doesn't wait on twitter.
+    :param login_confirm_text: The UI text saying "logged in as USER"
+    :param twitter_state: dictionary holding twitter settings
+    :return: none
+    """
+    global twitter_api
 
-    title_label.grid(
-        row=0, column=0, columnspan=2, sticky='w')
+    secrets = credentials.CredentialStore(twitter_state)
+    secrets.migrate('login_info')
+    login_info = secrets.get('login_info')
+    if not login_info:
+        return
 
-    ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-        row=2, columnspan=2, sticky='ew', pady=5)
+    try:
+        api = build_twitter(login_info)
 
-    return frame
+        twitter_username = twitter_state.get('twitter_username')
+        if not twitter_username:
+            twitter_username = api.me().screen_name
+            twitter_state['twitter_username'] = twitter_username
 
+        twitter_api = api
+        share_rate_budgets(login_info['consumer_key'], twitter_username)
+        login_confirm_text.set(f'Logged in to Twitter as {twitter_username}')
 
-def check_for_existence(string, twitter_state, value):
-    """
-    Initialize a key/value pair if it doesn't already exist.
-    :param string: the key
-    :param twitter_state: dictionary holding reddit settings
-    :param value: the value
-    :return: none
-    """
-    if string not in twitter_state:
-        twitter_state[string] = value
+        initialize_state(twitter_state)
+    except:
+        pass
 
 
 def set_twitter_login(consumer_key, consumer_secret, access_token, access_token_secret, login_confirm_text, twitter_state):
@@ -76,34 +174,24 @@ def set_twitter_login(consumer_key, consumer_secret, access_token, access_token_
     """
     global twitter_api
 
-    auth = tweepy.OAuthHandler(consumer_key, consumer_secret)
-    auth.set_access_token(access_token, access_token_secret)
-
-    api = tweepy.API(auth)
-
-    twitter_username = api.me().screen_name
-    login_confirm_text.set(f'Logged in to Twitter as {twitter_username}')
-
-    twitter_api = api
-    twitter_state['login_info'] = {
+    login_info = {
         'consumer_key': consumer_key,
         'consumer_secret': consumer_secret,
         'access_token': access_token,
         'access_token_secret': access_token_secret
     }
+    api = build_twitter(login_info)
 
-    check_for_existence('time_to_save', twitter_state,
-                        arrow.utcnow().replace(hours=0))
-    check_for_existence('max_favorites', twitter_state, 0)
-    check_for_existence('max_retweets', twitter_state, 0)
-    check_for_existence('whitelisted_tweets', twitter_state, {})
-    check_for_existence('whitelisted_favorites', twitter_state, {})
-    check_for_existence('scheduled_time', twitter_state, 0)
+    twitter_username = api.me().screen_name
+    login_confirm_text.set(f'Logged in to Twitter as {twitter_username}')
 
-    twitter_state['scheduler_bool'] = 0
-    twitter_state['whitelist_window_open'] = 0
-    twitter_state['confirmation_window_open'] = 0
-    twitter_state.sync
+    twitter_api = api
+    twitter_state['twitter_username'] = twitter_username
+    share_rate_budgets(consumer_key, twitter_username)
+    # OAuth 1 access tokens don't expire
+    credentials.CredentialStore(twitter_state).update(login_info=login_info)
+
+    initialize_state(twitter_state)
 
 
 def set_twitter_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to_save, current_time_to_save, twitter_state):
@@ -115,7 +203,7 @@ def set_twitter_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_t
     twitter_state['weeks'] = weeks_to_save
     twitter_state['years'] = years_to_save
 
-    twitter_state['time_to_save'] = helpers.set_time_to_save(
+    twitter_state['retention_seconds'] = helpers.set_time_to_save(
         hours_to_save, days_to_save, weeks_to_save, years_to_save, current_time_to_save)
     twitter_state.sync
 
@@ -138,331 +226,308 @@ def set_twitter_max_retweets(max_retweets, current_max_retweets, twitter_state):
     twitter_state.sync
 
 
-def gather_items(item_getter):
+def timeline_pages(identifying_text, max_id=None, include_entities=False):
     """
-    Keeps making calls to twitter to gather all the items the API can
-    index and build an array of them
-    :param item_getter: the function call being made to twitter to get tweets or favorites from the user's account
-    :return user_items: an array of the items gathered
+    Pages through a timeline with max_id until twitter returns an empty page,
+    which marks the end of what the API can index. Pages are asked for with as few fields
+    as twitter allows and turned into records straight from the JSON, without building tweepy models.
+    Tweets come in extended mode, so tweets longer than 140 characters aren't truncated.
+    :param identifying_text: 'tweets' or 'favorites'
+    :param max_id: id of the newest tweet to start from, None to start from the newest one
+    :param include_entities: True to get the entities telling which tweets have media
+    :return: generator of pages of item records
     """
-    user_items = []
-    new_items = item_getter(count=200)
-    user_items.extend(new_items)
-    oldest = user_items[-1].id - 1
-
-    while len(new_items) > 0:
-        new_items = item_getter(count=200, max_id=oldest)
-        user_items.extend(new_items)
-        oldest = user_items[-1].id - 1
-
-    return user_items
+    # an API instance of its own, so the last response it reports belongs to this timeline
+    # while the other one is walked at the same time
+    api = tweepy.API(twitter_api.auth)
+    if identifying_text == 'tweets':
+        endpoint, item_getter = 'statuses/user_timeline', api.user_timeline
+        # trim_user drops the copy of the user's profile every tweet comes with,
+        # retweets are kept as they are items to delete too
+        params = {'count': 200, 'trim_user': True, 'include_rts': True}
+    else:
+        # favorites/list has no trim_user
+        endpoint, item_getter = 'favorites/list', api.favorites
+        params = {'count': 200}
+    params['tweet_mode'] = 'extended'
+    params['include_entities'] = include_entities
+    if max_id is not None:
+        params['max_id'] = max_id
+
+    while True:
+        page = [to_record(status, identifying_text) for status in json.loads(
+            limited_call(api, endpoint, item_getter, parser=RAW_PARSER, **params))]
+        if not page:
+            return
+        yield page
+        params = dict(params, max_id=page[-1]['id'] - 1)
+
+
+def gather_items(identifying_text, max_id=None, include_entities=False, prefetch_depth=fetcher.PREFETCH_DEPTH):
+    """
+    Keeps making calls to twitter to gather all the items the API can index,
+    fetching the next pages while the current one is being processed
+    :param identifying_text: 'tweets' or 'favorites'
+    :param max_id: id of the newest tweet to start from, None to start from the newest one
+    :param include_entities: True to get the entities telling which tweets have media
+    :param prefetch_depth: how many pages to fetch ahead
+    :return: generator of the item records gathered
+    """
+    for page in fetcher.prefetch(timeline_pages(identifying_text, max_id, include_entities), prefetch_depth):
+        yield from page
 
 
-def delete_twitter_tweets(root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, scheduled_bool):
+def timeline_records(identifying_text, cutoff=None, include_entities=False):
     """
-    Deletes user's tweets according to user configurations.
-    :param root: the reference to the actual tkinter GUI window
-    :param currently_deleting_text: Describes the item that is currently being deleted.
-    :param deletion_progress_bar: updates as the items are looped through
-    :param num_deleted_items_text: updates as X out of Y comments are looped through
-    :param twitter_state: dictionary holding twitter settings
-    :param scheduled_bool: True if a scheduled run, False if triggered manually
-    :return: none
+    Gathers the user's tweets or favorites
+    :param identifying_text: 'tweets' or 'favorites'
+    :param cutoff: epoch seconds, tweets created after it are kept anyway so the timeline is
+    entered right at it instead of paging through them. None to gather everything.
+    :param include_entities: True to get the entities telling which tweets have media
+    :return: generator of item records
     """
-    if twitter_state['confirmation_window_open'] == 1 and not scheduled_bool:
-        return
+    max_id = None if cutoff is None else helpers.timestamp_to_snowflake(cutoff)
+    for record in gather_items(identifying_text, max_id, include_entities):
+        yield snippets.cache.prime(record)
 
-    global twitter_api
 
-    confirmation_window = tk.Toplevel(root)
-    twitter_state['confirmation_window_open'] = 1
-    twitter_state.sync
+def store_items(identifying_text, item_store, cutoff=None, include_entities=False):
+    """
+    Gathers the user's tweets or favorites and adds them to the item store
+    :param identifying_text: 'tweets' or 'favorites'
+    :param item_store: ItemStore holding the twitter items
+    :param cutoff: epoch seconds, only tweets created at or before it are gathered. None to gather everything.
+    :param include_entities: True to get the entities telling which tweets have media
+    :return: how many items twitter returned
+    """
+    return item_store.add_all(timeline_records(identifying_text, cutoff, include_entities))
 
-    confirmation_window.protocol(
-        'WM_DELETE_WINDOW', lambda: close_window(confirmation_window, twitter_state, 'confirmation_window_open'))
-
-    frame = build_window(root, confirmation_window,
-                         f"The following tweets will be deleted")
-
-    user_tweets = gather_items(twitter_api.user_timeline)
-    total_tweets = len(user_tweets)
-
-    num_deleted_items_text.set(f'0/{str(total_tweets)} items processed so far')
-
-    button_frame = tk.Frame(frame)
-    button_frame.grid(row=1, column=0, sticky='w')
-
-    def delete_tweets():
-        close_window(confirmation_window, twitter_state,
-                     'confirmation_window_open')
-
-        count = 1
-        for tweet in user_tweets:
-            tweet_snippet = helpers.format_snippet(tweet.text, 50)
-
-            time_created = arrow.Arrow.fromdatetime(tweet.created_at)
-
-            if time_created > twitter_state['time_to_save']:
-                currently_deleting_text.set(
-                    f'Tweet: `{tweet_snippet}` is more recent than cutoff, skipping.')
-            elif tweet.favorite_count >= twitter_state['max_favorites']:
-                currently_deleting_text.set(
-                    f'Tweet: `{tweet_snippet}` has more favorites than max favorites, skipping.')
-            elif tweet.retweet_count >= twitter_state['max_retweets'] and not tweet.retweeted:
-                currently_deleting_text.set(
-                    f'Tweet: `{tweet_snippet}` has more retweets than max retweets, skipping.')
-            elif tweet.id in twitter_state['whitelisted_tweets'] and twitter_state['whitelisted_tweets'][tweet.id]:
-                currently_deleting_text.set(
-                    f'Tweet: `{tweet_snippet}` is whitelisted, skipping.')
-            else:
-                currently_deleting_text.set(
-                    f'Deleting tweet: `{tweet_snippet}`')
-                twitter_api.destroy_status(tweet.id)
-
-            num_deleted_items_text.set(
-                f'{str(count)}/{str(total_tweets)} items processed.')
-            deletion_progress_bar['value'] = round(
-                (count / total_tweets) * 100, 1)
-
-            root.update()
-
-            count += 1
-
-    proceed_button = tk.Button(
-        button_frame, text='Proceed', command=lambda: delete_tweets())
-    cancel_button = tk.Button(button_frame, text='Cancel',
-                              command=lambda: close_window(confirmation_window, twitter_state, 'confirmation_window_open'))
-
-    proceed_button.grid(row=1, column=0, sticky='nsew')
-    cancel_button.grid(row=1, column=1, sticky='nsew')
-
-    counter = 3
-
-    for tweet in user_tweets:
-        time_created = arrow.Arrow.fromdatetime(tweet.created_at)
-
-        if time_created > twitter_state['time_to_save']:
-            pass
-        elif tweet.favorite_count >= twitter_state['max_favorites']:
-            pass
-        elif tweet.retweet_count >= twitter_state['max_retweets'] and not tweet.retweeted:
-            pass
-        elif tweet.id in twitter_state['whitelisted_tweets'] and twitter_state['whitelisted_tweets'][tweet.id]:
-            pass
-        else:
-            tk.Label(frame, text=helpers.format_snippet(
-                tweet.text, 100)).grid(row=counter, column=0)
-            ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-                row=counter+1, columnspan=2, sticky='ew', pady=5)
 
-        counter = counter + 2
+def store_all_items(item_store, cutoff=None, include_entities=False):
+    """
+    Gathers the tweets and favorites at the same time and adds them to the item store,
+    so gathering takes as long as the longer timeline instead of both added up
+    :param item_store: ItemStore holding the twitter items
+    :param cutoff: epoch seconds, only tweets created at or before it are gathered. None to gather everything.
+    :param include_entities: True to get the entities telling which tweets have media
+    :return: dict of 'tweets'/'favorites' -> how many items twitter returned
+    """
+    return fetcher.fetch_concurrently({
+        'tweets': lambda: timeline_records('tweets', cutoff, include_entities),
+        'favorites': lambda: timeline_records('favorites', cutoff, include_entities),
+    }, item_store)
 
 
-def delete_twitter_favorites(root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, scheduled_bool):
+def refresh_item_metadata(identifying_text, item_store, refreshed_before, cutoff=None):
     """
-    Deletes users's favorites according to user configurations.
+    Refreshes the favorite and retweet counts of stored items the timeline didn't return
+    (imported from an export or past the timeline limit), 100 items per statuses/lookup call.
+    Tweets that no longer exist, or are no longer favorited, are dropped from the store.
+    :param identifying_text: 'tweets' or 'favorites'
+    :param item_store: ItemStore holding the twitter items
+    :param refreshed_before: epoch seconds, items refreshed since then are left alone
+    :param cutoff: epoch seconds, items created after it are kept anyway and left alone too
+    :return: none
+    """
+    # streamed from the store, only one batch of records is in memory at a time
+    stale_records = (record for record in item_store.iter_items(identifying_text)
+                     if record.get('refreshed', 0) < refreshed_before
+                     and (cutoff is None or record['created'] <= cutoff))
+
+    for batch in helpers.chunked(stale_records, LOOKUP_BATCH_SIZE):
+        records = {record['id']: record for record in batch}
+        refreshed_at = int(time.time())
+        gone_ids = set(records)
+
+        for tweet in limited_call(twitter_api, 'statuses/lookup', twitter_api.statuses_lookup,
+                                  list(records), trim_user=True, include_entities=False):
+            if identifying_text == 'favorites' and not tweet.favorited:
+                continue
+            gone_ids.discard(tweet.id)
+
+            record = records[tweet.id]
+            record['score'] = tweet.favorite_count
+            record['retweets'] = tweet.retweet_count
+            record['retweeted'] = tweet.retweeted
+            record['refreshed'] = refreshed_at
+
+        item_store.upsert(record for record in records.values()
+                          if record['id'] not in gone_ids)
+        item_store.remove(identifying_text, gone_ids)
+
+
+def import_twitter_export(root, import_status_text, item_store):
+    """
+    Lets the user pick a twitter data export and adds its tweets and likes to the item store,
+    reaching items older than the 3,200 the timeline goes back
     :param root: the reference to the actual tkinter GUI window
-    :param currently_deleting_text: Describes the item that is currently being deleted.
-    :param deletion_progress_bar: updates as the items are looped through
-    :param num_deleted_items_text: updates as X out of Y comments are looped through
-    :param twitter_state: dictionary holding twitter settings
-    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :param import_status_text: text shown to the user in the UI with the import progress
+    :param item_store: ItemStore holding the twitter items
     :return: none
     """
-    if twitter_state['confirmation_window_open'] == 1 and not scheduled_bool:
+    path = filedialog.askopenfilename(
+        title='Pick your twitter data export', filetypes=[('Data export', '*.zip *.js')])
+    if not path:
         return
 
-    global twitter_api
-
-    confirmation_window = tk.Toplevel(root)
-    twitter_state['confirmation_window_open'] = 1
-    twitter_state.sync
-
-    confirmation_window.protocol(
-        'WM_DELETE_WINDOW', lambda: close_window(confirmation_window, twitter_state, 'confirmation_window_open'))
-
-    frame = build_window(root, confirmation_window,
-                         f"The following favorites will be removed")
-
-    user_favorites = gather_items(twitter_api.favorites)
-    total_favorites = len(user_favorites)
-
-    num_deleted_items_text.set(
-        f'0/{str(total_favorites)} items processed so far')
-
-    button_frame = tk.Frame(frame)
-    button_frame.grid(row=1, column=0, sticky='w')
-
-    def delete_favorites():
-        close_window(confirmation_window, twitter_state,
-                     'confirmation_window_open')
+    def show_progress(total):
+        import_status_text.set(f'Imported {total} twitter items')
+        root.update()
 
-        count = 1
-        for favorite in user_favorites:
-            favorite_snippet = helpers.format_snippet(favorite.text, 50)
+    total = 0
+    for identifying_text in ('tweets', 'favorites'):
+        total += item_store.add_all(
+            map(snippets.cache.prime, importers.iter_twitter_export(path, identifying_text)),
+            progress_callback=lambda count: show_progress(total + count))
 
-            currently_deleting_text.set(
-                f'Deleting favorite: `{favorite_snippet}`')
+    import_status_text.set(f'Imported {total} twitter items')
 
-            time_created = arrow.Arrow.fromdatetime(favorite.created_at)
 
-            if time_created > twitter_state['time_to_save']:
-                currently_deleting_text.set(
-                    f'Favorite: `{favorite_snippet}` is more recent than cutoff, skipping.')
-            elif favorite.id in twitter_state['whitelisted_favorites'] and twitter_state['whitelisted_favorites'][favorite.id]:
-                currently_deleting_text.set(
-                    f'Favorite: `{favorite_snippet}` is whitelisted, skipping.')
-            else:
-                currently_deleting_text.set(
-                    f'Deleting favorite: `{favorite_snippet}`')
-                twitter_api.destroy_favorite(favorite.id)
-
-            num_deleted_items_text.set(
-                f'{str(count)}/{str(total_favorites)} items processed.')
-            deletion_progress_bar['value'] = round(
-                (count / total_favorites) * 100, 1)
-
-            root.update()
-
-            count += 1
-
-    proceed_button = tk.Button(
-        button_frame, text='Proceed', command=lambda: delete_favorites())
-    cancel_button = tk.Button(button_frame, text='Cancel',
-                              command=lambda: close_window(confirmation_window, twitter_state, 'confirmation_window_open'))
-
-    proceed_button.grid(row=1, column=0, sticky='nsew')
-    cancel_button.grid(row=1, column=1, sticky='nsew')
-
-    counter = 3
+def destroy_item(endpoint, destroy, item_id):
+    """
+    Deletes a tweet or removes a favorite within the rate budget, treating items that are already gone
+    as deleted, which is common for items imported from an old data export
+    :param endpoint: 'statuses/destroy' or 'favorites/destroy'
+    :param destroy: twitter_api.destroy_status or twitter_api.destroy_favorite
+    :param item_id: id of the tweet
+    :return: none
+    """
+    try:
+        limited_call(twitter_api, endpoint, destroy, item_id)
+    except tweepy.TweepError as err:
+        if err.api_code != TWEET_NOT_FOUND_CODE:
+            raise
 
-    for favorite in user_favorites:
-        time_created = arrow.Arrow.fromdatetime(favorite.created_at)
 
-        if time_created > twitter_state['time_to_save']:
-            pass
-        elif favorite.id in twitter_state['whitelisted_favorites'] and twitter_state['whitelisted_favorites'][favorite.id]:
-            pass
+class TwitterAdapter(pipeline.PlatformAdapter):
+    """
+    Twitter side of the deletion pipeline, see utils/pipeline.py
+    """
+    platform = 'twitter'
+    kinds = ('tweets', 'favorites')
+    # tweets and favorites are deleted within limits of the same size
+    rate_limit = RATE_LIMITS['statuses/destroy']
+
+    class Settings(NamedTuple):
+        max_favorites: int
+        max_retweets: int
+
+    def item_label(self, kind):
+        return 'Tweet' if kind == 'tweets' else 'Favorite'
+
+    def confirmation_title(self, kind):
+        return 'The following tweets will be deleted' if kind == 'tweets' \
+            else 'The following favorites will be removed'
+
+    # tweets newer than the cutoff are kept whatever they look like, so they aren't gathered,
+    # and entities are only worth their bytes when a keep-rule looks at media
+    def fetch(self, kind, state, item_store):
+        store_items(kind, item_store, helpers.resolve_cutoff(
+            state['retention_seconds']), rules.compile_rules(state).has_media)
+
+    def fetch_all(self, state, item_store):
+        store_all_items(item_store, helpers.resolve_cutoff(
+            state['retention_seconds']), rules.compile_rules(state).has_media)
+
+    def refresh(self, kind, item_store, refreshed_before, cutoff=None):
+        refresh_item_metadata(kind, item_store, refreshed_before, cutoff)
+
+    def skip_reason(self, record, context):
+        if context.kind == 'favorites':
+            return None
+        if record['score'] >= context.settings.max_favorites:
+            return 'has more favorites than max favorites'
+        if record['retweets'] >= context.settings.max_retweets and not record['retweeted']:
+            return 'has more retweets than max retweets'
+        return None
+
+    def execute(self, record, context):
+        if context.kind == 'tweets':
+            destroy_item('statuses/destroy', twitter_api.destroy_status, record['id'])
         else:
-            tk.Label(frame, text=helpers.format_snippet(
-                favorite.text, 100)).grid(row=counter, column=0)
-            ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-                row=counter+1, columnspan=2, sticky='ew', pady=5)
+            destroy_item('favorites/destroy', twitter_api.destroy_favorite, record['id'])
+        return run_history.DELETED
+
 
-        counter = counter + 2
+adapter = TwitterAdapter()
 
 
-def set_twitter_scheduler(root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, twitter_state):
+def delete_twitter_tweets(root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, item_store, scheduled_bool, gathered_at=None, history=None):
     """
-    The scheduler that users can use to have social amnesia wipe
-    tweets/favorites at a set point in time, repeatedly.
-    :param root: tkinkter window
-    :param scheduler_bool: true if set to run, false otherwise
-    :param hour_of_day: int 0-23, sets hour of day to run on
-    :param string_var, progress_var - empty Vars needed to run the deletion functions
-    :param current_time_text: The UI text saying "currently set to TIME"
+    Deletes user's tweets according to user configurations.
+    :param root: the reference to the actual tkinter GUI window
+    :param currently_deleting_text: Describes the item that is currently being deleted.
+    :param deletion_progress_bar: updates as the items are looped through
+    :param num_deleted_items_text: updates as X out of Y comments are looped through
     :param twitter_state: dictionary holding twitter settings
+    :param item_store: ItemStore holding the twitter items gathered so far
+    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :param gathered_at: epoch seconds the items were already gathered at, None to gather them now
+    :param history: RunHistory to record the run in, None to not record it
     :return: none
     """
-    twitter_state['scheduler_bool'] = scheduler_bool.get()
-    twitter_state.sync
-
-    global already_ran_bool
-    if not scheduler_bool.get():
-        already_ran_bool = False
-        return
-
-    twitter_state['scheduled_time'] = hour_of_day
-    twitter_state.sync
+    progress = pipeline.Progress(
+        root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text)
+    pipeline.confirm_and_delete(root, adapter, 'tweets', progress, twitter_state,
+                                item_store, scheduled_bool, gathered_at, history)
 
-    current_time_text.set(f'Currently set to: {hour_of_day}')
 
-    current_time = datetime.now().time().hour
+def delete_twitter_favorites(root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text, twitter_state, item_store, scheduled_bool, gathered_at=None, history=None):
+    """
+    Deletes users's favorites according to user configurations.
+    See delete_twitter_tweets for the parameters
+    """
+    progress = pipeline.Progress(
+        root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text)
+    pipeline.confirm_and_delete(root, adapter, 'favorites', progress, twitter_state,
+                                item_store, scheduled_bool, gathered_at, history)
 
-    if current_time == hour_of_day and not already_ran_bool:
-        messagebox.showinfo(
-            'Scheduler', 'Social Amnesia is now erasing your past on twitter.')
 
-        delete_twitter_tweets(
-            root, string_var, progress_var, string_var, twitter_state, True)
-        delete_twitter_favorites(
-            root, string_var, progress_var, string_var, twitter_state, True)
+def set_twitter_scheduler(root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, twitter_state, item_store, history=None):
+    """
+    See run_scheduler function in utils/pipeline.py
+    """
+    pipeline.run_scheduler(root, adapter, scheduler_bool, hour_of_day, string_var,
+                           progress_var, current_time_text, twitter_state, item_store, history)
 
-        already_ran_bool = True
-    if current_time < 23 and current_time == hour_of_day + 1:
-        already_ran_bool = False
-    elif current_time == 0:
-        already_ran_bool = False
 
-    root.after(1000, lambda: set_twitter_scheduler(
-        root, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, twitter_state))
+def set_twitter_keep_rules(root, twitter_state):
+    """
+    See set_keep_rules function in utils/rules.py
+    """
+    rules.set_keep_rules(root, twitter_state)
 
 
-def set_twitter_whitelist(root, tweet_bool, twitter_state):
+def set_twitter_priority_rules(root, twitter_state):
     """
-    Creates a window to let users select which tweets or favorites
-        to whitelist
+    Creates a window to let users edit the rules picking which items are deleted first,
+    when deleting in the order of the most matching priority rules
     :param root: the reference to the actual tkinter GUI window
-    :param tweet_bool: true for tweets, false for favorites
     :param twitter_state: dictionary holding twitter settings
     :return: none
     """
-    global twitter_api
-    # TODO: update this to get whether checkbox is selected or unselected instead of blindly flipping from true to false
+    rules.set_keep_rules(root, twitter_state, 'priority_rules',
+                         'Priority rules', rules.PRIORITY_RULES_HELP)
 
-    def flip_whitelist_dict(id, identifying_text):
-        whitelist_dict = twitter_state[f'whitelisted_{identifying_text}']
-        whitelist_dict[id] = not whitelist_dict[id]
-        twitter_state[f'whitelisted_{identifying_text}'] = whitelist_dict
-        twitter_state.sync
 
-    def onFrameConfigure(canvas):
-        '''Reset the scroll region to encompass the inner frame'''
-        canvas.configure(scrollregion=canvas.bbox("all"))
-
-    def closeWindow(whitelist_window):
-        twitter_state['whitelist_window_open'] = 0
-        whitelist_window.destroy()
-
-    if tweet_bool:
-        identifying_text = 'tweets'
-        item_array = gather_items(twitter_api.user_timeline)
-    else:
-        identifying_text = 'favorites'
-        item_array = gather_items(twitter_api.favorites)
-
-    whitelist_window = tk.Toplevel(root)
-    twitter_state['whitelist_window_open'] = 1
-
-    whitelist_window.protocol(
-        'WM_DELETE_WINDOW', lambda: closeWindow(whitelist_window))
-
-    frame = build_window(root, whitelist_window,
-                         f'Pick {identifying_text} to save')
-
-    counter = 3
-    for item in item_array:
-        if (item.id not in twitter_state[f'whitelisted_{identifying_text}']):
-            # I wish I could tell you why I need to copy the dictionary of whitelisted items, and then modify it, and then
-            #   reassign it back to the persistant shelf. I don't know why this is needed, but it works.
-            whitelist_dict = twitter_state[f'whitelisted_{identifying_text}']
-            whitelist_dict[item.id] = False
-            twitter_state[f'whitelisted_{identifying_text}'] = whitelist_dict
-            twitter_state.sync
-
-        whitelist_checkbutton = tk.Checkbutton(frame, command=lambda
-                                               id=item.id: flip_whitelist_dict(id, identifying_text))
+def set_twitter_archive(archive_bool, twitter_state):
+    """
+    See set_archive function in utils/pipeline.py
+    """
+    pipeline.set_archive(archive_bool, twitter_state)
 
-        if (twitter_state[f'whitelisted_{identifying_text}'][item.id]):
-            whitelist_checkbutton.select()
-        else:
-            whitelist_checkbutton.deselect()
 
-        whitelist_checkbutton.grid(row=counter, column=0)
-        tk.Label(frame,
-                 text=helpers.format_snippet(item.text, 100)).grid(row=counter, column=1)
+def set_twitter_deletion_order(order_text, twitter_state):
+    """
+    See set_deletion_order function in utils/pipeline.py
+    """
+    pipeline.set_deletion_order(order_text, twitter_state)
 
-        ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
-            row=counter+1, columnspan=2, sticky=(tk.E, tk.W), pady=5)
 
-        counter = counter + 2
+def set_twitter_whitelist(root, tweet_bool, twitter_state, item_store):
+    """
+    See show_whitelist function in utils/pipeline.py
+    :param tweet_bool: true for tweets, false for favorites
+    """
+    pipeline.show_whitelist(root, adapter, 'tweets' if tweet_bool else 'favorites',
+                            twitter_state, item_store)
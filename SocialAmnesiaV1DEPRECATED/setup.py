@@ -23,7 +23,7 @@ if sys.platform == 'win32':
     os.environ['TCL_LIBRARY'] = 'C:\\Python36\\tcl\\tcl8.6'
     os.environ['TK_LIBRARY'] = 'C:\\Python36\\tcl\\tk8.6'
 
-build_exe_options = {'packages': ['os', 'idna', 'multiprocessing', 'dbm']}
+build_exe_options = {'packages': ['os', 'idna', 'multiprocessing', 'dbm', 'cryptography']}
 bdist_mac_options = {'iconfile': find_data_file('icon.icns')}
 executables = [Executable('SocialAmnesia.py', base=base,
                           icon=find_data_file('icon.ico'))]
@@ -0,0 +1,305 @@
+"""
+Opt-in archive of the items a run edits or deletes, written before they are gone:
+a gzip compressed, append-only JSON lines file per platform, with a sqlite index to look
+archived items up by id or by creation date.
+"""
+import gzip
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+from utils.item_store import STORAGE_FOLDER_PATH
+from utils.shared_database import LOCK_TIMEOUT_SECONDS
+
+# items waiting to be written before `add` waits for the writer to catch up
+MAX_PENDING = 1000
+# most items compressed together, a lookup decompresses one such gzip member
+MEMBER_SIZE = 500
+# bytes read at a time while decompressing a member
+READ_SIZE = 64 * 1024
+# decompressed members a reader keeps, lookups of items archived together hit the same member
+CACHED_MEMBERS = 8
+
+# tells the writer thread everything has been added
+CLOSE = object()
+
+
+def connect_index(index_path):
+    """
+    :param index_path: where the index is stored
+    :return: sqlite3 connection to the index, created on first use
+    """
+    connection = sqlite3.connect(index_path, timeout=LOCK_TIMEOUT_SECONDS)
+    connection.executescript('''
+        CREATE TABLE IF NOT EXISTS archived (
+            kind TEXT NOT NULL,
+            id TEXT NOT NULL,
+            created INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL,
+            -- where the gzip member holding the item starts in the archive
+            member_offset INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS archived_id ON archived (kind, id);
+        CREATE INDEX IF NOT EXISTS archived_created ON archived (kind, created);''')
+    return connection
+
+
+class ArchiveWriter:
+    """
+    Appends items to the archive on a background thread, so compressing and writing them never
+    holds up the delete loop. Whatever is waiting when the thread gets to it is compressed
+    together into one gzip member, the members of an archive read back as a single gzip file.
+    Items are numbered in the order they are added, `wait_written` tells when one is on disk.
+    """
+
+    def __init__(self, archive_path, index_path, max_pending=MAX_PENDING, member_size=MEMBER_SIZE):
+        """
+        :param archive_path: the archive, e.g. ~/.SocialAmnesia/reddit/archive.jsonl.gz
+        :param index_path: the index of the archive
+        :param max_pending: items waiting to be written before `add` waits for the writer
+        :param member_size: most items per gzip member
+        """
+        self.archive_path = archive_path
+        self.index_path = index_path
+        self.member_size = member_size
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.errors = []
+        # how many items were added, and how many of them are on disk and indexed
+        self.added = 0
+        self.written = 0
+        self.written_changed = threading.Condition()
+        connect_index(index_path).close()
+        self.thread = threading.Thread(target=self.write, daemon=True)
+        self.thread.start()
+
+    def add(self, record):
+        """
+        Queues an item to be archived, only waits when the writer is `max_pending` items behind
+        :param record: item record
+        :return: number of the item, to pass to `wait_written`
+        """
+        # nothing is deleted without being archived once archiving failed
+        if self.errors:
+            raise self.errors[0]
+        self.pending.put(record)
+        self.added += 1
+        return self.added
+
+    def wait_written(self, number):
+        """
+        Waits for an added item to be on disk and indexed
+        :param number: what `add` returned for the item
+        :return: none
+        """
+        with self.written_changed:
+            while self.written < number and not self.errors:
+                self.written_changed.wait()
+        if self.written < number:
+            raise self.errors[0]
+
+    def close(self):
+        """
+        Waits for every added item to be written
+        :return: none
+        """
+        self.pending.put(CLOSE)
+        self.thread.join()
+
+    def write(self):
+        index = connect_index(self.index_path)
+        closed = False
+        try:
+            with open(self.archive_path, 'ab') as archive_file:
+                while not closed:
+                    batch = [self.pending.get()]
+                    while len(batch) < self.member_size and batch[-1] is not CLOSE:
+                        try:
+                            batch.append(self.pending.get_nowait())
+                        except queue.Empty:
+                            break
+                    if batch[-1] is CLOSE:
+                        closed = True
+                        batch.pop()
+                    if batch:
+                        self.write_member(archive_file, index, batch)
+        except Exception as err:
+            with self.written_changed:
+                self.errors.append(err)
+                self.written_changed.notify_all()
+            # keep taking items, so `add` and `close` never wait on a writer that stopped
+            while not closed:
+                closed = self.pending.get() is CLOSE
+        finally:
+            index.close()
+
+    def write_member(self, archive_file, index, batch):
+        """
+        Appends a batch of items as one gzip member and indexes them once it's on disk
+        :param archive_file: the archive, opened for appending
+        :param index: sqlite3 connection to the index
+        :param batch: list of item records
+        :return: none
+        """
+        member = gzip.compress(''.join(json.dumps(record) + '\n' for record in batch).encode('utf-8'))
+
+        # runs of other kinds may append to the same archive from other processes, the index's write
+        # lock keeps the end of the file where this member starts until it's indexed
+        index.execute('BEGIN IMMEDIATE')
+        try:
+            archive_file.seek(0, os.SEEK_END)
+            offset = archive_file.tell()
+            archive_file.write(member)
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+            archived_at = int(time.time())
+            index.executemany(
+                'INSERT INTO archived VALUES (?, ?, ?, ?, ?)',
+                ((record['kind'], str(record['id']), record['created'], archived_at, offset)
+                 for record in batch))
+            index.commit()
+        except BaseException:
+            index.rollback()
+            raise
+
+        with self.written_changed:
+            self.written += len(batch)
+            self.written_changed.notify_all()
+
+
+class ArchiveReader:
+    """
+    Looks archived items up through the index, only decompressing the gzip members holding them
+    """
+
+    def __init__(self, archive_path, index_path, cached_members=CACHED_MEMBERS):
+        self.archive_path = archive_path
+        self.index = connect_index(index_path)
+        self.cached_members = cached_members
+        # member offset -> its item records, least recently used first
+        self.members = OrderedDict()
+
+    def member(self, offset):
+        """
+        :param offset: where the gzip member starts in the archive
+        :return: list of the item records in the member
+        """
+        records = self.members.get(offset)
+        if records is not None:
+            self.members.move_to_end(offset)
+            return records
+
+        records = self.read_member(offset)
+        self.members[offset] = records
+        if len(self.members) > self.cached_members:
+            self.members.popitem(last=False)
+        return records
+
+    def read_member(self, offset):
+        """
+        :param offset: where the gzip member starts in the archive
+        :return: list of the item records in the member, decompressed from the archive
+        """
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        data = []
+        with open(self.archive_path, 'rb') as archive_file:
+            archive_file.seek(offset)
+            while not decompressor.eof:
+                chunk = archive_file.read(READ_SIZE)
+                if not chunk:
+                    break
+                data.append(decompressor.decompress(chunk))
+        return [json.loads(line) for line in b''.join(data).decode('utf-8').splitlines()]
+
+    def find(self, kind, item_id, offset):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item_id: id of the item, as a string
+        :param offset: where the gzip member holding the item starts in the archive
+        :return: the item record stored in the member at `offset`
+        """
+        for record in self.member(offset):
+            if record['kind'] == kind and str(record['id']) == item_id:
+                return record
+        # the index points at a member that doesn't hold the item, e.g. the archive was truncated
+        raise KeyError(f'{kind} {item_id} is indexed at offset {offset} of {self.archive_path} but is not there')
+
+    def lookup(self, kind, item_id):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item_id: id of the item
+        :return: the item record as last archived, None if it never was
+        """
+        row = self.index.execute(
+            '''SELECT member_offset FROM archived WHERE kind = ? AND id = ?
+               ORDER BY archived_at DESC, rowid DESC LIMIT 1''', (kind, str(item_id))).fetchone()
+        return self.find(kind, str(item_id), row[0]) if row else None
+
+    def between(self, kind, start=None, end=None):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param start: epoch seconds, inclusive, None for no lower bound
+        :param end: epoch seconds, inclusive, None for no upper bound
+        :return: generator of the archived item records created between `start` and `end`, oldest first.
+        An item archived more than once is listed once per time.
+        """
+        rows = self.index.execute(
+            '''SELECT id, member_offset FROM archived
+               WHERE kind = ? AND created >= ? AND created <= ? ORDER BY created, rowid''',
+            (kind, -1 << 63 if start is None else start, (1 << 63) - 1 if end is None else end))
+        for item_id, offset in rows:
+            yield self.find(kind, item_id, offset)
+
+    def close(self):
+        self.members.clear()
+        self.index.close()
+
+
+def archive_ahead(archive_writer, entries, lookahead=MEMBER_SIZE):
+    """
+    Adds the items a run is about to delete to the archive `lookahead` items before the run gets to them,
+    so they are written while the ones before them are deleted. An item is only deleted once
+    `wait_written` says it's archived, which it usually already is by then.
+    Items archived ahead of a run that stopped early are archived without having been deleted.
+    :param archive_writer: ArchiveWriter
+    :param entries: iterable of (record, reason it's kept or None), see pipeline.Plan.ordered
+    :param lookahead: how many items ahead of the run they are archived
+    :return: generator of (record, reason, number to wait for before deleting the item or None if kept)
+    """
+    upcoming = deque()
+    for record, reason in entries:
+        upcoming.append((record, reason, archive_writer.add(record) if reason is None else None))
+        if len(upcoming) > lookahead:
+            yield upcoming.popleft()
+    yield from upcoming
+
+
+def archive_paths(platform):
+    """
+    :param platform: 'reddit' or 'twitter'
+    :return: (archive path, index path), in ~/.SocialAmnesia/<platform>
+    """
+    folder_path = os.path.join(STORAGE_FOLDER_PATH, platform)
+    os.makedirs(folder_path, exist_ok=True)
+    return os.path.join(folder_path, 'archive.jsonl.gz'), os.path.join(folder_path, 'archive_index.db')
+
+
+def open_archive(platform):
+    """
+    :param platform: 'reddit' or 'twitter'
+    :return: ArchiveWriter appending to the platform's archive
+    """
+    return ArchiveWriter(*archive_paths(platform))
+
+
+def open_archive_reader(platform):
+    """
+    :param platform: 'reddit' or 'twitter'
+    :return: ArchiveReader of the platform's archive
+    """
+    return ArchiveReader(*archive_paths(platform))
@@ -0,0 +1,224 @@
+"""
+Record and replay of the HTTP traffic praw and tweepy send through requests,
+so runs can be repeated offline against a recorded (or synthetic) account.
+
+    with cassettes.recording('reddit.json.gz'):
+        ...talk to reddit as usual...
+
+    with cassettes.replaying('reddit.json.gz', realtime=False):
+        ...the same calls are answered from the cassette...
+"""
+import gzip
+import json
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+# query parameters that don't change which response a request gets
+IGNORED_PARAMS = {'raw_json', 'limit'}
+
+# response headers worth keeping, the rate limit ones are read by praw and tweepy
+KEPT_HEADERS = ('content-type', 'x-ratelimit-remaining', 'x-ratelimit-used', 'x-ratelimit-reset',
+                'x-rate-limit-remaining', 'x-rate-limit-limit', 'x-rate-limit-reset')
+
+# secrets that never get written to a cassette
+SCRUBBED_FIELDS = ('access_token', 'refresh_token')
+
+
+def request_key(method, url, params=None):
+    """
+    Identifies a request independently of parameter order, trailing slashes and ignored parameters
+    :param method: HTTP method
+    :param url: URL, possibly with a query string
+    :param params: dict of query parameters sent next to the URL
+    :return: string key
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params or {})
+    # tweepy sends its parameters as bytes
+    kept = sorted((name, value.decode('utf-8') if isinstance(value, bytes) else str(value))
+                  for name, value in query.items() if name not in IGNORED_PARAMS)
+    return f'{method.upper()} {parts.netloc}{parts.path.rstrip("/")}?{urlencode(kept)}'
+
+
+def interaction(method, url, params=None, status=200, body='', headers=None, elapsed=0.0, repeat=False):
+    """
+    Builds one recorded request/response pair
+    :param method: HTTP method
+    :param url: URL of the request
+    :param params: dict of query parameters of the request
+    :param status: HTTP status of the response
+    :param body: response body, JSON bodies can be passed as dicts/lists
+    :param headers: dict of response headers
+    :param elapsed: seconds the response took
+    :param repeat: True to answer every matching request, False to answer only one
+    :return: dict describing the interaction
+    """
+    if not isinstance(body, str):
+        body = json.dumps(body)
+        headers = dict(headers or {}, **{'content-type': 'application/json'})
+
+    return {
+        'key': request_key(method, url, params),
+        'url': url,
+        'status': status,
+        'headers': headers or {},
+        'body': body,
+        'elapsed': elapsed,
+        'repeat': repeat,
+    }
+
+
+def open_cassette(path, mode):
+    """
+    :param path: cassette file, gzipped when it ends in .gz
+    :param mode: 'rt' or 'wt'
+    :return: text stream
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def load(path):
+    """
+    :param path: cassette file
+    :return: list of interactions
+    """
+    with open_cassette(path, 'rt') as cassette:
+        return json.load(cassette)['interactions']
+
+
+def save(path, interactions):
+    """
+    :param path: cassette file
+    :param interactions: iterable of interactions
+    :return: none
+    """
+    with open_cassette(path, 'wt') as cassette:
+        json.dump({'interactions': list(interactions)}, cassette)
+
+
+def scrub(body):
+    """
+    Blanks out tokens in a JSON response body
+    :param body: response body
+    :return: the body, without secrets
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(data, dict) and any(field in data for field in SCRUBBED_FIELDS):
+        for field in SCRUBBED_FIELDS:
+            if field in data:
+                data[field] = 'scrubbed'
+        return json.dumps(data)
+    return body
+
+
+def build_response(recorded, method, url):
+    """
+    Turns a recorded interaction back into a requests Response
+    :param recorded: the interaction
+    :param method: HTTP method of the request being answered
+    :param url: URL of the request being answered
+    :return: requests.Response
+    """
+    response = requests.models.Response()
+    response.status_code = recorded['status']
+    response.headers = requests.structures.CaseInsensitiveDict(
+        recorded['headers'])
+    response._content = recorded['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    response.reason = 'OK' if recorded['status'] < 400 else 'Error'
+    response.elapsed = timedelta(seconds=recorded['elapsed'])
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+@contextmanager
+def patched_session(request):
+    """
+    Routes every requests.Session.request call through `request` while the context is open
+    :param request: function taking (session, method, url, params, original, **kwargs)
+    :return: none
+    """
+    original = requests.Session.request
+
+    def patched(session, method, url, params=None, **kwargs):
+        # tweepy puts its parameters on the session instead of the call
+        merged = dict(session.params or {})
+        merged.update(params or {})
+        return request(session, method, url, merged, original, **kwargs)
+
+    requests.Session.request = patched
+    try:
+        yield
+    finally:
+        requests.Session.request = original
+
+
+@contextmanager
+def recording(path):
+    """
+    Records every request made while the context is open, written to `path` when it closes
+    :param path: cassette file
+    :return: none
+    """
+    interactions = []
+
+    def record(session, method, url, params, original, **kwargs):
+        started = time.monotonic()
+        response = original(session, method, url, params=params, **kwargs)
+        interactions.append(interaction(
+            method, url.split('?')[0], params, response.status_code, scrub(response.text),
+            {name: response.headers[name]
+                for name in KEPT_HEADERS if name in response.headers},
+            time.monotonic() - started))
+        return response
+
+    try:
+        with patched_session(record):
+            yield
+    finally:
+        save(path, interactions)
+
+
+@contextmanager
+def replaying(path_or_interactions, realtime=False):
+    """
+    Answers every request made while the context is open from a cassette, without touching the network
+    :param path_or_interactions: cassette file, or a list of interactions
+    :param realtime: True to take as long as the recorded responses did, False to answer right away
+    :return: dict of request key -> deque of the interactions still waiting for their request,
+    the ones answered only once are gone once answered
+    """
+    if isinstance(path_or_interactions, str):
+        path_or_interactions = load(path_or_interactions)
+
+    # same requests are answered in the order they were recorded in
+    queued = defaultdict(deque)
+    for recorded in path_or_interactions:
+        queued[recorded['key']].append(recorded)
+
+    def replay(session, method, url, params, original, **kwargs):
+        key = request_key(method, url, params)
+        if not queued[key]:
+            raise LookupError(f'No recorded response for {key}')
+
+        recorded = queued[key][0]
+        if not recorded['repeat']:
+            queued[key].popleft()
+        if realtime:
+            time.sleep(recorded['elapsed'])
+        return build_response(recorded, method, url)
+
+    with patched_session(replay):
+        yield queued
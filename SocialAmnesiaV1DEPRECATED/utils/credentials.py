@@ -0,0 +1,129 @@
+import json
+import os
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from utils.item_store import STORAGE_FOLDER_PATH
+
+KEY_FILE_PATH = os.path.join(STORAGE_FOLDER_PATH, 'credentials.key')
+# cached access tokens are treated as expired this long before they actually are
+EXPIRY_MARGIN_SECONDS = 60
+
+
+def load_key(key_path=KEY_FILE_PATH):
+    """
+    Reads the local key the credentials are encrypted with, creating it on first use.
+    Only the current user can read the key file.
+    :param key_path: where the key is stored
+    :return: the key
+    """
+    try:
+        with open(key_path, 'rb') as key_file:
+            return key_file.read()
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(key_path), exist_ok=True)
+    key = Fernet.generate_key()
+    # written aside and linked into place, so another process never reads a key file that is still empty
+    written_path = f'{key_path}.{os.getpid()}'
+    try:
+        with os.fdopen(os.open(written_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as key_file:
+            key_file.write(key)
+            key_file.flush()
+            os.fsync(key_file.fileno())
+        os.link(written_path, key_path)
+    except FileExistsError:
+        # another process started at the same time and created the key first, every process has to use that one
+        with open(key_path, 'rb') as key_file:
+            return key_file.read()
+    finally:
+        if os.path.exists(written_path):
+            os.remove(written_path)
+    return key
+
+
+class CredentialStore:
+    """
+    The secrets of a platform (passwords, client secrets, tokens), kept encrypted in its state
+    under 'credentials'. The key lives in its own file, so the state files never hold a secret in plaintext.
+    """
+
+    def __init__(self, state, key_path=KEY_FILE_PATH):
+        """
+        :param state: dictionary holding reddit or twitter settings
+        :param key_path: where the encryption key is stored
+        """
+        self.state = state
+        self.fernet = Fernet(load_key(key_path))
+
+    def load(self):
+        """
+        :return: dict of every stored secret, empty if there are none or they can't be decrypted
+        (e.g. the key file was deleted, in which case the user has to log in again)
+        """
+        if 'credentials' not in self.state:
+            return {}
+        try:
+            return json.loads(self.fernet.decrypt(self.state['credentials']).decode('utf-8'))
+        except (InvalidToken, ValueError):
+            return {}
+
+    def get(self, name, default=None):
+        """
+        :param name: name of the secret, e.g. 'reddit_password'
+        :param default: returned if the secret isn't stored
+        :return: the secret
+        """
+        return self.load().get(name, default)
+
+    def update(self, **secrets):
+        """
+        Stores secrets, replacing the ones with the same names
+        :param secrets: name -> secret
+        :return: none
+        """
+        stored = self.load()
+        stored.update(secrets)
+        self.state['credentials'] = self.fernet.encrypt(
+            json.dumps(stored).encode('utf-8'))
+        self.state.sync
+
+    def migrate(self, *names):
+        """
+        Moves secrets older versions stored in plaintext in the state into the encrypted store
+        :param names: keys of the state holding secrets
+        :return: none
+        """
+        plaintext = {name: self.state[name]
+                     for name in names if name in self.state}
+        if not plaintext:
+            return
+
+        self.update(**plaintext)
+        for name in plaintext:
+            del self.state[name]
+        self.state.sync
+
+    def cache_token(self, access_token, expires_at):
+        """
+        Caches an access token, so the next launch can use it instead of requesting a new one
+        :param access_token: the token
+        :param expires_at: epoch seconds the token expires at, None if it never does
+        :return: none
+        """
+        self.update(access_token=access_token, access_token_expires=expires_at)
+
+    def cached_token(self):
+        """
+        :return: (access token, expiry) if a cached token is still valid, otherwise None
+        """
+        stored = self.load()
+        access_token = stored.get('access_token')
+        expires_at = stored.get('access_token_expires')
+        if not access_token:
+            return None
+        if expires_at is not None and expires_at - EXPIRY_MARGIN_SECONDS <= time.time():
+            return None
+        return access_token, expires_at
@@ -0,0 +1,127 @@
+"""
+Pre-run cost model: how many API calls a run makes and how long they take,
+from the latency observed in recent runs and the rate limit headroom the API reported last.
+"""
+import math
+import time
+from datetime import datetime
+
+from utils import run_history
+
+# seconds per API call assumed until a run has been recorded
+DEFAULT_CALL_LATENCY = 0.5
+# how far back the observed latency is taken from
+LATENCY_WINDOW_SECONDS = 30 * run_history.DAY_SECONDS
+# how long a scheduled run has, the scheduler runs once in the hour picked
+SCHEDULE_WINDOW_SECONDS = 60 * 60
+
+
+class CostModel:
+    """
+    What deleting a number of items costs on one platform, with the settings of a run
+    """
+
+    def __init__(self, edits_per_item, deletes_per_item, latency, rate_limit=None, headroom=None, now=None):
+        """
+        :param edits_per_item: average edit calls per item, e.g. 7.5 for 5-10 random edits
+        :param deletes_per_item: delete calls per item, 0 or 1
+        :param latency: seconds per API call
+        :param rate_limit: (calls, period in seconds) the API allows, None if it has no known limit
+        :param headroom: (calls remaining, epoch seconds the period resets at) as last reported
+        by the API, None if unknown
+        :param now: epoch seconds the run starts at, None for the current time
+        """
+        self.edits_per_item = edits_per_item
+        self.deletes_per_item = deletes_per_item
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.headroom = headroom
+        self.now = time.time() if now is None else now
+
+    def calls(self, items):
+        """
+        :param items: how many items are deleted
+        :return: how many API calls deleting them makes
+        """
+        return items * (self.edits_per_item + self.deletes_per_item)
+
+    def seconds(self, items):
+        """
+        :param items: how many items are deleted
+        :return: how long deleting them takes, waiting for the rate limit included
+        """
+        calls = self.calls(items)
+        busy = calls * self.latency
+        if self.rate_limit is None:
+            return busy
+
+        limit, period = self.rate_limit
+        remaining, reset_at = self.headroom or (limit, self.now + period)
+        if calls <= remaining:
+            return busy
+
+        # the calls past the headroom wait for the period to reset, a full limit per period after that
+        extra = calls - remaining
+        periods = math.ceil(extra / limit)
+        throttled = max(0, reset_at - self.now) + (periods - 1) * period + \
+            (extra - (periods - 1) * limit) * self.latency
+        return max(busy, throttled)
+
+    def items_within(self, window):
+        """
+        Binary search for how many items fit in a span of time, the time taken only grows with the items
+        :param window: seconds available
+        :return: the most items deleted within `window`, unbounded if items cost nothing
+        """
+        if self.calls(1) == 0:
+            return math.inf
+
+        low, high = 0, 1
+        while self.seconds(high) <= window:
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.seconds(middle) <= window:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def describe(self, items):
+        """
+        :param items: how many items are deleted
+        :return: text for the UI, e.g. 'About 2,250 API calls (1,950 edits, 300 deletes), done in 40 minutes, around 14:05'
+        """
+        seconds = self.seconds(items)
+        finish = datetime.fromtimestamp(self.now + seconds).strftime('%H:%M')
+        return (f'About {round(self.calls(items)):,} API calls ({round(items * self.edits_per_item):,} edits, '
+                f'{round(items * self.deletes_per_item):,} deletes), done in {format_duration(seconds)}, around {finish}')
+
+
+def format_duration(seconds):
+    """
+    :param seconds: length of time
+    :return: the length in a human readable form for the UI, e.g. '2 hours 5 minutes'
+    """
+    minutes = math.ceil(seconds / 60)
+    if minutes < 60:
+        return f'{minutes} minute{"s" if minutes != 1 else ""}'
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours} hour{"s" if hours != 1 else ""} {minutes} minute{"s" if minutes != 1 else ""}'
+
+
+def cost_model(adapter, context, history=None):
+    """
+    Builds the cost model of a run from its settings and the platform's recent runs
+    :param adapter: PlatformAdapter
+    :param context: RunContext of the run
+    :param history: RunHistory to take the observed latency from, None to assume DEFAULT_CALL_LATENCY
+    :return: CostModel
+    """
+    latency = None
+    if history:
+        latency = history.call_latency(
+            adapter.platform, context.kind, since=time.time() - LATENCY_WINDOW_SECONDS)
+    edits_per_item, deletes_per_item = adapter.calls_per_item(context)
+    return CostModel(edits_per_item, deletes_per_item, latency or DEFAULT_CALL_LATENCY,
+                     adapter.rate_limit, adapter.rate_limit_headroom())
@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+
+# how many records a fetching thread hands over to be written at a time
+HANDOFF_BATCH_SIZE = 200
+# how many pages a pager fetches ahead of the page being processed
+PREFETCH_DEPTH = 2
+
+# seconds each thread spent in API calls made through timed_call, waits for a rate budget left out
+call_clock = threading.local()
+
+
+class RateBudget:
+    """
+    Token bucket shared by every thread calling the same API, so fetching
+    several listings at once stays under the API's rate limit.
+    """
+
+    def __init__(self, calls, period):
+        """
+        :param calls: how many calls the API allows per period
+        :param period: length of the period in seconds
+        """
+        self.capacity = calls
+        self.rate = calls / period
+        self.tokens = calls
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a call fits in the budget, then takes it
+        :return: none
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens +
+                                  (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def observe(self, remaining, reset_at=None):
+        """
+        Corrects the budget with the rate limit headers of a response, the API's count is the real one
+        :param remaining: calls left in the API's current period
+        :param reset_at: epoch seconds the API's period resets at, unused as the bucket refills on its own
+        :return: none
+        """
+        with self.lock:
+            self.tokens = min(self.tokens, remaining)
+
+
+def timed_call(function, *args, **kwargs):
+    """
+    Makes an API call, adding how long it took to the calling thread's api_seconds()
+    :param function: the call
+    :param args, kwargs: arguments of the call
+    :return: what the call returns
+    """
+    started = time.monotonic()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        call_clock.seconds = api_seconds() + time.monotonic() - started
+
+
+def api_seconds():
+    """
+    :return: seconds the calling thread spent in API calls made through timed_call so far
+    """
+    return getattr(call_clock, 'seconds', 0)
+
+
+def prefetch(pages, depth=PREFETCH_DEPTH):
+    """
+    Fetches the next pages of a listing on a background thread while the current one is
+    being processed, so listing latency is hidden behind the processing instead of added to it
+    :param pages: iterable of pages, ending once the end of the history is reached
+    :param depth: how many pages to fetch ahead, at least 1
+    :return: generator of the pages, in order
+    """
+    end_of_history = object()
+    buffer = queue.Queue(maxsize=max(1, depth))
+    stopped = threading.Event()
+    errors = []
+
+    def hand_over(page):
+        # give up once the consumer stopped listening, instead of blocking forever
+        while not stopped.is_set():
+            try:
+                buffer.put(page, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not hand_over(page):
+                    return
+        except Exception as err:
+            errors.append(err)
+        hand_over(end_of_history)
+
+    threading.Thread(target=fetch, daemon=True).start()
+
+    try:
+        while True:
+            page = buffer.get()
+            if page is end_of_history:
+                break
+            yield page
+    finally:
+        stopped.set()
+
+    if errors:
+        raise errors[0]
+
+
+def fetch_concurrently(sources, item_store):
+    """
+    Runs several fetches at the same time, one thread each, and writes what they
+    return to the item store. Only the calling thread touches the store, since
+    sqlite connections stay on the thread that opened them.
+    :param sources: dict of name -> function returning an iterable of item records
+    :param item_store: ItemStore to write to
+    :return: dict of name -> how many records that source returned
+    """
+    handoff = queue.Queue(maxsize=len(sources) * 4)
+    counts = {name: 0 for name in sources}
+    errors = []
+
+    def run(name, source):
+        try:
+            batch = []
+            for record in source():
+                batch.append(record)
+                if len(batch) == HANDOFF_BATCH_SIZE:
+                    handoff.put((name, batch))
+                    batch = []
+            if batch:
+                handoff.put((name, batch))
+        except Exception as err:
+            errors.append(err)
+        finally:
+            handoff.put((name, None))
+
+    threads = [threading.Thread(target=run, args=(name, source), daemon=True)
+               for name, source in sources.items()]
+    for thread in threads:
+        thread.start()
+
+    running = len(threads)
+    while running:
+        name, batch = handoff.get()
+        if batch is None:
+            running -= 1
+        else:
+            counts[name] += item_store.upsert(batch)
+
+    if errors:
+        raise errors[0]
+    return counts
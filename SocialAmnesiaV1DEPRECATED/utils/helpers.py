@@ -1,4 +1,17 @@
 import arrow
+import re
+import time
+from itertools import islice
+
+HOUR_SECONDS = 60 * 60
+DAY_SECONDS = 24 * HOUR_SECONDS
+WEEK_SECONDS = 7 * DAY_SECONDS
+# average gregorian year, 365.2425 days
+YEAR_SECONDS = 31556952
+
+# tkinter can't handle characters outside the basic multilingual plane
+ASTRAL_PATTERN = re.compile('[\U00010000-\U0010FFFF]')
+
 
 def set_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to_save, current_time_to_save):
     """
@@ -9,10 +22,8 @@ def set_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to_save,
     :param weeks_to_save: input received from the UI - how many weeks of items to save
     :param years_to_save: input received from the UI - how many years of items to save
     :param current_time_to_save: text shown to user in UI so they know how much time will be saved
-    :return: The formatted time to save for storing in state dictionaries
+    :return: The retention window in seconds for storing in state dictionaries
     """
-    total_hours = int(hours_to_save) + (int(days_to_save) * 24) + \
-        (int(weeks_to_save) * 168) + (int(years_to_save) * 8736)
 
     def get_text(time, text):
         return '' if time == '0' else time + text
@@ -28,7 +39,50 @@ def set_time_to_save(hours_to_save, days_to_save, weeks_to_save, years_to_save,
         current_time_to_save.set(
             f'Currently set to save: [{years_text} {weeks_text} {days_text} {hours_text}] of items')
 
-    return arrow.now().replace(hours=-total_hours)
+    return retention_seconds(hours_to_save, days_to_save, weeks_to_save, years_to_save)
+
+
+def retention_seconds(hours_to_save, days_to_save, weeks_to_save, years_to_save):
+    """
+    Converts the time to save picked in the UI into a retention window
+    :return: how many seconds of items to keep
+    """
+    return int(hours_to_save) * HOUR_SECONDS + int(days_to_save) * DAY_SECONDS + \
+        int(weeks_to_save) * WEEK_SECONDS + int(years_to_save) * YEAR_SECONDS
+
+
+def saved_retention_seconds(state):
+    """
+    The retention window of a state, rebuilt from the time picked in the UI for states
+    saved back when a fixed cutoff date was stored instead
+    :param state: dictionary holding reddit or twitter settings
+    :return: how many seconds of items to keep
+    """
+    if 'retention_seconds' in state:
+        return state['retention_seconds']
+    if 'hours' in state:
+        return retention_seconds(state['hours'], state['days'], state['weeks'], state['years'])
+    return 0
+
+
+def resolve_cutoff(retention):
+    """
+    Turns a retention window into the cutoff of a run, items created after it are kept.
+    Resolved when the run starts so the cutoff moves along with the current time.
+    :param retention: how many seconds of items to keep
+    :return: epoch seconds
+    """
+    return int(time.time()) - retention
+
+
+def format_cutoff(cutoff):
+    """
+    :param cutoff: epoch seconds
+    :return: the cutoff in a human readable form for the UI
+    """
+    if cutoff >= time.time() - 60:
+        return 'now'
+    return arrow.get(cutoff).humanize()
 
 
 def set_max_score(max_score, current_max_score, item_string):
@@ -61,15 +115,60 @@ def format_snippet(text, length):
     :param length: how many chars the snippet should be
     :return: formatted snippet with '...' if needed
     """
-    snippet = ''
-
     if len(text) > length:
         snippet = text[0:length] + '...'
     else:
         snippet = text
-    for char in snippet:
-        # tkinter can't handle certain unicode characters,
-        # so we strip them
-        if ord(char) > 65535:
-            snippet = snippet.replace(char, '')
-    return snippet
+    # tkinter can't handle certain unicode characters,
+    # so we strip them, in a single pass over the snippet
+    return ASTRAL_PATTERN.sub('', snippet)
+
+
+# twitter snowflake ids start counting from this point in time (ms since epoch)
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def snowflake_to_timestamp(tweet_id):
+    """
+    Reads the creation time encoded in a twitter snowflake id
+    :param tweet_id: id of a tweet created after november 2010
+    :return: epoch seconds
+    """
+    return ((int(tweet_id) >> 22) + TWITTER_EPOCH_MS) // 1000
+
+
+def timestamp_to_snowflake(timestamp):
+    """
+    The highest twitter snowflake id a tweet created at or before a point in time can have,
+    usable as max_id to skip every newer tweet
+    :param timestamp: epoch seconds, after november 2010
+    :return: snowflake id
+    """
+    # the low 22 bits are the worker and sequence numbers, any of them can follow the time
+    return ((int(timestamp) * 1000 + 999 - TWITTER_EPOCH_MS) << 22) | ((1 << 22) - 1)
+
+
+def chunked(iterable, size):
+    """
+    Splits an iterable into lists of at most `size` elements
+    :param iterable: the elements to split
+    :param size: maximum length of each list
+    :return: generator of lists
+    """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def check_for_existence(string, state, value):
+    """
+    Initialize a key/value pair if it doesn't already exist.
+    :param string: the key
+    :param state: dictionary holding reddit or twitter settings
+    :param value: the value
+    :return: none
+    """
+    if string not in state:
+        state[string] = value
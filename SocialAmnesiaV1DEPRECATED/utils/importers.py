@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from datetime import datetime, timezone
+
+from utils import helpers
+
+# files holding each kind of item inside the data export archives
+EXPORT_FILE_PATTERNS = {
+    'comments': re.compile(r'(^|/)comments\.csv$'),
+    'posts': re.compile(r'(^|/)posts\.csv$'),
+    'tweets': re.compile(r'(^|/)tweets?(-part\d+)?\.js$'),
+    'favorites': re.compile(r'(^|/)like(-part\d+)?\.js$'),
+}
+
+
+def open_export_files(path, identifying_text):
+    """
+    Finds the files holding one kind of item in a data export, without extracting it
+    :param path: the export zip, the folder it was extracted to, or a single file from it
+    :param identifying_text: 'comments', 'posts', 'tweets' or 'favorites'
+    :return: generator of text streams, one per matching file
+    """
+    pattern = EXPORT_FILE_PATTERNS[identifying_text]
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if pattern.search(name):
+                    with archive.open(name) as member:
+                        yield io.TextIOWrapper(member, encoding='utf-8', newline='')
+    elif os.path.isdir(path):
+        for folder, _, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                file_path = os.path.join(folder, file_name)
+                if pattern.search(file_path.replace(os.sep, '/')):
+                    with open(file_path, encoding='utf-8', newline='') as export_file:
+                        yield export_file
+    elif pattern.search(path.replace(os.sep, '/')):
+        with open(path, encoding='utf-8', newline='') as export_file:
+            yield export_file
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """
+    Decodes the elements of a JSON array one at a time, reading the stream in chunks.
+    Anything before the opening bracket (like the `window.YTD.tweets.part0 =` of twitter exports) is skipped.
+    :param stream: text stream positioned before the array
+    :param chunk_size: how many characters to read at a time
+    :return: generator of decoded elements
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    end_of_stream = False
+
+    while True:
+        if not started:
+            start = buffer.find('[')
+            if start != -1:
+                position = start + 1
+                started = True
+        else:
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+                position += 1
+
+            if position < len(buffer):
+                if buffer[position] == ']':
+                    return
+                try:
+                    element, position = decoder.raw_decode(buffer, position)
+                    yield element
+                    continue
+                except json.JSONDecodeError:
+                    if end_of_stream:
+                        raise
+
+        if end_of_stream:
+            if started:
+                raise ValueError('Unexpected end of export file')
+            return
+
+        # read at least as much as is already buffered, so an element spanning
+        # many chunks isn't re-decoded from its start after every chunk
+        chunk = stream.read(max(chunk_size, len(buffer) - position))
+        end_of_stream = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def parse_reddit_date(date):
+    """
+    :param date: date of a reddit export row, like '2019-04-19 01:08:46 UTC'
+    :return: epoch seconds
+    """
+    return int(datetime.strptime(date, '%Y-%m-%d %H:%M:%S UTC')
+               .replace(tzinfo=timezone.utc).timestamp())
+
+
+def iter_reddit_export(path, identifying_text):
+    """
+    Reads the comments or posts of a reddit data export
+    :param path: see open_export_files
+    :param identifying_text: 'comments' or 'posts'
+    :return: generator of item records
+    """
+    for export_file in open_export_files(path, identifying_text):
+        for row in csv.DictReader(export_file):
+            if identifying_text == 'comments':
+                text = row.get('body', '')
+                parent = row.get('parent', '')
+                is_reply = bool(parent) and not parent.startswith('t3_')
+                has_media = bool(row.get('media'))
+            else:
+                text = row.get('title', '')
+                is_reply = False
+                has_media = False
+
+            record = {
+                'id': row['id'],
+                'kind': identifying_text,
+                'created': parse_reddit_date(row['date']),
+                'text': text,
+                # exports carry no scores, refresh the metadata before relying on them
+                'score': 0,
+                'gilded': int(row.get('gildings') or 0),
+                'subreddit': row.get('subreddit', ''),
+                'is_reply': is_reply,
+                'has_media': has_media,
+                'refreshed': 0,
+            }
+            if identifying_text == 'posts':
+                # the text of self posts, as services/reddit.py keeps it from the listings
+                record['body'] = row.get('body', '')
+            yield record
+
+
+def iter_twitter_export(path, identifying_text):
+    """
+    Reads the tweets or likes of a twitter data export
+    :param path: see open_export_files
+    :param identifying_text: 'tweets' or 'favorites'
+    :return: generator of item records
+    """
+    for export_file in open_export_files(path, identifying_text):
+        for element in iter_json_array(export_file):
+            if identifying_text == 'tweets':
+                tweet = element.get('tweet', element)
+                yield {
+                    'id': int(tweet['id_str']),
+                    'kind': 'tweets',
+                    'created': int(datetime.strptime(
+                        tweet['created_at'], '%a %b %d %H:%M:%S %z %Y').timestamp()),
+                    'text': tweet.get('full_text', tweet.get('text', '')),
+                    'score': int(tweet.get('favorite_count', 0)),
+                    'retweets': int(tweet.get('retweet_count', 0)),
+                    'retweeted': tweet.get('full_text', '').startswith('RT @'),
+                    'is_reply': bool(tweet.get('in_reply_to_status_id_str')),
+                    'has_media': 'media' in tweet.get('entities', {}),
+                    'refreshed': 0,
+                }
+            else:
+                like = element.get('like', element)
+                # likes don't say when the tweet was created, but its id does
+                yield {
+                    'id': int(like['tweetId']),
+                    'kind': 'favorites',
+                    'created': helpers.snowflake_to_timestamp(like['tweetId']),
+                    'text': like.get('fullText', ''),
+                    'score': 0,
+                    'retweets': 0,
+                    'retweeted': False,
+                    'is_reply': False,
+                    'has_media': False,
+                    'refreshed': 0,
+                }
+
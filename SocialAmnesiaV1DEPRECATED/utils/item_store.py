@@ -0,0 +1,378 @@
+import json
+import os
+import re
+import sqlite3
+from array import array
+from bisect import bisect_left, bisect_right
+
+STORAGE_FOLDER_PATH = os.path.join(os.path.expanduser('~'), '.SocialAmnesia')
+# most ids looked up per query
+MAX_QUERY_IDS = 900
+# largest value of the created column, sqlite integers are 64 bit
+MAX_CREATED = (1 << 63) - 1
+TOKEN_PATTERN = re.compile(r'\w+')
+# a search term with at least this many index rows is looked for by walking the items newest first,
+# rarer terms by sorting their rows
+COMMON_TERM_ROWS = 20000
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens
+    :param text: the text to split
+    :return: list of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def join_tokens(tokens):
+    """
+    :param tokens: distinct tokens of an item
+    :return: the tokens as stored, a token is found in them with instr(tokens, ' token ')
+    and a token starting with a prefix with instr(tokens, ' prefix')
+    """
+    return f' {" ".join(tokens)} '
+
+
+def token_range(token, prefix_bool):
+    """
+    :param token: lowercase word token
+    :param prefix_bool: True to match every token starting with `token`, False to match it exactly
+    :return: (lowest, highest) bounds of the matching tokens, the highest one excluded
+    """
+    if prefix_bool:
+        return token, token[:-1] + chr(ord(token[-1]) + 1)
+    # nothing sorts between a token and the token followed by the lowest character
+    return token, token + '\0'
+
+
+class ItemStore:
+    """
+    Local store of item records (see `to_record` in the services), one table shared by
+    every kind of item ('comments', 'posts', 'tweets', 'favorites') of a platform.
+    Items gathered from the APIs and imported from data exports both end up here.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS items (
+                kind TEXT NOT NULL,
+                id TEXT NOT NULL,
+                created INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                -- the distinct words of the item's text, space separated with a space at each end
+                tokens TEXT NOT NULL,
+                PRIMARY KEY (kind, id)
+            )''')
+        # (created, id) orders items uniquely, so iteration can resume after any item
+        self.connection.execute('DROP INDEX IF EXISTS items_created')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS items_order ON items (kind, created, id)')
+        # which items have a word, newest first, to look items up by word or by the start of one.
+        # Items are referred to by rowid, which upsert keeps when it replaces an item
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS item_tokens (
+                kind TEXT NOT NULL,
+                token TEXT NOT NULL,
+                created INTEGER NOT NULL,
+                item INTEGER NOT NULL,
+                PRIMARY KEY (kind, token, created, item)
+            ) WITHOUT ROWID''')
+        self.connection.commit()
+        # kind -> sorted array of the creation times of its items, built on first use and dropped on writes
+        self.timelines = {}
+
+    def upsert(self, records):
+        """
+        Insert items, replacing the stored copy of items that are already known
+        :param records: iterable of item records
+        :return: number of records written
+        """
+        self.timelines.clear()
+        written = 0
+        with self.connection:
+            for record in records:
+                kind, item_id, created = record['kind'], str(record['id']), record['created']
+                tokens = sorted(set(tokenize(record['text'])))
+                row = self.connection.execute(
+                    'SELECT rowid, created, tokens FROM items WHERE kind = ? AND id = ?', (kind, item_id)).fetchone()
+                if row:
+                    item = row[0]
+                    self.unindex(kind, item, row[1], row[2])
+                    self.connection.execute(
+                        'UPDATE items SET created = ?, data = ?, tokens = ? WHERE rowid = ?',
+                        (created, json.dumps(record), join_tokens(tokens), item))
+                else:
+                    item = self.connection.execute(
+                        'INSERT INTO items (kind, id, created, data, tokens) VALUES (?, ?, ?, ?, ?)',
+                        (kind, item_id, created, json.dumps(record), join_tokens(tokens))).lastrowid
+                self.connection.executemany(
+                    'INSERT INTO item_tokens (kind, token, created, item) VALUES (?, ?, ?, ?)',
+                    ((kind, token, created, item) for token in tokens))
+                written += 1
+        return written
+
+    def unindex(self, kind, item, created, tokens):
+        """
+        Drops an item's words from the index
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item: rowid of the item
+        :param created: creation time the item was indexed with
+        :param tokens: its tokens column
+        :return: none
+        """
+        self.connection.executemany(
+            'DELETE FROM item_tokens WHERE kind = ? AND token = ? AND created = ? AND item = ?',
+            ((kind, token, created, item) for token in tokens.split()))
+
+    def add_all(self, records, batch_size=1000, progress_callback=None):
+        """
+        Feeds records into the store in batches, so they never have to all fit in memory
+        :param records: iterable of item records, e.g. a listing or an export being read
+        :param batch_size: how many records to write per transaction
+        :param progress_callback: called with the running total after every batch
+        :return: how many records were written
+        """
+        total = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == batch_size:
+                total += self.upsert(batch)
+                batch = []
+                if progress_callback:
+                    progress_callback(total)
+
+        if batch:
+            total += self.upsert(batch)
+            if progress_callback:
+                progress_callback(total)
+
+        return total
+
+    def get(self, kind, item_id):
+        """
+        Look up a single item
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item_id: id of the item
+        :return: the item record, or None if it isn't stored
+        """
+        row = self.connection.execute(
+            'SELECT data FROM items WHERE kind = ? AND id = ?', (kind, str(item_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, kind, item_ids):
+        """
+        Look up several items at once
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item_ids: ids of the items
+        :return: dict of item id -> item record for the items that are stored
+        """
+        item_ids = [str(item_id) for item_id in item_ids]
+        records = {}
+        # older sqlite versions allow at most 999 parameters per query
+        for start in range(0, len(item_ids), MAX_QUERY_IDS):
+            batch = item_ids[start:start + MAX_QUERY_IDS]
+            rows = self.connection.execute(
+                f'SELECT data FROM items WHERE kind = ? AND id IN ({",".join("?" * len(batch))})',
+                [kind] + batch)
+            for row in rows:
+                record = json.loads(row[0])
+                records[record['id']] = record
+        return records
+
+    def iter_items(self, kind, chunk_size=1000, created_before=None, oldest_first=False):
+        """
+        Iterate over the stored items of a kind, newest first. Only one chunk is held at a time and
+        each chunk is a separate query resuming after the last item, so items can be updated
+        or removed while iterating.
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param chunk_size: how many rows to pull from the database at a time
+        :param created_before: epoch seconds, only items created at or before it, None for every item
+        :param oldest_first: True to iterate oldest first instead
+        :return: generator of item records
+        """
+        if created_before is None:
+            created_before = MAX_CREATED
+        if oldest_first:
+            first_query = '''SELECT created, id, data FROM items WHERE kind = ? AND created <= ?
+                             ORDER BY created, id LIMIT ?'''
+            next_query = '''SELECT created, id, data FROM items
+                            WHERE kind = ? AND created <= ? AND created >= ? AND (created > ? OR id > ?)
+                            ORDER BY created, id LIMIT ?'''
+        else:
+            first_query = '''SELECT created, id, data FROM items WHERE kind = ? AND created <= ?
+                             ORDER BY created DESC, id DESC LIMIT ?'''
+            next_query = '''SELECT created, id, data FROM items
+                            WHERE kind = ? AND created <= ? AND created <= ? AND (created < ? OR id < ?)
+                            ORDER BY created DESC, id DESC LIMIT ?'''
+
+        rows = self.connection.execute(
+            first_query, (kind, created_before, chunk_size)).fetchall()
+        while rows:
+            for row in rows:
+                yield json.loads(row[2])
+
+            created, item_id = rows[-1][0], rows[-1][1]
+            rows = self.connection.execute(
+                next_query, (kind, created_before, created, created, item_id, chunk_size)).fetchall()
+
+    def page(self, kind, offset, limit):
+        """
+        One page of the stored items of a kind, newest first
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param offset: how many items to skip
+        :param limit: how many items to return at most
+        :return: list of item records
+        """
+        rows = self.connection.execute(
+            'SELECT data FROM items WHERE kind = ? ORDER BY created DESC, id DESC LIMIT ? OFFSET ?',
+            (kind, limit, offset))
+        return [json.loads(row[0]) for row in rows]
+
+    def match_query(self, kind, tokens, prefix=None):
+        """
+        Builds the query listing the items whose text has every one of `tokens` as a word,
+        and a word starting with `prefix`, newest first
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param tokens: list of lowercase word tokens
+        :param prefix: start of a word, None for no such word
+        :return: (sql selecting the created time and rowid of the matching items, its parameters)
+        """
+        terms = [(token_range(token, False), f' {token} ') for token in tokens]
+        if prefix:
+            terms.append((token_range(prefix, True), f' {prefix}'))
+
+        # how many items each term has, counted no further than what tells a common term apart
+        sizes = [self.connection.execute(
+            '''SELECT COUNT(*) FROM (SELECT 1 FROM item_tokens
+                                     WHERE kind = ? AND token >= ? AND token < ? LIMIT ?)''',
+            (kind, low, high, COMMON_TERM_ROWS)).fetchone()[0] for (low, high), _ in terms]
+        rarest = sizes.index(min(sizes))
+
+        if sizes[rarest] < COMMON_TERM_ROWS:
+            # few enough items to sort, the other terms are only checked on those
+            others = terms[:rarest] + terms[rarest + 1:]
+            # items created the same second are ordered by rowid, their id would take reading every item
+            sql = f'''SELECT DISTINCT listed.created, listed.item FROM item_tokens listed
+                      {'JOIN items item ON item.rowid = listed.item' if others else ''}
+                      WHERE listed.kind = ? AND listed.token >= ? AND listed.token < ?
+                      {''.join(' AND instr(item.tokens, ?) > 0' for _ in others)}
+                      ORDER BY listed.created DESC, listed.item DESC'''
+            parameters = [kind, *terms[rarest][0]]
+        else:
+            # every term is common, walking the items in order finds matches quickly
+            others = terms
+            sql = f'''SELECT item.created, item.rowid AS item FROM items item WHERE item.kind = ?
+                      {''.join(' AND instr(item.tokens, ?) > 0' for _ in others)}
+                      ORDER BY item.created DESC, item.id DESC'''
+            parameters = [kind]
+        return sql, parameters + [needle for _, needle in others]
+
+    def search(self, kind, tokens, prefix=None, offset=0, limit=-1):
+        """
+        Looks items up by the words of their text, through the index kept up to date by upsert and remove
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param tokens: list of lowercase word tokens the text has to have
+        :param prefix: start of a word the text has to have, None for no such word
+        :param offset: how many matching items to skip
+        :param limit: how many items to return at most, -1 for no limit
+        :return: list of the matching item records, newest first
+        """
+        sql, parameters = self.match_query(kind, tokens, prefix)
+        items = [row[1] for row in self.connection.execute(f'{sql} LIMIT ? OFFSET ?', parameters + [limit, offset])]
+        data = {}
+        for start in range(0, len(items), MAX_QUERY_IDS):
+            batch = items[start:start + MAX_QUERY_IDS]
+            data.update(self.connection.execute(
+                f'SELECT rowid, data FROM items WHERE rowid IN ({",".join("?" * len(batch))})', batch))
+        return [json.loads(data[item]) for item in items]
+
+    def iter_matches(self, kind, tokens, prefix=None):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param tokens: see search
+        :param prefix: see search
+        :return: generator of every matching item record, in no particular order, streamed from the database
+        """
+        sql, parameters = self.match_query(kind, tokens, prefix)
+        for row in self.connection.execute(
+                f'SELECT item.data FROM ({sql}) found JOIN items item ON item.rowid = found.item', parameters):
+            yield json.loads(row[0])
+
+    def count_matches(self, kind, tokens, prefix=None, at_most=-1):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param tokens: see search
+        :param prefix: see search
+        :param at_most: stop counting there, -1 to count every match
+        :return: how many items match
+        """
+        sql, parameters = self.match_query(kind, tokens, prefix)
+        return self.connection.execute(
+            f'SELECT COUNT(*) FROM ({sql} LIMIT ?)', parameters + [at_most]).fetchone()[0]
+
+    def count(self, kind):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :return: how many items of a kind are stored
+        """
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM items WHERE kind = ?', (kind,)).fetchone()[0]
+
+    def timeline(self, kind):
+        """
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :return: sorted array of the creation times of the stored items of a kind
+        """
+        if kind not in self.timelines:
+            # read straight from the (kind, created, id) index, already in order
+            self.timelines[kind] = array('q', (row[0] for row in self.connection.execute(
+                'SELECT created FROM items WHERE kind = ? ORDER BY created', (kind,))))
+        return self.timelines[kind]
+
+    def count_created_between(self, kind, start=None, end=None):
+        """
+        Counts the items created in a span of time with a binary search, e.g. how many items
+        a retention window would delete while the user is still picking it
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param start: epoch seconds, inclusive, None for no lower bound
+        :param end: epoch seconds, inclusive, None for no upper bound
+        :return: how many items of a kind were created between `start` and `end`
+        """
+        created = self.timeline(kind)
+        low = 0 if start is None else bisect_left(created, start)
+        high = len(created) if end is None else bisect_right(created, end)
+        return max(0, high - low)
+
+    def remove(self, kind, item_ids):
+        """
+        Forget items, used once they have been deleted
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param item_ids: iterable of item ids
+        :return: none
+        """
+        self.timelines.pop(kind, None)
+        with self.connection:
+            for item_id in item_ids:
+                row = self.connection.execute(
+                    'SELECT rowid, created, tokens FROM items WHERE kind = ? AND id = ?',
+                    (kind, str(item_id))).fetchone()
+                if row:
+                    self.unindex(kind, *row)
+                    self.connection.execute('DELETE FROM items WHERE rowid = ?', (row[0],))
+
+    def close(self):
+        self.connection.close()
+
+
+def open_item_store(platform):
+    """
+    Opens the item store of a platform, stored in ~/.SocialAmnesia/<platform>/items.db
+    :param platform: 'reddit' or 'twitter'
+    :return: ItemStore
+    """
+    folder_path = os.path.join(STORAGE_FOLDER_PATH, platform)
+    os.makedirs(folder_path, exist_ok=True)
+    return ItemStore(os.path.join(folder_path, 'items.db'))
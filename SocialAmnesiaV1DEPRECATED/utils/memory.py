@@ -0,0 +1,53 @@
+import gc
+import os
+import sys
+
+# how many items the pipeline holds in memory at a time
+CHUNK_SIZE = 1000
+# resident memory the app tries to stay under, no matter how long the history is
+MEMORY_CEILING_MB = 200
+
+try:
+    import resource
+except ImportError:
+    # windows
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    :return: the most resident memory the process has used so far in MB, None where unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """
+    :return: the resident memory the process uses right now in MB, the peak where the current use is unknown
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def enforce_ceiling(ceiling_mb=MEMORY_CEILING_MB, caches=()):
+    """
+    Called between chunks, empties the caches and collects garbage when memory runs over the ceiling
+    :param ceiling_mb: the ceiling in MB
+    :param caches: objects with a clear() method that can be emptied
+    :return: True if memory had to be freed
+    """
+    rss = current_rss_mb()
+    if rss is None or rss <= ceiling_mb:
+        return False
+
+    for cache in caches:
+        cache.clear()
+    gc.collect()
+    return True
@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# how long the user has to finish logging in in the browser
+CALLBACK_TIMEOUT_SECONDS = 5 * 60
+# how often the UI checks whether the browser came back
+POLL_INTERVAL_MS = 100
+# how often the serving thread checks whether it should stop
+SHUTDOWN_POLL_SECONDS = 0.1
+
+
+class OAuthError(Exception):
+    """
+    The browser came back without a usable authorization code
+    """
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(
+            urlsplit(self.path).query).items()}
+
+        # e.g. the browser asking for /favicon.ico, keep waiting for the real redirect
+        if 'code' not in params and 'error' not in params:
+            self.respond(404, 'Not found')
+            return
+
+        server = self.server
+        if params.get('state') != server.expected_state:
+            self.respond(400, 'Login failed: the login request did not match, please try again.')
+            server.resolve(error=OAuthError(
+                f'State mismatch. Expected: {server.expected_state} Received: {params.get("state")}'))
+        elif 'error' in params:
+            self.respond(400, f'Login failed: {params["error"]}')
+            server.resolve(error=OAuthError(params['error']))
+        else:
+            self.respond(200, 'Login complete, you can close this window and go back to Social Amnesia.')
+            server.resolve(code=params['code'])
+
+    def respond(self, status, message):
+        body = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CallbackServer(HTTPServer):
+    """
+    Waits on a background thread for the browser to come back from an OAuth authorization page.
+    `future` resolves to the authorization code, or to OAuthError/TimeoutError.
+    """
+
+    def __init__(self, expected_state, port=0, timeout=CALLBACK_TIMEOUT_SECONDS):
+        """
+        :param expected_state: the state sent along to the authorization page
+        :param port: port to listen on, 0 to pick a free one
+        :param timeout: seconds to wait for the browser before giving up
+        """
+        super().__init__(('localhost', port), CallbackHandler)
+        self.expected_state = expected_state
+        self.future = Future()
+        # the handler and the timeout timer can both try to resolve the future
+        self.lock = threading.Lock()
+        self.future.add_done_callback(self.finish)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.timer = threading.Timer(timeout, self.resolve, kwargs={'error': TimeoutError(
+            'Timed out waiting for the browser to finish logging in')})
+        self.timer.daemon = True
+
+    @property
+    def redirect_uri(self):
+        return f'http://localhost:{self.server_port}'
+
+    def start(self):
+        self.thread.start()
+        self.timer.start()
+        return self
+
+    def serve(self):
+        try:
+            self.serve_forever(poll_interval=SHUTDOWN_POLL_SECONDS)
+        finally:
+            self.server_close()
+
+    def resolve(self, code=None, error=None):
+        """
+        Settles the future with the authorization code or an error, unless it already is
+        :return: none
+        """
+        with self.lock:
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(code)
+
+    def finish(self, future):
+        """
+        Stops serving once the future is settled. Called on whichever thread settled it, which can be
+        the serving thread itself, so shutting down (which waits for it) happens on another one.
+        :param future: the settled future
+        :return: none
+        """
+        self.timer.cancel()
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def cancel(self):
+        """
+        Stops waiting, e.g. when the user starts another login.
+        The port is free again once this returns.
+        :return: none
+        """
+        self.future.cancel()
+        self.timer.cancel()
+        if self.thread.ident is None:
+            self.server_close()
+            return
+        self.shutdown()
+        self.thread.join()
+
+
+def when_done(root, future, callback, poll_interval_ms=POLL_INTERVAL_MS):
+    """
+    Calls `callback(future)` on the Tk thread once the future is done, without blocking the UI
+    :param root: the reference to the actual tkinter GUI window
+    :param future: concurrent.futures.Future
+    :param callback: called with the future
+    :param poll_interval_ms: how often to check the future
+    :return: none
+    """
+    if future.done():
+        callback(future)
+    else:
+        root.after(poll_interval_ms, lambda: when_done(
+            root, future, callback, poll_interval_ms))
@@ -0,0 +1,789 @@
+"""
+The deletion pipeline shared by every platform:
+    fetch -> normalize -> filter -> plan -> execute -> record
+Each platform only provides a PlatformAdapter (see services/reddit.py and services/twitter.py),
+everything else, including the confirmation, whitelist and scheduler windows, is built here once.
+"""
+import heapq
+import time
+from itertools import islice
+from typing import Any, FrozenSet, NamedTuple
+import tkinter as tk
+import tkinter.ttk as ttk
+from datetime import datetime
+from tkinter import messagebox
+
+from utils import archive, estimates, fetcher, helpers, memory, rules, run_history, run_lock, search, snippets, status_server, windows
+
+# most items listed in the confirmation window, one row of widgets each
+PREVIEW_LIMIT = 1000
+# items per page of the whitelist window
+WHITELIST_PAGE_SIZE = 500
+# most matches of a whitelist filter counted, more are shown as e.g. '5000+'
+WHITELIST_MAX_COUNTED = 10 * WHITELIST_PAGE_SIZE
+
+# orders a run can delete items in, so a run cut short has deleted the items that matter most
+ORDER_OLDEST = 'oldest'
+ORDER_SCORE = 'score'
+ORDER_RULES = 'rules'
+ORDER_NEWEST = 'newest'
+# order -> how it's shown in the UI
+DELETION_ORDERS = {
+    ORDER_OLDEST: 'Oldest items',
+    ORDER_SCORE: 'Highest scoring items',
+    ORDER_RULES: 'Items matching the most priority rules',
+    ORDER_NEWEST: 'Newest items',
+}
+
+
+class RunContext(NamedTuple):
+    """
+    Everything a run reads from the platform's settings, read from the shelf once when the run starts.
+    Every access to the shelf unpickles, so the per-item stages only ever read from this.
+    """
+    platform: str
+    kind: str
+    # epoch seconds, items created after it are kept
+    cutoff: int
+    # ids of the whitelisted items
+    whitelist: FrozenSet
+    keep_rules: rules.KeepRules
+    # the platform's own settings, an instance of its adapter's `Settings`
+    settings: Any
+    # one of DELETION_ORDERS
+    order: str = ORDER_OLDEST
+    priority_rules: Any = None
+    # True to archive items before they are edited or deleted, see utils/archive.py
+    archive: bool = False
+    # what runs are locked by, see `PlatformAdapter.account`
+    account: str = ''
+
+
+class PlatformAdapter:
+    """
+    What the pipeline needs to know about a platform. Subclasses fill in the API calls,
+    records are the platform neutral dicts returned by their `to_record`.
+    """
+    class Settings(NamedTuple):
+        """
+        The platform's own settings a run needs, named like their keys in the state
+        """
+    # 'reddit' or 'twitter'
+    platform = ''
+    # identifying texts of the item kinds, e.g. ('comments', 'posts')
+    kinds = ()
+    # text shown while an item is being processed, e.g. 'Deleting'
+    action_text = 'Deleting'
+    # (calls, period in seconds) the API allows, None if it has no known limit
+    rate_limit = None
+
+    def __init__(self):
+        # set once the scheduler ran in its hour, so it runs once a day
+        self.already_ran = False
+
+    def item_label(self, kind):
+        """
+        :param kind: identifying text of the item kind
+        :return: name of a single item in status texts, e.g. 'Comment'
+        """
+        raise NotImplementedError
+
+    def confirmation_title(self, kind):
+        """
+        :param kind: identifying text of the item kind
+        :return: title of the confirmation window
+        """
+        raise NotImplementedError
+
+    def fetch(self, kind, state, item_store):
+        """
+        Gathers one kind of item from the API into the item store, normalized with `to_record`
+        :return: none
+        """
+        raise NotImplementedError
+
+    def fetch_all(self, state, item_store):
+        """
+        Gathers every kind of item from the API into the item store
+        :return: none
+        """
+        for kind in self.kinds:
+            self.fetch(kind, state, item_store)
+
+    def refresh(self, kind, item_store, refreshed_before, cutoff=None):
+        """
+        Refreshes the stored items not refreshed since `refreshed_before` and created at or before `cutoff`,
+        see `refresh_item_metadata`
+        :return: none
+        """
+        raise NotImplementedError
+
+    def account(self, state):
+        """
+        :param state: dictionary holding the platform's settings
+        :return: identifies the logged in account across processes, e.g. 'reddit:username'
+        """
+        return f'{self.platform}:{state.get(f"{self.platform}_username", "")}'
+
+    def snapshot(self, kind, state):
+        """
+        Reads what a run needs from the state
+        :param kind: identifying text of the item kind
+        :param state: dictionary holding the platform's settings
+        :return: RunContext
+        """
+        whitelisted = state[f'whitelisted_{kind}']
+        return RunContext(
+            platform=self.platform,
+            kind=kind,
+            cutoff=helpers.resolve_cutoff(state['retention_seconds']),
+            whitelist=frozenset(
+                item_id for item_id, kept in whitelisted.items() if kept),
+            keep_rules=rules.compile_rules(state),
+            settings=self.Settings(
+                **{name: state[name] for name in self.Settings._fields}),
+            order=state.get('deletion_order', ORDER_OLDEST),
+            priority_rules=rules.compile_rules(state, 'priority_rules'),
+            archive=bool(state.get('archive_items', 0)),
+            account=self.account(state),
+        )
+
+    def skip_reason(self, record, context):
+        """
+        The platform's own filters, checked after the retention cutoff and before whitelists and keep-rules
+        :param record: item record
+        :param context: RunContext
+        :return: why the item is kept, or None
+        """
+        return None
+
+    def execute(self, record, context):
+        """
+        Edits and/or deletes an item, raising if it fails
+        :param record: item record
+        :param context: RunContext
+        :return: run_history.DELETED or run_history.EDITED
+        """
+        raise NotImplementedError
+
+    def calls_per_item(self, context):
+        """
+        How many API calls `execute` makes per item, for the cost model
+        :param context: RunContext
+        :return: (average edit calls, delete calls)
+        """
+        return 0, 1
+
+    def rate_limit_headroom(self):
+        """
+        :return: (calls remaining, epoch seconds the rate limit period resets at) as last reported
+        by the API, None if unknown
+        """
+        return None
+
+
+class Progress:
+    """
+    Shows a run's progress in the UI vars handed to the delete functions
+    """
+
+    def __init__(self, root, currently_deleting_text, deletion_progress_bar, num_deleted_items_text):
+        self.root = root
+        self.currently_deleting_text = currently_deleting_text
+        self.deletion_progress_bar = deletion_progress_bar
+        self.num_deleted_items_text = num_deleted_items_text
+
+    def start(self, total):
+        self.num_deleted_items_text.set(
+            f'0/{str(total)} items processed so far')
+
+    def status(self, text):
+        self.currently_deleting_text.set(text)
+
+    def step(self, count, total):
+        self.num_deleted_items_text.set(
+            f'{str(count)}/{str(total)} items processed.')
+        self.deletion_progress_bar['value'] = round((count / total) * 100, 1)
+        self.root.update()
+
+
+def priority_key(context):
+    """
+    :param context: RunContext
+    :return: function turning a record into a key, items with smaller keys are deleted first
+    """
+    if context.order == ORDER_SCORE:
+        return lambda record: (-record['score'], record['created'])
+    if context.order == ORDER_RULES:
+        priority_rules = context.priority_rules
+        return lambda record: (-priority_rules.weight(record), record['created'])
+    if context.order == ORDER_NEWEST:
+        return lambda record: -record['created']
+    return lambda record: record['created']
+
+
+def fetch(adapter, kind, state, item_store, gathered_at=None):
+    """
+    Fetch stage, gathers the items unless that already happened and refreshes
+    the stored items the API didn't return (e.g. imported from a data export)
+    :param adapter: PlatformAdapter
+    :param kind: identifying text of the item kind
+    :param state: dictionary holding the platform's settings
+    :param item_store: ItemStore of the platform
+    :param gathered_at: epoch seconds the items were already gathered at, None to gather them now
+    :return: none
+    """
+    if gathered_at is None:
+        gathered_at = int(time.time())
+        adapter.fetch(kind, state, item_store)
+    # items newer than the cutoff are kept whatever their score, no need to ask the API about them
+    adapter.refresh(kind, item_store, gathered_at,
+                    helpers.resolve_cutoff(state['retention_seconds']))
+
+
+class Plan:
+    """
+    Filter and plan stages, every stored item of a kind created at or before the cutoff with the reason
+    it is kept, or None for items that will be deleted. The items newer than the cutoff are only counted,
+    with a binary search over the store's timeline. Items are streamed from the item store
+    chunk by chunk, so a plan costs the same memory for 3,200 items as for 300,000.
+    """
+
+    def __init__(self, adapter, kind, state, item_store, chunk_size=memory.CHUNK_SIZE):
+        self.adapter = adapter
+        self.kind = kind
+        self.item_store = item_store
+        self.chunk_size = chunk_size
+        self.context = adapter.snapshot(kind, state)
+        self.cutoff = self.context.cutoff
+        self.recent_count = item_store.count_created_between(
+            kind, start=self.cutoff + 1)
+
+        self.total = 0
+        self.doomed_count = 0
+        for _, reason in self:
+            self.total += 1
+            if reason is None:
+                self.doomed_count += 1
+
+    def reason(self, record):
+        """
+        :param record: item record
+        :return: why the item is kept, or None if it will be deleted
+        """
+        context = self.context
+        if record['created'] > context.cutoff:
+            return 'is more recent than cutoff'
+        reason = self.adapter.skip_reason(record, context)
+        if reason is None and record['id'] in context.whitelist:
+            reason = 'is whitelisted'
+        if reason is None and context.keep_rules:
+            reason = context.keep_rules.keep_reason(record)
+        return reason
+
+    def __iter__(self):
+        """
+        :return: generator of (record, reason) for every stored item created at or before the cutoff, newest first
+        """
+        return self.iterate()
+
+    def iterate(self, oldest_first=False):
+        """
+        :param oldest_first: True to go oldest first instead
+        :return: generator of (record, reason) for every stored item created at or before the cutoff
+        """
+        for record in self.item_store.iter_items(self.kind, self.chunk_size, self.cutoff, oldest_first):
+            yield record, self.reason(record)
+
+    def __len__(self):
+        return self.total
+
+    def doomed(self):
+        """
+        :return: generator of the records that will be deleted, newest first
+        """
+        return (record for record, reason in self if reason is None)
+
+    def first_doomed(self, limit):
+        """
+        :param limit: how many records to return at most
+        :return: list of the first records that will be deleted, in the order they will be
+        """
+        if self.context.order in (ORDER_NEWEST, ORDER_OLDEST):
+            return list(islice((record for record, reason in self.ordered() if reason is None), limit))
+        return heapq.nsmallest(limit, self.doomed(), key=priority_key(self.context))
+
+    def ordered(self):
+        """
+        Items in the order the run processes them. Oldest and newest first come straight from the store,
+        for the other orders the kept items stream by first, then the ones to delete by priority.
+        Only (key, id) pairs are heaped, the records are read back from the store a chunk at a time
+        as they come off the heap.
+        :return: generator of (record, reason)
+        """
+        # both are orders the store can stream items in, straight from its index
+        if self.context.order == ORDER_NEWEST:
+            yield from self.iterate()
+            return
+        if self.context.order == ORDER_OLDEST:
+            yield from self.iterate(oldest_first=True)
+            return
+
+        key = priority_key(self.context)
+        heap = []
+        for record, reason in self:
+            if reason is None:
+                heap.append((key(record), record['id']))
+            else:
+                yield record, reason
+
+        # heapify is O(n), each pop O(log n)
+        heapq.heapify(heap)
+        while heap:
+            item_ids = [heapq.heappop(heap)[1]
+                        for _ in range(min(self.chunk_size, len(heap)))]
+            records = self.item_store.get_many(self.kind, item_ids)
+            for item_id in item_ids:
+                # gone if the item was removed from the store since planning
+                if item_id in records:
+                    yield records[item_id], None
+
+
+def execute(adapter, plan, item_store, progress, history=None, scheduled_bool=False, limit=None, job=None, lease=None):
+    """
+    Execute and record stages, deletes the planned items and records each outcome.
+    Settings come from the plan's RunContext, the state isn't read again.
+    Every entry point runs through here, so no two runs ever delete the same account's items at once.
+    :param adapter: PlatformAdapter
+    :param plan: Plan
+    :param item_store: ItemStore of the platform
+    :param progress: Progress
+    :param history: RunHistory to record the run in, None to not record it
+    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :param limit: stop after this many items to delete, the rest are left for the next run. None for no limit
+    :param job: status_server.JobStatus to report the run's progress to, None to not report it
+    :param lease: run_lock.Lease already held for the run's account and kind, None to take it here.
+    Released once the run is done.
+    :return: how many items were deleted
+    """
+    kind = plan.kind
+    label = adapter.item_label(kind)
+    if lease is None:
+        lease = run_lock.open_run_locks().acquire(plan.context.account, kind)
+    if lease is None:
+        progress.status(f'Another run is already deleting these {kind}, skipping.')
+        if job:
+            job.finish('locked')
+        return 0
+
+    recorder = archive_writer = None
+    status = 'finished'
+    # deleted items are dropped from the store a chunk at a time, not all at the end
+    unremoved_ids = []
+    try:
+        total = len(plan)
+        recorder = history.start_run(
+            adapter.platform, kind, scheduled_bool) if history else None
+        calls = sum(adapter.calls_per_item(plan.context))
+        deleted_count = 0
+        attempted_count = 0
+        archive_writer = archive.open_archive(
+            adapter.platform) if plan.context.archive else None
+        if job:
+            job.start()
+
+        entries = archive.archive_ahead(archive_writer, plan.ordered()) if archive_writer else \
+            ((record, reason, None) for record, reason in plan.ordered())
+        for count, (record, reason, archived) in enumerate(entries, 1):
+            outcome = run_history.SKIPPED
+            latency = error = None
+            item_snippet = snippets.get(record, snippets.PROGRESS_LENGTH)
+
+            if reason:
+                progress.status(f'{label} `{item_snippet}` {reason}, skipping.')
+            elif limit is not None and attempted_count >= limit:
+                status = 'split'
+                break
+            elif not lease.held:
+                # renewing the lease failed for too long and another run took over
+                progress.status(f'Another run took over deleting these {kind}, stopping.')
+                status = 'lost lock'
+                break
+            else:
+                attempted_count += 1
+                progress.status(
+                    f'{adapter.action_text} {label.lower()} `{item_snippet}`')
+                # only the API calls are timed, not waiting for the archive or a rate budget
+                spent = fetcher.api_seconds()
+                # a failed delete is recorded and retried on the next run
+                # instead of ending this one
+                try:
+                    # nothing is deleted before it's on disk in the archive
+                    if archived:
+                        archive_writer.wait_written(archived)
+                    outcome = adapter.execute(record, plan.context)
+                    if outcome == run_history.DELETED:
+                        deleted_count += 1
+                        unremoved_ids.append(record['id'])
+                except Exception as err:
+                    outcome, error = run_history.FAILED, err
+                    progress.status(
+                        f'Could not delete {label.lower()} `{item_snippet}`: {err}')
+                latency = fetcher.api_seconds() - spent
+
+            if recorder:
+                recorder.record(record['id'], outcome, latency, error, calls)
+            if job:
+                job.record(outcome, error)
+            progress.step(count, total)
+
+            if count % plan.chunk_size == 0:
+                item_store.remove(kind, unremoved_ids)
+                unremoved_ids = []
+                memory.enforce_ceiling(caches=[snippets.cache])
+
+        return deleted_count
+
+    except BaseException:
+        status = 'failed'
+        raise
+
+    finally:
+        # a run that crashed still flushes its archive, drops what it deleted and is recorded as failed
+        try:
+            item_store.remove(kind, unremoved_ids)
+            if archive_writer:
+                archive_writer.close()
+            if recorder:
+                recorder.finish(status)
+            if job:
+                job.finish(status)
+        finally:
+            lease.release()
+
+
+def confirm_and_delete(root, adapter, kind, progress, state, item_store, scheduled_bool, gathered_at=None, history=None, lease=None):
+    """
+    Runs the pipeline up to the plan, shows it in a confirmation window and executes it on Proceed
+    :param root: the reference to the actual tkinter GUI window
+    :param adapter: PlatformAdapter
+    :param kind: identifying text of the item kind
+    :param progress: Progress
+    :param state: dictionary holding the platform's settings
+    :param item_store: ItemStore of the platform
+    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :param gathered_at: epoch seconds the items were already gathered at, None to gather them now
+    :param history: RunHistory to record the run in, None to not record it
+    :param lease: run_lock.Lease already held for the account and kind, None to take it here
+    :return: none
+    """
+    if state['confirmation_window_open'] == 1 and not scheduled_bool:
+        return
+
+    # taken before gathering, so a run already going doesn't have its listing walked a second time
+    if lease is None:
+        lease = run_lock.open_run_locks().acquire(adapter.account(state), kind)
+    if lease is None:
+        progress.status(f'Another run is already deleting these {kind}, skipping.')
+        if not scheduled_bool:
+            messagebox.showinfo(
+                'Social Amnesia', f'Another run is already deleting these {kind}, try again once it\'s done.')
+        return
+
+    confirmation_window = job = None
+    try:
+        confirmation_window = tk.Toplevel(root)
+        state['confirmation_window_open'] = 1
+        state.sync
+        job = status_server.start_job(adapter.platform, kind, scheduled_bool)
+
+        def cancel():
+            job.finish('cancelled')
+            lease.release()
+            windows.close_window(confirmation_window, state,
+                                 'confirmation_window_open')
+
+        confirmation_window.protocol('WM_DELETE_WINDOW', cancel)
+
+        frame = windows.build_window(root, confirmation_window,
+                                     adapter.confirmation_title(kind))
+
+        fetch(adapter, kind, state, item_store, gathered_at)
+        plan = Plan(adapter, kind, state, item_store)
+        progress.start(len(plan))
+        job.plan(len(plan))
+
+        cost_model = estimates.cost_model(adapter, plan.context, history)
+        estimate_text = cost_model.describe(plan.doomed_count)
+        limit = None
+        if scheduled_bool:
+            # the kinds share the scheduled window, a run that doesn't fit its share is split over several days
+            fitting = cost_model.items_within(
+                estimates.SCHEDULE_WINDOW_SECONDS / len(adapter.kinds))
+            if fitting < plan.doomed_count:
+                limit = fitting
+                estimate_text = f'{cost_model.describe(limit)}. Only the first {limit} of {plan.doomed_count} ' \
+                    f'items fit in the scheduled window, the rest are left for the next runs'
+
+        def proceed():
+            windows.close_window(confirmation_window, state,
+                                 'confirmation_window_open')
+            execute(adapter, plan, item_store,
+                    progress, history, scheduled_bool, limit, job, lease)
+
+        button_frame = tk.Frame(frame)
+        button_frame.grid(row=1, column=0, sticky='w')
+
+        tk.Button(button_frame, text='Proceed', command=proceed).grid(
+            row=1, column=0, sticky='nsew')
+        tk.Button(button_frame, text='Cancel', command=cancel).grid(
+            row=1, column=1, sticky='nsew')
+        tk.Label(button_frame, text=f'Keeping {plan.recent_count} items newer than {helpers.format_cutoff(plan.cutoff)}').grid(
+            row=1, column=2, sticky='w')
+        # rows 0 to 2 are taken by build_window
+        tk.Label(frame, text=estimate_text).grid(row=3, column=0, sticky='w')
+
+        counter = 4
+        for record in plan.first_doomed(PREVIEW_LIMIT):
+            tk.Label(frame, text=snippets.get(record, snippets.PREVIEW_LENGTH)).grid(
+                row=counter, column=0)
+            ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
+                row=counter+1, columnspan=2, sticky='ew', pady=5)
+            counter = counter + 2
+
+        if plan.doomed_count > PREVIEW_LIMIT:
+            tk.Label(frame, text=f'...and {plan.doomed_count - PREVIEW_LIMIT} more').grid(
+                row=counter, column=0)
+    except BaseException:
+        # nothing is left waiting on a window that never finished building
+        if job:
+            job.finish('failed')
+        lease.release()
+        if confirmation_window is not None:
+            windows.close_window(confirmation_window, state,
+                                 'confirmation_window_open')
+        raise
+
+
+def retention_preview(adapter, item_store, retention):
+    """
+    Counts the stored items a retention window would leave to the filters, without any network access
+    :param adapter: PlatformAdapter
+    :param item_store: ItemStore of the platform
+    :param retention: how many seconds of items to keep
+    :return: text for the UI, e.g. 'Older than that: 1204 comments, 33 posts'
+    """
+    cutoff = helpers.resolve_cutoff(retention)
+    counts = ', '.join(f'{item_store.count_created_between(kind, end=cutoff)} {kind}'
+                       for kind in adapter.kinds)
+    return f'Older than that: {counts}'
+
+
+def set_deletion_order(order_text, state):
+    """
+    Saves the order runs delete items in
+    :param order_text: one of the DELETION_ORDERS texts, as picked in the UI
+    :param state: dictionary holding the platform's settings
+    :return: none
+    """
+    state['deletion_order'] = next(order for order, text in DELETION_ORDERS.items()
+                                   if text == order_text)
+    state.sync
+
+
+def set_archive(archive_bool, state):
+    """
+    Sets whether runs archive items before editing or deleting them
+    :param archive_bool: true to archive items, false otherwise
+    :param state: dictionary holding the platform's settings
+    :return: none
+    """
+    state['archive_items'] = archive_bool.get()
+    state.sync
+
+
+def show_whitelist(root, adapter, kind, state, item_store):
+    """
+    Creates a window to let users select which items to whitelist
+    :param root: the reference to the actual tkinter GUI window
+    :param adapter: PlatformAdapter
+    :param kind: identifying text of the item kind
+    :param state: dictionary holding the platform's settings
+    :param item_store: ItemStore of the platform
+    :return: none
+    """
+    if state['whitelist_window_open'] == 1:
+        return
+
+    # TODO: update this to get whether checkbox is selected or unselected instead of blindly flipping from true to false
+    def flip_whitelist_dict(id):
+        whitelist_dict = state[f'whitelisted_{kind}']
+        whitelist_dict[id] = not whitelist_dict.get(id, False)
+        state[f'whitelisted_{kind}'] = whitelist_dict
+        state.sync
+
+    adapter.fetch(kind, state, item_store)
+
+    whitelist_window = tk.Toplevel(root)
+    state['whitelist_window_open'] = 1
+    state.sync
+
+    whitelist_window.protocol(
+        'WM_DELETE_WINDOW', lambda: windows.close_window(whitelist_window, state, 'whitelist_window_open'))
+
+    frame = windows.build_window(root, whitelist_window,
+                                 f'Pick {kind} to save')
+
+    # only one page of items has widgets at a time, however long the history is.
+    # A filter looks the matches up in the item store's word index and pages them the same way.
+    rows = {}
+    checkbuttons = {}
+    # the parsed filter, None for no filter, and how many items it lists
+    listing = {'query': None, 'total': item_store.count(kind)}
+    page_text = tk.StringVar()
+
+    def page_records(offset):
+        if listing['query'] is None:
+            return item_store.page(kind, offset, WHITELIST_PAGE_SIZE)
+        return item_store.search(kind, *listing['query'], offset, WHITELIST_PAGE_SIZE)
+
+    def filter_items(query):
+        listing['query'] = search.parse_query(query)
+        # counted only so far, so a filter matching most of a long history stays quick
+        listing['total'] = item_store.count(kind) if listing['query'] is None else \
+            item_store.count_matches(kind, *listing['query'], at_most=WHITELIST_MAX_COUNTED + 1)
+        show_page(0)
+
+    def whitelist_matches(query):
+        parsed = search.parse_query(query)
+        whitelist_dict = state[f'whitelisted_{kind}']
+        for record in item_store.iter_items(kind) if parsed is None else item_store.iter_matches(kind, *parsed):
+            whitelist_dict[record['id']] = True
+            if record['id'] in checkbuttons:
+                checkbuttons[record['id']].select()
+        state[f'whitelisted_{kind}'] = whitelist_dict
+        state.sync
+
+    def show_page(offset):
+        for widgets in rows.values():
+            for widget in widgets:
+                widget.destroy()
+        rows.clear()
+        checkbuttons.clear()
+
+        # read the whitelist from the shelf once instead of once per item
+        whitelisted = state[f'whitelisted_{kind}']
+        total = listing['total']
+
+        counter = 3
+        for record in page_records(offset):
+            whitelist_checkbutton = tk.Checkbutton(frame, command=lambda
+                                                   id=record['id']: flip_whitelist_dict(id))
+
+            if whitelisted.get(record['id']):
+                whitelist_checkbutton.select()
+            else:
+                whitelist_checkbutton.deselect()
+
+            snippet_label = tk.Label(
+                frame, text=snippets.get(record, snippets.PREVIEW_LENGTH))
+            separator = ttk.Separator(frame, orient=tk.HORIZONTAL)
+
+            whitelist_checkbutton.grid(row=counter, column=0)
+            snippet_label.grid(row=counter, column=1)
+            separator.grid(
+                row=counter+1, columnspan=2, sticky=(tk.E, tk.W), pady=5)
+
+            rows[record['id']] = [whitelist_checkbutton,
+                                  snippet_label, separator]
+            checkbuttons[record['id']] = whitelist_checkbutton
+
+            counter = counter + 2
+
+        # past the counted matches, there are more as long as pages come back full
+        more_bool = offset + WHITELIST_PAGE_SIZE < total if total <= WHITELIST_MAX_COUNTED else \
+            len(rows) == WHITELIST_PAGE_SIZE
+        total_text = total if total <= WHITELIST_MAX_COUNTED else f'{WHITELIST_MAX_COUNTED}+'
+        page_text.set(
+            f'{min(offset + 1, offset + len(rows))}-{offset + len(rows)} of {total_text}')
+        newer_button['state'] = tk.NORMAL if offset > 0 else tk.DISABLED
+        older_button['state'] = tk.NORMAL if more_bool else tk.DISABLED
+        newer_button['command'] = lambda: show_page(
+            max(0, offset - WHITELIST_PAGE_SIZE))
+        older_button['command'] = lambda: show_page(
+            offset + WHITELIST_PAGE_SIZE)
+
+    page_frame = tk.Frame(frame)
+    page_frame.grid(row=1, column=2, sticky='e')
+    newer_button = tk.Button(page_frame, text='Newer')
+    older_button = tk.Button(page_frame, text='Older')
+    newer_button.grid(row=0, column=0)
+    tk.Label(page_frame, textvariable=page_text).grid(row=0, column=1)
+    older_button.grid(row=0, column=2)
+
+    search.build_filter_bar(frame, filter_items, whitelist_matches)
+    show_page(0)
+
+
+def run_scheduler(root, adapter, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, state, item_store, history=None):
+    """
+    The scheduler that users can use to have social amnesia wipe a platform at a set point in time, repeatedly.
+    :param root: tkinkter window
+    :param adapter: PlatformAdapter
+    :param scheduler_bool: true if set to run, false otherwise
+    :param hour_of_day: int 0-23, sets hour of day to run on
+    :param string_var, progress_var: - empty Vars needed to run the deletions
+    :param current_time_text: The UI text saying "currently set to TIME"
+    :param state: dictionary holding the platform's settings
+    :param item_store: ItemStore of the platform
+    :param history: RunHistory to record the runs in
+    :return: none
+    """
+    state['scheduler_bool'] = scheduler_bool.get()
+    state.sync
+
+    if not scheduler_bool.get():
+        adapter.already_ran = False
+        return
+
+    state['scheduled_time'] = hour_of_day
+    state.sync
+
+    current_time_text.set(f'Currently set to: {hour_of_day}')
+
+    current_time = datetime.now().time().hour
+
+    if current_time == hour_of_day and not adapter.already_ran:
+        messagebox.showinfo(
+            'Scheduler', f'Social Amnesia is now erasing your past on {adapter.platform}.')
+
+        # kinds another run is already deleting are skipped, the others are gathered together if they all can be
+        locks = run_lock.open_run_locks()
+        leases = {kind: locks.acquire(adapter.account(state), kind)
+                  for kind in adapter.kinds}
+        free_kinds = [kind for kind, lease in leases.items() if lease]
+        try:
+            gathered_at = None
+            if len(free_kinds) == len(adapter.kinds):
+                gathered_at = int(time.time())
+                adapter.fetch_all(state, item_store)
+
+            progress = Progress(root, string_var, progress_var, string_var)
+            for kind in free_kinds:
+                # confirm_and_delete releases the lease from here on
+                confirm_and_delete(root, adapter, kind, progress, state,
+                                   item_store, True, gathered_at, history, leases.pop(kind))
+        finally:
+            # leases never handed off, e.g. of the kinds after one that failed
+            for lease in leases.values():
+                if lease:
+                    lease.release()
+
+        adapter.already_ran = True
+    if current_time < 23 and current_time == hour_of_day + 1:
+        adapter.already_ran = False
+    elif current_time == 0:
+        adapter.already_ran = False
+
+    root.after(1000, lambda: run_scheduler(
+        root, adapter, scheduler_bool, hour_of_day, string_var, progress_var, current_time_text, state, item_store, history))
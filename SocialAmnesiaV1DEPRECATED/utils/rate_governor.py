@@ -0,0 +1,120 @@
+import hashlib
+import os
+import time
+
+from utils.item_store import STORAGE_FOLDER_PATH
+from utils.shared_database import SharedDatabase, open_once
+
+RATE_LIMITS_PATH = os.path.join(STORAGE_FOLDER_PATH, 'rate_limits.db')
+
+
+class RateGovernor(SharedDatabase):
+    """
+    Rate limit buckets shared by every Social Amnesia process on the machine, e.g. the UI and a
+    scheduled run, or two accounts logged in with the same reddit app. Each bucket is a row of a small
+    sqlite database, taking a token is a write transaction so processes never hand out the same one.
+    """
+
+    def __init__(self, path=RATE_LIMITS_PATH):
+        """
+        :param path: where the shared database is stored
+        """
+        super().__init__(path, '''
+            CREATE TABLE IF NOT EXISTS buckets (
+                client TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (client, endpoint)
+            )''')
+
+    def budget(self, client, endpoint, calls, period):
+        """
+        :param client: what the API counts calls against, e.g. the reddit client id
+        :param endpoint: class of endpoints sharing a limit, e.g. 'favorites/list'
+        :param calls: how many calls the API allows per period
+        :param period: length of the period in seconds
+        :return: SharedRateBudget
+        """
+        return SharedRateBudget(self, client, endpoint, calls, period)
+
+    def update(self, client, endpoint, calls, period, change):
+        """
+        Refills a bucket for the time since it was last used and applies a change to it, in one transaction
+        :param change: function turning (tokens, blocked_until, now) into (tokens, blocked_until, result)
+        :return: the result of `change`
+        """
+        # a token is read and taken in the same transaction
+        with self.transaction() as connection:
+            now = time.time()
+            row = connection.execute(
+                'SELECT tokens, updated, blocked_until FROM buckets WHERE client = ? AND endpoint = ?',
+                (client, endpoint)).fetchone()
+            tokens, updated, blocked_until = row or (calls, now, 0)
+            tokens = min(calls, tokens + max(0, now - updated) * calls / period)
+
+            tokens, blocked_until, result = change(
+                tokens, blocked_until, now)
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?)',
+                (client, endpoint, tokens, now, blocked_until))
+        return result
+
+
+class SharedRateBudget:
+    """
+    Token bucket of one client and endpoint class, shared across processes through a RateGovernor.
+    Used like fetcher.RateBudget.
+    """
+
+    def __init__(self, governor, client, endpoint, calls, period):
+        self.governor = governor
+        # some clients are keyed by credentials, so only a digest is stored
+        self.client = hashlib.sha256(client.encode('utf-8')).hexdigest()[:16]
+        self.endpoint = endpoint
+        self.calls = calls
+        self.period = period
+
+    def acquire(self):
+        """
+        Blocks until a call fits in the budget, then takes it
+        :return: none
+        """
+        def take(tokens, blocked_until, now):
+            if now < blocked_until:
+                return tokens, blocked_until, blocked_until - now
+            if tokens >= 1:
+                return tokens - 1, blocked_until, 0
+            return tokens, blocked_until, (1 - tokens) * self.period / self.calls
+
+        while True:
+            wait = self.governor.update(
+                self.client, self.endpoint, self.calls, self.period, take)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def observe(self, remaining, reset_at=None):
+        """
+        Corrects the budget with the rate limit headers of a response, the API's count is the real one
+        :param remaining: calls left in the API's current period
+        :param reset_at: epoch seconds the API's period resets at, None if unknown
+        :return: none
+        """
+        def correct(tokens, blocked_until, now):
+            if remaining < 1 and reset_at:
+                blocked_until = max(blocked_until, reset_at)
+            return min(tokens, remaining), blocked_until, None
+
+        self.governor.update(self.client, self.endpoint,
+                             self.calls, self.period, correct)
+
+
+def open_rate_governor():
+    """
+    Opens the rate governor shared by every process, stored in ~/.SocialAmnesia/rate_limits.db.
+    Opened once per process.
+    :return: RateGovernor
+    """
+    return open_once(RateGovernor)
@@ -0,0 +1,188 @@
+import re
+import tkinter as tk
+from tkinter import messagebox
+
+RULES_SYNTAX = '''
+  subreddit: name       keep everything posted in a subreddit
+  keyword: word         keep items containing a word
+  regex: pattern        keep items matching a regular expression
+  has_media             keep items with images or video
+  replies               keep replies
+  top_level             keep top level comments and tweets
+  min_score: name 10    keep items in a subreddit scoring at least 10'''
+RULES_HELP = 'One rule per line, items matching any rule are kept:' + RULES_SYNTAX
+PRIORITY_RULES_HELP = 'One rule per line, items matching more rules are deleted first:' + \
+    RULES_SYNTAX.replace('  keep ', '  ')
+
+FLAG_RULES = ('has_media', 'replies', 'top_level')
+VALUE_RULES = ('subreddit', 'keyword', 'regex', 'min_score')
+
+
+def parse_rules(text):
+    """
+    Validates the rules typed in by the user
+    :param text: rules, one per line
+    :return: list of rule lines
+    """
+    rule_lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        name, _, value = line.partition(':')
+        name, value = name.strip().lower(), value.strip()
+
+        if name in FLAG_RULES and not value:
+            rule_lines.append(name)
+        elif name in VALUE_RULES and value:
+            if name == 'regex':
+                try:
+                    re.compile(value, re.IGNORECASE)
+                except re.error as err:
+                    raise ValueError(f'Invalid regex `{value}`: {err}')
+            elif name == 'min_score':
+                parts = value.split()
+                if len(parts) != 2 or not parts[1].lstrip('-').isdigit():
+                    raise ValueError(
+                        f'Invalid rule `{line}`, expected `min_score: subreddit score`')
+            rule_lines.append(f'{name}: {value}')
+        else:
+            raise ValueError(f'Invalid rule `{line}`')
+
+    return rule_lines
+
+
+class KeepRules:
+    """
+    Keep-rules (or priority rules) compiled once per run. Keywords are merged into a single
+    pattern and subreddits are lowercased into sets/dicts so checking an item costs
+    the same no matter how many of them are set. Regexes are compiled one by one,
+    merged they would share inline flags, group numbers and backreferences.
+    """
+
+    def __init__(self, rule_lines):
+        self.subreddits = set()
+        self.min_scores = {}
+        self.has_media = False
+        self.replies = False
+        self.top_level = False
+
+        keywords = []
+        # compiled patterns an item's text is searched with, the merged keywords first
+        self.patterns = []
+        for line in rule_lines:
+            name, _, value = line.partition(':')
+            value = value.strip()
+
+            if name == 'subreddit':
+                self.subreddits.add(value.lower())
+            elif name == 'keyword':
+                # not \b, which needs a word character on the inside and never matches around e.g. `c++`
+                keywords.append(r'(?<!\w)' + re.escape(value) + r'(?!\w)')
+            elif name == 'regex':
+                self.patterns.append(re.compile(value, re.IGNORECASE))
+            elif name == 'min_score':
+                subreddit, score = value.split()
+                self.min_scores[subreddit.lower()] = int(score)
+            else:
+                setattr(self, name, True)
+
+        if keywords:
+            self.patterns.insert(0, re.compile('|'.join(keywords), re.IGNORECASE))
+
+    def __bool__(self):
+        return bool(self.subreddits or self.min_scores or self.patterns or
+                    self.has_media or self.replies or self.top_level)
+
+    def keep_reason(self, record):
+        """
+        Checks an item against the rules
+        :param record: item record, see `to_record` in the services
+        :return: description of the first matching rule, or None to not keep the item
+        """
+        subreddit = (record.get('subreddit') or '').lower()
+
+        if subreddit in self.subreddits:
+            return f'is in r/{record["subreddit"]}'
+        if subreddit in self.min_scores and record['score'] >= self.min_scores[subreddit]:
+            return f'scores at least {self.min_scores[subreddit]} in r/{record["subreddit"]}'
+        if self.has_media and record.get('has_media'):
+            return 'has media'
+        if self.replies and record.get('is_reply'):
+            return 'is a reply'
+        if self.top_level and not record.get('is_reply'):
+            return 'is top level'
+        if self.matches_text(record['text']):
+            return 'matches a keyword'
+        return None
+
+    def matches_text(self, text):
+        """
+        :param text: text of an item
+        :return: True if a keyword or a regex matches the text
+        """
+        return any(pattern.search(text) for pattern in self.patterns)
+
+    def weight(self, record):
+        """
+        Weighs an item by the rules, used to order deletions by priority rules
+        :param record: item record, see `to_record` in the services
+        :return: how many kinds of rule the item matches
+        """
+        subreddit = (record.get('subreddit') or '').lower()
+
+        return sum((
+            subreddit in self.subreddits,
+            subreddit in self.min_scores and record['score'] >= self.min_scores[subreddit],
+            self.has_media and bool(record.get('has_media')),
+            self.replies and bool(record.get('is_reply')),
+            self.top_level and not record.get('is_reply'),
+            self.matches_text(record['text']),
+        ))
+
+
+def compile_rules(state, key='keep_rules'):
+    """
+    Compiles the rules stored in a state
+    :param state: dictionary holding reddit or twitter settings
+    :param key: 'keep_rules' or 'priority_rules'
+    :return: KeepRules
+    """
+    return KeepRules(state[key] if key in state else [])
+
+
+def set_keep_rules(root, state, key='keep_rules', title='Keep rules', help_text=RULES_HELP):
+    """
+    Creates a window to let users edit their keep-rules, or their priority rules
+    :param root: the reference to the actual tkinter GUI window
+    :param state: dictionary holding reddit or twitter settings
+    :param key: 'keep_rules' or 'priority_rules'
+    :param title: title of the window
+    :param help_text: explanation of the rules shown above them
+    :return: none
+    """
+    rules_window = tk.Toplevel(root)
+    rules_window.title(title)
+
+    tk.Label(rules_window, text=help_text, justify=tk.LEFT).grid(
+        row=0, column=0, columnspan=2, sticky='w')
+
+    rules_text = tk.Text(rules_window, width=60, height=15)
+    rules_text.insert('1.0', '\n'.join(
+        state[key] if key in state else []))
+    rules_text.grid(row=1, column=0, columnspan=2, sticky='w')
+
+    def save_rules():
+        try:
+            state[key] = parse_rules(rules_text.get('1.0', tk.END))
+        except ValueError as err:
+            messagebox.showerror('Error', str(err))
+            return
+        state.sync
+        rules_window.destroy()
+
+    tk.Button(rules_window, text='Save', command=save_rules).grid(
+        row=2, column=0, sticky='w')
+    tk.Button(rules_window, text='Cancel', command=rules_window.destroy).grid(
+        row=2, column=1, sticky='w')
@@ -0,0 +1,294 @@
+import os
+import sqlite3
+import time
+
+from utils.item_store import STORAGE_FOLDER_PATH
+
+# outcomes of an item during a run
+DELETED = 'deleted'
+EDITED = 'edited'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# outcomes that cost an API call, used for failure rates and latency
+ATTEMPTED = (DELETED, EDITED, FAILED)
+
+# per item outcomes older than this are folded into the daily rollup
+ROLLUP_AFTER_DAYS = 30
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class RunHistory:
+    """
+    Record of every deletion run, one row per run and one per item processed.
+    Item rows older than ROLLUP_AFTER_DAYS are folded into per day totals,
+    so the database stays small after years of daily scheduled runs.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                platform TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                scheduled INTEGER NOT NULL,
+                started REAL NOT NULL,
+                finished REAL,
+                status TEXT NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                edited INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                calls REAL NOT NULL DEFAULT 0,
+                latency REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS runs_started ON runs (platform, started);
+
+            CREATE TABLE IF NOT EXISTS outcomes (
+                run_id INTEGER NOT NULL REFERENCES runs (id),
+                item_id TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                latency REAL,
+                at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS outcomes_at ON outcomes (at);
+            CREATE INDEX IF NOT EXISTS outcomes_run ON outcomes (run_id);
+
+            CREATE TABLE IF NOT EXISTS daily_rollup (
+                day TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                error TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                total_latency REAL NOT NULL,
+                PRIMARY KEY (day, platform, kind, outcome, error)
+            );''')
+
+    def start_run(self, platform, kind, scheduled_bool):
+        """
+        :param platform: 'reddit' or 'twitter'
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param scheduled_bool: True if a scheduled run, False if triggered manually
+        :return: RunRecorder to record the run's items with
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (platform, kind, scheduled, started, status) VALUES (?, ?, ?, ?, ?)',
+                (platform, kind, int(scheduled_bool), time.time(), 'running'))
+        return RunRecorder(self, cursor.lastrowid)
+
+    def _rows(self, outcome_filter, platform, kind, since, select):
+        """
+        Runs a grouped query over both the recent per item rows and the rolled up days
+        :param outcome_filter: SQL condition on `outcome`
+        :param platform: only count this platform, None for all
+        :param kind: only count this kind of item, None for all
+        :param since: only count days from this epoch second on, None for all
+        :param select: 'day', 'error' or 'outcome', what to group by
+        :return: list of (group, count, total_latency) rows
+        """
+        conditions = [outcome_filter]
+        params = []
+        if platform:
+            conditions.append('platform = ?')
+            params.append(platform)
+        if kind:
+            conditions.append('kind = ?')
+            params.append(kind)
+        if since:
+            conditions.append("day >= date(?, 'unixepoch')")
+            params.append(int(since))
+        where = ' AND '.join(conditions)
+
+        return self.connection.execute(f'''
+            SELECT {select}, SUM(count), SUM(total_latency) FROM (
+                SELECT date(outcomes.at, 'unixepoch') AS day, platform, kind, outcome, error,
+                       1 AS count, IFNULL(latency, 0) AS total_latency
+                FROM outcomes JOIN runs ON runs.id = outcomes.run_id
+                UNION ALL
+                SELECT day, platform, kind, outcome, error, count, total_latency FROM daily_rollup
+            ) WHERE {where} GROUP BY {select} ORDER BY {select}''', params).fetchall()
+
+    def deleted_per_day(self, platform=None, kind=None, since=None):
+        """
+        :param platform: only count this platform, None for all
+        :param kind: only count this kind of item, None for all
+        :param since: only count days from this epoch second on, None for all
+        :return: list of ('YYYY-MM-DD', items deleted) tuples, oldest day first
+        """
+        return [(day, count) for day, count, _ in
+                self._rows(f"outcome = '{DELETED}'", platform, kind, since, 'day')]
+
+    def failure_rates(self, platform=None, kind=None, since=None):
+        """
+        :param platform: only count this platform, None for all
+        :param kind: only count this kind of item, None for all
+        :param since: only count days from this epoch second on, None for all
+        :return: dict of error type -> share of attempted deletions/edits that failed with it
+        """
+        attempted = ', '.join(f"'{outcome}'" for outcome in ATTEMPTED)
+        rows = self._rows(f'outcome IN ({attempted})',
+                          platform, kind, since, 'error')
+        total = sum(count for _, count, _ in rows)
+        return {error: count / total for error, count, _ in rows if error}
+
+    def average_latency(self, platform=None, kind=None, since=None):
+        """
+        :param platform: only count this platform, None for all
+        :param kind: only count this kind of item, None for all
+        :param since: only count days from this epoch second on, None for all
+        :return: average seconds spent on the API calls of an item, None if nothing was attempted yet
+        """
+        attempted = ', '.join(f"'{outcome}'" for outcome in ATTEMPTED)
+        rows = self._rows(f'outcome IN ({attempted})',
+                          platform, kind, since, 'outcome')
+        count = sum(row[1] for row in rows)
+        return sum(row[2] for row in rows) / count if count else None
+
+    def call_latency(self, platform, kind=None, since=None):
+        """
+        :param platform: 'reddit' or 'twitter'
+        :param kind: only count this kind of item, None for all
+        :param since: only count runs started from this epoch second on, None for all
+        :return: average seconds per API call, None if no calls were recorded yet
+        """
+        conditions = ['platform = ?', 'calls > 0']
+        params = [platform]
+        if kind:
+            conditions.append('kind = ?')
+            params.append(kind)
+        if since:
+            conditions.append('started >= ?')
+            params.append(since)
+
+        latency, calls = self.connection.execute(
+            f'SELECT SUM(latency), SUM(calls) FROM runs WHERE {" AND ".join(conditions)}', params).fetchone()
+        return latency / calls if calls else None
+
+    def recent_runs(self, platform=None, limit=20):
+        """
+        :param platform: only list runs of this platform, None for all
+        :param limit: how many runs to list
+        :return: list of run rows as dicts, newest first
+        """
+        cursor = self.connection.execute(
+            f'''SELECT * FROM runs {'WHERE platform = ?' if platform else ''}
+                ORDER BY started DESC LIMIT ?''',
+            (platform, limit) if platform else (limit,))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def rollup(self, older_than_days=ROLLUP_AFTER_DAYS):
+        """
+        Folds per item rows older than a number of days into per day totals
+        :param older_than_days: how many days of per item rows to keep
+        :return: how many per item rows were folded
+        """
+        # whole days only, so a day is never split between both tables
+        boundary = (int(time.time()) // DAY_SECONDS -
+                    older_than_days) * DAY_SECONDS
+
+        with self.connection:
+            totals = self.connection.execute('''
+                SELECT date(outcomes.at, 'unixepoch'), platform, kind, outcome, error,
+                       COUNT(*), IFNULL(SUM(latency), 0)
+                FROM outcomes JOIN runs ON runs.id = outcomes.run_id
+                WHERE outcomes.at < ?
+                GROUP BY 1, 2, 3, 4, 5''', (boundary,)).fetchall()
+
+            for day, platform, kind, outcome, error, count, latency in totals:
+                updated = self.connection.execute('''
+                    UPDATE daily_rollup SET count = count + ?, total_latency = total_latency + ?
+                    WHERE day = ? AND platform = ? AND kind = ? AND outcome = ? AND error = ?''',
+                    (count, latency, day, platform, kind, outcome, error))
+                if not updated.rowcount:
+                    self.connection.execute(
+                        'INSERT INTO daily_rollup VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (day, platform, kind, outcome, error, count, latency))
+
+            folded = self.connection.execute(
+                'DELETE FROM outcomes WHERE at < ?', (boundary,)).rowcount
+
+        return folded
+
+    def close(self):
+        self.connection.close()
+
+
+class RunRecorder:
+    """
+    Collects the outcomes of one run's items and writes them in batches,
+    so recording doesn't add a transaction per item to the delete loop.
+    """
+
+    def __init__(self, run_history, run_id, batch_size=500):
+        self.run_history = run_history
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.pending = []
+        self.totals = {DELETED: 0, EDITED: 0, SKIPPED: 0, FAILED: 0}
+        # API calls made and seconds spent on them, what the cost model estimates latency from
+        self.calls = 0
+        self.latency = 0
+
+    def record(self, item_id, outcome, latency=None, error=None, calls=0):
+        """
+        :param item_id: id of the item
+        :param outcome: DELETED, EDITED, SKIPPED or FAILED
+        :param latency: seconds spent in the item's API calls, None if none were made
+        :param error: the exception the item failed with
+        :param calls: how many API calls the item took (on average, e.g. for a random number of edits)
+        :return: none
+        """
+        if latency is not None:
+            self.calls += calls
+            self.latency += latency
+        self.pending.append((self.run_id, str(item_id), outcome,
+                             type(error).__name__ if error else '', latency, int(time.time())))
+        self.totals[outcome] += 1
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the pending outcomes and the run's running totals
+        :return: none
+        """
+        with self.run_history.connection:
+            self.run_history.connection.executemany(
+                'INSERT INTO outcomes VALUES (?, ?, ?, ?, ?, ?)', self.pending)
+            self.run_history.connection.execute(
+                '''UPDATE runs SET processed = ?, deleted = ?, edited = ?, skipped = ?, failed = ?,
+                   calls = ?, latency = ? WHERE id = ?''',
+                (sum(self.totals.values()), self.totals[DELETED], self.totals[EDITED],
+                 self.totals[SKIPPED], self.totals[FAILED], self.calls, self.latency, self.run_id))
+        self.pending = []
+
+    def finish(self, status='finished'):
+        """
+        Writes what is left and marks the run as done
+        :param status: 'finished', or how the run ended otherwise
+        :return: none
+        """
+        self.flush()
+        with self.run_history.connection:
+            self.run_history.connection.execute(
+                'UPDATE runs SET finished = ?, status = ? WHERE id = ?',
+                (time.time(), status, self.run_id))
+
+
+def open_run_history():
+    """
+    Opens the run history shared by both platforms, stored in ~/.SocialAmnesia/history.db
+    :return: RunHistory
+    """
+    os.makedirs(STORAGE_FOLDER_PATH, exist_ok=True)
+    run_history = RunHistory(os.path.join(STORAGE_FOLDER_PATH, 'history.db'))
+    run_history.rollup()
+    return run_history
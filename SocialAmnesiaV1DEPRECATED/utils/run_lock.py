@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+from utils.item_store import STORAGE_FOLDER_PATH
+from utils.shared_database import SharedDatabase, open_once
+
+RUN_LOCKS_PATH = os.path.join(STORAGE_FOLDER_PATH, 'run_locks.db')
+# how long a lease lasts without being renewed, a run that crashed frees its lease after this
+LEASE_SECONDS = 60
+
+
+class RunLocks(SharedDatabase):
+    """
+    Leases on (account, item kind) shared by every Social Amnesia process on the machine, so the UI,
+    the scheduler and any other process never walk and delete the same items at the same time.
+    A lease is kept alive by its holder, one that isn't renewed in time is free to be taken over.
+    """
+
+    def __init__(self, path=RUN_LOCKS_PATH):
+        """
+        :param path: where the shared database is stored
+        """
+        super().__init__(path, '''
+            CREATE TABLE IF NOT EXISTS leases (
+                account TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                holder TEXT NOT NULL,
+                acquired REAL NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (account, kind)
+            )''')
+
+    def acquire(self, account, kind, lease_seconds=LEASE_SECONDS):
+        """
+        Takes the lease of an account's items of a kind, unless another run holds it
+        :param account: e.g. 'reddit:username'
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param lease_seconds: how long the lease lasts without being renewed
+        :return: Lease, kept alive until released, or None if another run holds it
+        """
+        owner = uuid.uuid4().hex
+        # a lease is checked and taken in the same transaction
+        with self.transaction() as connection:
+            now = time.time()
+            row = connection.execute(
+                'SELECT expires FROM leases WHERE account = ? AND kind = ?', (account, kind)).fetchone()
+            # an expired lease belongs to a run that crashed or hung, it's taken over
+            if row and row[0] > now:
+                return None
+            connection.execute(
+                'INSERT OR REPLACE INTO leases VALUES (?, ?, ?, ?, ?, ?)',
+                (account, kind, owner, f'{socket.gethostname()}:{os.getpid()}', now, now + lease_seconds))
+        return Lease(self, account, kind, owner, lease_seconds).keep_alive()
+
+    def renew(self, lease):
+        """
+        :param lease: Lease
+        :return: True if the lease is still held, False if it expired and another run took it
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                'UPDATE leases SET expires = ? WHERE account = ? AND kind = ? AND owner = ?',
+                (time.time() + lease.lease_seconds, lease.account, lease.kind, lease.owner))
+        return cursor.rowcount == 1
+
+    def release(self, lease):
+        """
+        :param lease: Lease
+        :return: none
+        """
+        with self.lock:
+            self.connection.execute(
+                'DELETE FROM leases WHERE account = ? AND kind = ? AND owner = ?',
+                (lease.account, lease.kind, lease.owner))
+
+
+class Lease:
+    """
+    A held run lock, renewed on a background thread until it's released
+    """
+
+    def __init__(self, run_locks, account, kind, owner, lease_seconds):
+        self.run_locks = run_locks
+        self.account = account
+        self.kind = kind
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        # False once the lease was lost or released, the run has to stop
+        self.held = True
+        self.released = threading.Event()
+
+    def keep_alive(self):
+        """
+        Renews the lease at a third of its length, so a renewal can be late twice before it expires
+        :return: self
+        """
+        def renew():
+            while not self.released.wait(self.lease_seconds / 3):
+                try:
+                    renewed = self.run_locks.renew(self)
+                except Exception:
+                    # e.g. the database stayed locked past shared_database.LOCK_TIMEOUT_SECONDS, the lease can't be
+                    # known to be held anymore and the thread mustn't die leaving `held` True
+                    renewed = False
+                if not renewed:
+                    self.held = False
+                    return
+
+        threading.Thread(target=renew, daemon=True).start()
+        return self
+
+    def release(self):
+        """
+        Frees the lease for the next run, can be called more than once
+        :return: none
+        """
+        if self.released.is_set():
+            return
+        self.released.set()
+        self.held = False
+        self.run_locks.release(self)
+
+
+def open_run_locks():
+    """
+    Opens the run locks shared by every process, stored in ~/.SocialAmnesia/run_locks.db.
+    Opened once per process.
+    :return: RunLocks
+    """
+    return open_once(RunLocks)
@@ -0,0 +1,41 @@
+import tkinter as tk
+
+from utils.item_store import tokenize
+
+
+def parse_query(query):
+    """
+    Every token in the query has to match, the last one as a prefix so results
+    update while the user is still typing a word
+    :param query: text typed by the user
+    :return: (tokens matching whole words, prefix of a word or None), or None if the query is empty
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+
+    # a trailing space means the last word has been typed out completely
+    if query[-1:].isspace():
+        return tokens, None
+    return tokens[:-1], tokens[-1]
+
+
+def build_filter_bar(frame, filter_items, whitelist_matches):
+    """
+    Builds the live-filter entry and "whitelist all matches" button of a whitelist window
+    :param frame: frame of the whitelist window, the bar is placed in row 1
+    :param filter_items: called with the query every time it changes
+    :param whitelist_matches: called with the query, to whitelist every stored item matching it
+    :return: none
+    """
+    filter_frame = tk.Frame(frame)
+    filter_frame.grid(row=1, column=0, columnspan=2, sticky='w')
+
+    filter_text = tk.StringVar()
+    filter_text.trace_add('write', lambda *args: filter_items(filter_text.get()))
+
+    tk.Label(filter_frame, text='Filter:').grid(row=0, column=0, sticky='w')
+    tk.Entry(filter_frame, textvariable=filter_text, width=40).grid(
+        row=0, column=1, sticky='w')
+    tk.Button(filter_frame, text='Whitelist all matches',
+              command=lambda: whitelist_matches(filter_text.get())).grid(row=0, column=2, sticky='w')
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from utils.item_store import STORAGE_FOLDER_PATH
+
+# how long a process waits for another one holding the database
+LOCK_TIMEOUT_SECONDS = 30
+
+# the instance of each shared database this process opened, by its class
+opened = {}
+
+
+class SharedDatabase:
+    """
+    Small sqlite database read and written by every Social Amnesia process on the machine,
+    see utils/rate_governor.py and utils/run_lock.py. The threads of one process share its connection.
+    """
+
+    def __init__(self, path, schema):
+        """
+        :param path: where the database is stored
+        :param schema: statement creating its table, if it doesn't exist yet
+        """
+        # transactions are opened explicitly, so what a process reads and what it writes based on it
+        # happen under the same lock
+        self.connection = sqlite3.connect(
+            path, timeout=LOCK_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(schema)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Write transaction locking the database against every other process and thread,
+        committed when the block ends and rolled back if it raises
+        :return: the connection
+        """
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.connection
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        self.connection.close()
+
+
+def open_once(database_class):
+    """
+    Opens a shared database at its default path in ~/.SocialAmnesia, once per process
+    :param database_class: subclass of SharedDatabase, e.g. RunLocks
+    :return: the process' instance of it
+    """
+    if database_class not in opened:
+        os.makedirs(STORAGE_FOLDER_PATH, exist_ok=True)
+        opened[database_class] = database_class()
+    return opened[database_class]
@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+from utils import helpers
+
+# snippet lengths used by the deletion progress text and the preview/whitelist windows
+PROGRESS_LENGTH = 50
+PREVIEW_LENGTH = 100
+
+
+class SnippetCache:
+    """
+    LRU cache of formatted snippets keyed by item kind, item id and snippet length,
+    so an item's snippet is formatted once no matter how many windows show it.
+    The kind is part of the key as ids are only unique within a kind, a tweet can be a favorite too.
+    """
+
+    def __init__(self, max_size=16384):
+        self.max_size = max_size
+        self.snippets = OrderedDict()
+        # items are primed from the fetching threads as well
+        self.lock = threading.Lock()
+
+    def get(self, kind, item_id, text, length):
+        """
+        See format_snippet function in utils/helpers.py
+        :param kind: identifying text of the item kind
+        :param item_id: id of the item the text belongs to
+        :param text: full text of item
+        :param length: how many chars the snippet should be
+        :return: formatted snippet
+        """
+        key = (kind, item_id, length)
+        with self.lock:
+            snippet = self.snippets.get(key)
+            if snippet is not None:
+                self.snippets.move_to_end(key)
+                return snippet
+
+        snippet = helpers.format_snippet(text, length)
+        with self.lock:
+            self.snippets[key] = snippet
+            if len(self.snippets) > self.max_size:
+                self.snippets.popitem(last=False)
+        return snippet
+
+    def prime(self, record):
+        """
+        Formats the snippets of a newly fetched or imported item ahead of time
+        :param record: item record
+        :return: the record, so this can be chained into an ingest generator
+        """
+        self.get(record['kind'], record['id'], record['text'], PROGRESS_LENGTH)
+        self.get(record['kind'], record['id'], record['text'], PREVIEW_LENGTH)
+        return record
+
+    def clear(self):
+        with self.lock:
+            self.snippets.clear()
+
+
+cache = SnippetCache()
+
+
+def get(record, length):
+    """
+    Snippet of an item record, from the shared cache
+    :param record: item record
+    :param length: how many chars the snippet should be
+    :return: formatted snippet
+    """
+    return cache.get(record['kind'], record['id'], record['text'], length)
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+
+from utils import run_history
+
+# monitoring scrapes the running jobs from http://localhost:STATUS_PORT/status
+STATUS_PORT = 8765
+
+# '<platform>/<kind>' -> JobStatus of the latest job, finished ones stay until the next job of that kind
+jobs = {}
+
+
+class JobStatus:
+    """
+    Live status of one deletion job. Only the run writes to it, with plain counter updates so the
+    delete loop isn't slowed down, the status server's threads read snapshots of it.
+    """
+
+    def __init__(self, platform, kind, scheduled_bool):
+        """
+        :param platform: 'reddit' or 'twitter'
+        :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+        :param scheduled_bool: True if a scheduled run, False if triggered manually
+        """
+        self.platform = platform
+        self.kind = kind
+        self.scheduled = scheduled_bool
+        self.phase = 'fetching'
+        self.total = 0
+        self.processed = 0
+        self.outcomes = dict.fromkeys(
+            (run_history.DELETED, run_history.EDITED, run_history.SKIPPED, run_history.FAILED), 0)
+        # error type -> how many items failed with it
+        self.errors = {}
+        self.started = time.time()
+        self.deleting_since = None
+        self.finished = None
+
+    def plan(self, total):
+        """
+        :param total: how many items the run goes through
+        :return: none
+        """
+        self.total = total
+        self.phase = 'awaiting confirmation'
+
+    def start(self):
+        self.deleting_since = time.time()
+        self.phase = 'deleting'
+
+    def record(self, outcome, error=None):
+        """
+        :param outcome: run_history.DELETED, EDITED, SKIPPED or FAILED
+        :param error: the exception the item failed with
+        :return: none
+        """
+        self.processed += 1
+        self.outcomes[outcome] += 1
+        if error:
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def finish(self, status='finished'):
+        """
+        :param status: 'finished', or how the job ended otherwise, e.g. 'cancelled'
+        :return: none
+        """
+        self.finished = time.time()
+        self.phase = status
+
+    def snapshot(self):
+        """
+        :return: dict of the job's status, as served
+        """
+        processed = self.processed
+        elapsed = (self.finished or time.time()) - \
+            self.deleting_since if self.deleting_since else 0
+        throughput = processed / elapsed if elapsed else 0
+        return {
+            'platform': self.platform,
+            'kind': self.kind,
+            'scheduled': self.scheduled,
+            'phase': self.phase,
+            'total': self.total,
+            'processed': processed,
+            'outcomes': dict(self.outcomes),
+            'errors': dict(self.errors),
+            'started': self.started,
+            'finished': self.finished,
+            'items_per_second': round(throughput, 3),
+            'eta_seconds': round((self.total - processed) / throughput)
+            if throughput and self.phase == 'deleting' else None,
+        }
+
+
+def start_job(platform, kind, scheduled_bool):
+    """
+    Registers a new job, replacing the last one of the same platform and kind
+    :param platform: 'reddit' or 'twitter'
+    :param kind: 'comments', 'posts', 'tweets' or 'favorites'
+    :param scheduled_bool: True if a scheduled run, False if triggered manually
+    :return: JobStatus
+    """
+    job = JobStatus(platform, kind, scheduled_bool)
+    jobs[f'{platform}/{kind}'] = job
+    return job
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path not in ('/', '/status'):
+            self.respond(404, {'error': 'not found'})
+            return
+        self.respond(200, {'jobs': [job.snapshot()
+                                    for job in list(jobs.values())]})
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StatusServer(ThreadingMixIn, HTTPServer):
+    """
+    Serves the status of the jobs as JSON on localhost, each request on its own thread
+    """
+    daemon_threads = True
+
+
+def serve_status(port=STATUS_PORT):
+    """
+    Starts the status server on a background thread
+    :param port: port to listen on
+    :return: StatusServer, None if the port is taken, e.g. by another running instance
+    """
+    try:
+        server = StatusServer(('localhost', port), StatusHandler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
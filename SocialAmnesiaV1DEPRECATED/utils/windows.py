@@ -0,0 +1,52 @@
+import tkinter as tk
+import tkinter.ttk as ttk
+
+
+def close_window(window, state, window_key):
+    """
+    Closes a window and marks it as closed in the state
+    :param window: the tkinter Toplevel
+    :param state: dictionary holding reddit or twitter settings
+    :param window_key: e.g. 'whitelist_window_open' or 'confirmation_window_open'
+    :return: none
+    """
+    state[window_key] = 0
+    state.sync
+    window.destroy()
+
+
+def build_window(root, window, title_text):
+    """
+    Fills a window with a scrollable frame under a title
+    :param root: the reference to the actual tkinter GUI window
+    :param window: the tkinter Toplevel
+    :param title_text: title shown at the top of the window
+    :return: the frame to add the window's content to, rows 0-2 are taken
+    """
+    def onFrameConfigure(canvas):
+        '''Reset the scroll region to encompass the inner frame'''
+        canvas.configure(scrollregion=canvas.bbox('all'))
+
+    canvas = tk.Canvas(window, width=750, height=1000)
+    frame = tk.Frame(canvas)
+
+    scrollbar = tk.Scrollbar(window, command=canvas.yview)
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    canvas.create_window((4, 4), window=frame, anchor="nw")
+
+    title_label = tk.Label(
+        frame, text=title_text, font=('arial', 30))
+
+    frame.bind("<Configure>", lambda event,
+               canvas=canvas: onFrameConfigure(canvas))
+
+    title_label.grid(
+        row=0, column=0, columnspan=2, sticky='w')
+
+    ttk.Separator(frame, orient=tk.HORIZONTAL).grid(
+        row=2, columnspan=2, sticky='ew', pady=5)
+
+    return frame